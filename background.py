@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+import config
+
+
+def downscale(rgb, scale, out=None):
+    """Resize a frame by scale for segmentation (returns rgb unchanged at scale >= 1)"""
+    if scale >= 1.0:
+        return rgb
+    height, width = rgb.shape[:2]
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if out is not None and out.shape[:2] == (size[1], size[0]):
+        return cv2.resize(rgb, size, dst=out, interpolation=cv2.INTER_AREA)
+    return cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+
+
+class BackgroundRemover:
+    """Person alpha and in-place background compositing with reused buffers
+
+    Segmentation runs on a downscaled frame; its mask is upsampled once per
+    segmentation run into a full-size uint8 alpha that is reused on frames where
+    segmentation is skipped. On those frames follow() shifts the held mask by
+    how far the tracked face has moved since it was segmented, so the cut-out
+    moves with the person instead of lagging behind. The solid-color
+    background plate is only rebuilt when the color or frame size changes. With feather > 0 the mask edge is
+    softened over that many pixels and blended, otherwise the plate is copied
+    over background pixels with a binary mask.
+    """
+
+    def __init__(self, input_scale=config.SEGMENTATION_INPUT_SCALE, feather=config.BACKGROUND_FEATHER,
+                 threshold=0.5):
+        self.input_scale = input_scale
+        self.feather = feather
+        self.threshold = int(threshold * 255)
+
+        self.small_rgb = None
+        self.small_mask = None
+        # Full-size buffers, allocated on the first mask
+        self.source_alpha = None
+        self.alpha = None
+        self.background_mask = None
+        self.weights = None
+        self.background_weights = None
+        self.plate = None
+        self.plate_color = None
+
+        # Face position (pixels) when the mask was segmented, and the shift applied to it
+        self.anchor = None
+        self.offset = (0, 0)
+
+    def segmentation_input(self, rgb):
+        """Downscaled RGB frame to run segmentation on"""
+        small = downscale(rgb, self.input_scale, self.small_rgb)
+        if small is not rgb:
+            self.small_rgb = small
+        return small
+
+    def has_mask(self, frame_shape):
+        return self.alpha is not None and self.alpha.shape == frame_shape[:2]
+
+    def update_mask(self, mask, frame_size):
+        """Upsample a segmentation mask (float 0-1 or uint8 0-255) to frame_size"""
+        width, height = frame_size
+        if mask.dtype != np.uint8:
+            if self.small_mask is None or self.small_mask.shape != mask.shape:
+                self.small_mask = np.empty(mask.shape, dtype=np.uint8)
+            np.multiply(mask, 255, out=self.small_mask, casting='unsafe')
+            mask = self.small_mask
+
+        if not self.has_mask((height, width)):
+            self.source_alpha = np.empty((height, width), dtype=np.uint8)
+            self.alpha = np.empty((height, width), dtype=np.uint8)
+            self.background_mask = np.empty((height, width), dtype=np.uint8)
+            self.weights = np.empty((height, width), dtype=np.float32)
+            self.background_weights = np.empty((height, width), dtype=np.float32)
+        cv2.resize(mask, (width, height), dst=self.source_alpha, interpolation=cv2.INTER_LINEAR)
+        np.copyto(self.alpha, self.source_alpha)
+        self.anchor = None
+        self.offset = (0, 0)
+        self.derive_masks()
+
+    def set_anchor(self, anchor):
+        """Face position (x, y pixels) on the frame the current mask was segmented from"""
+        self.anchor = anchor
+
+    def follow(self, anchor):
+        """Shift the held mask by the face movement since segmentation (skipped frames)"""
+        if self.anchor is None or anchor is None or self.source_alpha is None:
+            return
+        offset = (int(round(anchor[0] - self.anchor[0])), int(round(anchor[1] - self.anchor[1])))
+        if offset == self.offset:
+            return
+        self.offset = offset
+        height, width = self.source_alpha.shape
+        shift = np.float32([[1, 0, offset[0]], [0, 1, offset[1]]])
+        cv2.warpAffine(self.source_alpha, shift, (width, height), dst=self.alpha,
+                       flags=cv2.INTER_NEAREST, borderMode=cv2.BORDER_REPLICATE)
+        self.derive_masks()
+
+    def derive_masks(self):
+        """Compositing masks / weights from the full-size 0-255 person alpha"""
+        if self.feather > 0:
+            # Binary person mask with a box-blurred edge feather pixels wide
+            cv2.threshold(self.alpha, self.threshold, 255, cv2.THRESH_BINARY, dst=self.alpha)
+            ksize = 2 * self.feather + 1
+            cv2.blur(self.alpha, (ksize, ksize), dst=self.alpha)
+            np.multiply(self.alpha, 1.0 / 255, out=self.weights)
+            np.subtract(1.0, self.weights, out=self.background_weights)
+        else:
+            cv2.threshold(self.alpha, self.threshold, 255, cv2.THRESH_BINARY_INV, dst=self.background_mask)
+
+    def background_plate(self, shape, color):
+        """Solid background image, rebuilt only when the color or size changes"""
+        color = tuple(color)
+        if self.plate is None or self.plate.shape != shape or self.plate_color != color:
+            self.plate = np.empty(shape, dtype=np.uint8)
+            self.plate[:] = color
+            self.plate_color = color
+        return self.plate
+
+    def composite(self, frame, color):
+        """Replace the background of frame with color, in place"""
+        plate = self.background_plate(frame.shape, color)
+        if self.feather > 0:
+            cv2.blendLinear(frame, plate, self.weights, self.background_weights, dst=frame)
+        else:
+            cv2.copyTo(plate, self.background_mask, frame)
+        return frame
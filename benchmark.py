@@ -0,0 +1,248 @@
+"""Reproducible benchmarks for the tracking and rendering pipeline
+
+Usage:
+    python benchmark.py run [--source clip.mp4] [--frames 300] [--output results.json]
+    python benchmark.py compare baseline.json results.json [--threshold 10]
+
+No webcam or display is needed. Frames come from a recorded video (preloaded
+into memory so decoding is not measured) or from a synthetic generator.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+import config
+from capture import SyntheticSource, VideoFileSource
+from frame_packet import FramePacket
+from main import VTuberAvatar
+
+# Feature combinations from the README performance table
+BENCHMARK_CONFIGS = {
+    'face': dict(hands=False, background_removal=False, recording=False),
+    'face+hands': dict(hands=True, background_removal=False, recording=False),
+    'face+hands+background': dict(hands=True, background_removal=True, recording=False),
+    'face+hands+recording': dict(hands=True, background_removal=False, recording=True),
+}
+
+
+def synthetic_frames(count, size=(640, 480), seed=0):
+    """Deterministic moving-shape frames for runs without a recorded clip"""
+    source = SyntheticSource(size, count=count, seed=seed, realtime=False)
+    return [source.read()[1] for _ in range(count)]
+
+
+def load_frames(path, count):
+    """Preload up to count frames from a video file, looping if it is shorter"""
+    source = VideoFileSource(path, realtime=False)
+    if not source.isOpened():
+        raise IOError(f"Could not open video: {path}")
+    frames = []
+    while len(frames) < count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    if not frames:
+        raise IOError(f"No frames could be read from {path}")
+    while len(frames) < count:
+        frames.extend(frames[:count - len(frames)])
+    return frames
+
+
+def summarize(samples):
+    """Mean and percentiles in milliseconds for a list of durations in seconds"""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'count': int(ms.size)
+    }
+
+
+def make_avatar(hands, background_removal):
+    """Avatar with every detector running on every frame"""
+    avatar = VTuberAvatar()
+    avatar.show_hands = hands
+    avatar.use_background_removal = background_removal
+    avatar.scheduler.cadences = {'face': 1, 'hands': 1, 'segmentation': 1}
+    avatar.scheduler.auto = False
+    return avatar
+
+
+def benchmark_config(frames, hands, background_removal, recording, warmup):
+    """Time each stage and the full loop body for one feature combination"""
+    stages = {name: [] for name in ('packet', 'background', 'hands', 'face', 'draw_avatar', 'render')}
+    stage_avatar = make_avatar(hands, background_removal)
+    loop_avatar = make_avatar(hands, background_removal)
+    temp_dir = tempfile.mkdtemp(prefix='vtuber_bench_')
+    if recording:
+        loop_avatar.start_recording((720, 1280, 3), filename=os.path.join(temp_dir, 'bench.mp4'))
+
+    loop_times = []
+    try:
+        # Pass 1: each stage called on its own
+        for i, frame in enumerate(frames):
+            timings = {}
+            start = time.perf_counter()
+            packet = FramePacket.from_capture(frame, index=i)
+            timings['packet'] = time.perf_counter() - start
+
+            if background_removal:
+                start = time.perf_counter()
+                stage_avatar.apply_background_removal(packet)
+                timings['background'] = time.perf_counter() - start
+            if hands:
+                start = time.perf_counter()
+                stage_avatar.process_hands(packet)
+                timings['hands'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            face_detected = stage_avatar.process_frame(packet)
+            timings['face'] = time.perf_counter() - start
+
+            canvas = np.zeros((720, 1280, 3), dtype=np.uint8)
+            start = time.perf_counter()
+            stage_avatar.draw_avatar(canvas, show_landmarks=True)
+            timings['draw_avatar'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            stage_avatar.render_canvas(packet.frame, face_detected)
+            timings['render'] = time.perf_counter() - start
+
+            if i >= warmup:
+                for name, value in timings.items():
+                    stages[name].append(value)
+
+        # Pass 2: the real loop body (packet, detectors, canvas, recording)
+        for i, frame in enumerate(frames):
+            start = time.perf_counter()
+            packet = FramePacket.from_capture(frame, index=i)
+            face_detected = loop_avatar.process_packet(packet)
+            loop_avatar.render_canvas(packet.frame, face_detected, packet.timestamp)
+            if i >= warmup:
+                loop_times.append(time.perf_counter() - start)
+    finally:
+        if loop_avatar.is_recording:
+            loop_avatar.stop_recording()
+        stage_avatar.close()
+        loop_avatar.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    result = {'stages': {name: summarize(samples) for name, samples in stages.items() if samples}}
+    result['stages']['loop'] = summarize(loop_times)
+    result['fps'] = len(loop_times) / sum(loop_times) if loop_times else 0.0
+    # Sprite lookups of the real loop: misses are sprites rebuilt (new expression or style)
+    cache = loop_avatar.render_cache
+    if cache is not None:
+        result['render_cache'] = {'hits': cache.hits, 'misses': cache.misses}
+    return result
+
+
+def run_benchmarks(frames, configs=None, warmup=config.BENCHMARK_WARMUP_FRAMES, source='synthetic'):
+    """Run every feature combination and return a JSON-serializable report"""
+    configs = configs or list(BENCHMARK_CONFIGS)
+    report = {
+        'meta': {
+            'source': source,
+            'frames': len(frames),
+            'warmup': warmup,
+            'frame_size': [frames[0].shape[1], frames[0].shape[0]],
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'mediapipe': getattr(mp, '__version__', 'unknown'),
+            'numpy': np.__version__,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': {}
+    }
+    for name in configs:
+        print(f"Benchmarking {name}...")
+        result = benchmark_config(frames, warmup=warmup, **BENCHMARK_CONFIGS[name])
+        report['results'][name] = result
+        stages = result['stages']
+        print(f"  {result['fps']:.1f} FPS | " + " | ".join(
+            f"{stage} {stats['p50_ms']:.1f}ms" for stage, stats in stages.items()))
+    return report
+
+
+def compare_reports(baseline, current, threshold=config.BENCHMARK_REGRESSION_THRESHOLD):
+    """List regressions of current against baseline (threshold in percent)"""
+    regressions = []
+    limit = threshold / 100.0
+    for name, base in baseline['results'].items():
+        result = current['results'].get(name)
+        if result is None:
+            continue
+        if result['fps'] < base['fps'] * (1 - limit):
+            regressions.append(f"{name}: FPS {base['fps']:.1f} -> {result['fps']:.1f}")
+        for stage, base_stats in base['stages'].items():
+            stats = result['stages'].get(stage)
+            if stats is None:
+                continue
+            for key in ('p50_ms', 'p95_ms'):
+                if stats[key] > base_stats[key] * (1 + limit):
+                    regressions.append(
+                        f"{name}/{stage}: {key} {base_stats[key]:.2f} -> {stats[key]:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VTuber pipeline benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmark suite")
+    run_parser.add_argument('--source', help="recorded video file (default: synthetic frames)")
+    run_parser.add_argument('--frames', type=int, default=config.BENCHMARK_FRAMES)
+    run_parser.add_argument('--warmup', type=int, default=config.BENCHMARK_WARMUP_FRAMES)
+    run_parser.add_argument('--config', action='append', choices=list(BENCHMARK_CONFIGS),
+                            help="feature combination to run (repeatable, default: all)")
+    run_parser.add_argument('--output', default='benchmark_results.json')
+
+    compare_parser = commands.add_parser('compare', help="compare results against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=config.BENCHMARK_REGRESSION_THRESHOLD,
+                                help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        total = args.frames + args.warmup
+        if args.source:
+            frames = load_frames(args.source, total)
+        else:
+            frames = synthetic_frames(total)
+        report = run_benchmarks(frames, args.config, args.warmup, args.source or 'synthetic')
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare_reports(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
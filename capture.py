@@ -0,0 +1,326 @@
+"""Capture sources: where the live loop gets its frames from
+
+Usage:
+    python main.py --source webcam:1                 # second camera
+    python main.py --source clip.mp4 --no-window     # recorded clip, no camera needed
+    python main.py --source frames/                  # directory of numbered images
+    python main.py --source synthetic:300            # generated frames (CI, benchmarks)
+    python capture.py probe [--source webcam]        # print the negotiated format and timing
+
+Every source has the same read() -> (ok, frame) / release() interface as
+cv2.VideoCapture, plus:
+
+    info     the format it actually delivers: kind, width, height, fps,
+             fourcc (webcam) and buffer size, as negotiated, not as requested
+    stats()  capture timing so far: frames, mean / max read time, delivered
+             FPS and the time the first frame took after opening
+
+A webcam asks for WEBCAM_RESOLUTION, WEBCAM_FOURCC, WEBCAM_FPS and
+WEBCAM_BUFFER_SIZE. Drivers silently fall back when they cannot deliver a
+setting (on Linux often to uncompressed YUYV, which caps the frame rate at
+USB bandwidth), so the values are read back after opening and a mismatch is
+reported. File, image and synthetic sources are paced to their frame rate
+unless realtime=False, and end (read() returns False) after their last frame
+unless they loop.
+"""
+import os
+import abc
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+import config
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def fourcc_name(value):
+    """Four-character code string of a CAP_PROP_FOURCC value ('' if the backend has none)"""
+    value = int(value)
+    if value <= 0:
+        return ''
+    return ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip('\0 ')
+
+
+def synthetic_frame(index, base):
+    """Deterministic moving-shape frame over a noise base image"""
+    height, width = base.shape[:2]
+    frame = base.copy()
+    x = int(width / 2 + np.sin(index / 15) * width / 4)
+    y = int(height / 2 + np.cos(index / 20) * height / 6)
+    cv2.circle(frame, (x, y), 90, (150, 180, 220), -1)
+    cv2.ellipse(frame, (x, y + 40), (40, 10 + index % 20), 0, 0, 360, (60, 60, 160), -1)
+    return frame
+
+
+class CaptureSource(abc.ABC):
+    """Base class: read timing, frame pacing and the negotiated format"""
+
+    kind = 'source'
+
+    def __init__(self, fps=None, realtime=False):
+        self.info = {'kind': self.kind, 'width': 0, 'height': 0, 'fps': fps or 0.0}
+        self.interval = 1.0 / fps if realtime and fps else 0.0
+        self.open_time = time.perf_counter()
+        self.first_frame_time = None
+        self.next_due = None
+        self.frames = 0
+        self.read_total = 0.0
+        self.read_max = 0.0
+        self.started = None
+        self.finished = False
+
+    def isOpened(self):
+        return self.info['width'] > 0
+
+    @property
+    def size(self):
+        return self.info['width'], self.info['height']
+
+    @abc.abstractmethod
+    def grab(self):
+        """Next raw frame or None at the end (implemented by every source)"""
+
+    def read(self):
+        """(True, frame) for the next frame, (False, None) once the source ended"""
+        if self.interval:
+            # Paced sources deliver at their own frame rate, never faster
+            now = time.perf_counter()
+            if self.next_due is not None and now < self.next_due:
+                time.sleep(self.next_due - now)
+            self.next_due = max(now, self.next_due or now) + self.interval
+
+        start = time.perf_counter()
+        frame = self.grab()
+        end = time.perf_counter()
+        if frame is None:
+            self.finished = True
+            return False, None
+
+        elapsed = end - start
+        self.frames += 1
+        self.read_total += elapsed
+        self.read_max = max(self.read_max, elapsed)
+        if self.first_frame_time is None:
+            self.first_frame_time = end - self.open_time
+            self.started = end
+        return True, frame
+
+    def stats(self):
+        """Capture timing so far (milliseconds and frames per second)"""
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            'frames': self.frames,
+            'mean_read_ms': self.read_total / self.frames * 1000 if self.frames else 0.0,
+            'max_read_ms': self.read_max * 1000,
+            'fps': (self.frames - 1) / elapsed if self.frames > 1 and elapsed > 0 else 0.0,
+            'first_frame_ms': (self.first_frame_time or 0.0) * 1000
+        }
+
+    def describe(self):
+        """One-line summary of the negotiated format"""
+        info = self.info
+        text = f"{info['kind']} {info['width']}x{info['height']}"
+        if info.get('fourcc'):
+            text += f" {info['fourcc']}"
+        text += f" @ {info['fps']:.1f} FPS"
+        if info.get('buffer_size'):
+            text += f", buffer {info['buffer_size']}"
+        return text
+
+    def release(self):
+        pass
+
+
+class WebcamSource(CaptureSource):
+    """Camera with a requested resolution, pixel format, frame rate and buffer size"""
+
+    kind = 'webcam'
+
+    def __init__(self, index=config.WEBCAM_INDEX, size=config.WEBCAM_RESOLUTION, fourcc=config.WEBCAM_FOURCC,
+                 fps=config.WEBCAM_FPS, buffer_size=config.WEBCAM_BUFFER_SIZE):
+        super().__init__()
+        self.requested = {'width': size[0] if size else None, 'height': size[1] if size else None,
+                          'fourcc': fourcc, 'fps': fps, 'buffer_size': buffer_size}
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            return
+
+        # V4L2 picks the frame sizes and rates available for the pixel format,
+        # so the format has to be set first
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if size:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            # Short driver queue so frames are not served stale
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.info.update(
+            index=index,
+            backend=self.cap.getBackendName(),
+            width=int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fourcc=fourcc_name(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            fps=self.cap.get(cv2.CAP_PROP_FPS) or 0.0,
+            buffer_size=int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))
+        )
+
+    def mismatches(self):
+        """Requested settings the camera did not accept, as (name, requested, negotiated)"""
+        result = []
+        for name, wanted in self.requested.items():
+            actual = self.info.get(name)
+            # Backends without the property report 0 / '', nothing to compare with
+            if wanted and actual and actual != wanted:
+                if name == 'fps' and abs(actual - wanted) < 0.5:
+                    continue
+                result.append((name, wanted, actual))
+        return result
+
+    def grab(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(CaptureSource):
+    """Recorded video file, at its own frame rate (realtime) or as fast as it decodes"""
+
+    kind = 'file'
+
+    def __init__(self, path, loop=False, realtime=True):
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or config.RECORDING_FPS
+        super().__init__(fps, realtime)
+        self.loop = loop
+        if not self.cap.isOpened():
+            return
+        self.info.update(
+            path=path,
+            width=int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fourcc=fourcc_name(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            frame_count=int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        )
+
+    def grab(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.frames:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageSequenceSource(CaptureSource):
+    """Directory of still images played in file-name order"""
+
+    kind = 'images'
+
+    def __init__(self, directory, fps=config.RECORDING_FPS, loop=False, realtime=True):
+        super().__init__(fps, realtime)
+        self.loop = loop
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        if not self.paths:
+            return
+        first = cv2.imread(self.paths[0])
+        if first is None:
+            return
+        self.info.update(path=directory, width=first.shape[1], height=first.shape[0],
+                         frame_count=len(self.paths))
+
+    def grab(self):
+        if self.position == len(self.paths):
+            if not self.loop:
+                return None
+            self.position = 0
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        if frame is not None and frame.shape[:2] != (self.info['height'], self.info['width']):
+            # Downstream buffers are sized from the first image
+            frame = cv2.resize(frame, self.size)
+        return frame
+
+
+class SyntheticSource(CaptureSource):
+    """Deterministic generated frames, count=None for an endless stream"""
+
+    kind = 'synthetic'
+
+    def __init__(self, size=config.SYNTHETIC_SIZE, fps=config.RECORDING_FPS, count=None, seed=0, realtime=True):
+        super().__init__(fps, realtime)
+        width, height = size
+        self.count = count
+        self.base = np.random.default_rng(seed).integers(0, 60, (height, width, 3), dtype=np.uint8)
+        self.info.update(width=width, height=height, frame_count=count or 0)
+
+    def grab(self):
+        if self.count is not None and self.frames >= self.count:
+            return None
+        return synthetic_frame(self.frames, self.base)
+
+
+def open_source(spec=config.CAPTURE_SOURCE, loop=False, realtime=True):
+    """Capture source from a spec string
+
+    'webcam' or 'webcam:N' (a bare number also selects camera N), 'synthetic'
+    or 'synthetic:COUNT', a directory of images or a video file path.
+    """
+    spec = str(spec)
+    kind, _, argument = spec.partition(':')
+    if spec.isdigit():
+        return WebcamSource(int(spec))
+    if kind == 'webcam':
+        return WebcamSource(int(argument) if argument else config.WEBCAM_INDEX)
+    if kind == 'synthetic':
+        return SyntheticSource(count=int(argument) if argument else None, realtime=realtime)
+    if os.path.isdir(spec):
+        return ImageSequenceSource(spec, loop=loop, realtime=realtime)
+    return VideoFileSource(spec, loop=loop, realtime=realtime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open a capture source and report what it delivers")
+    commands = parser.add_subparsers(dest='command', required=True)
+    probe = commands.add_parser('probe', help="print the negotiated format and capture timing")
+    probe.add_argument('--source', default=config.CAPTURE_SOURCE,
+                       help="webcam[:N], synthetic[:COUNT], image directory or video file")
+    probe.add_argument('--frames', type=int, default=120, help="frames to read for the timing")
+    args = parser.parse_args()
+
+    source = open_source(args.source)
+    if not source.isOpened():
+        print(f"Could not open capture source: {args.source}")
+        return
+    print(f"Opened {source.describe()}")
+    if isinstance(source, WebcamSource):
+        for name, wanted, actual in source.mismatches():
+            print(f"  requested {name} {wanted}, got {actual}")
+    try:
+        for _ in range(args.frames):
+            if not source.read()[0]:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.release()
+
+    stats = source.stats()
+    print(f"{stats['frames']} frames: {stats['fps']:.1f} FPS delivered, read {stats['mean_read_ms']:.2f}ms mean / "
+          f"{stats['max_read_ms']:.2f}ms max, first frame after {stats['first_frame_ms']:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
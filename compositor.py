@@ -0,0 +1,126 @@
+import time
+
+import cv2
+import numpy as np
+
+import config
+
+# Canvas regions (y0, y1, x0, x1) owned by each cached layer
+PREVIEW_BORDER_REGION = (8, 253, 8, 333)
+HUD_REGION = (15, 160, 338, 640)
+# Left column of draw_debug_info: head pose lines from y 30 (under the preview),
+# stage timings from y 280, quality and encoder lines at y 640 / 660
+DEBUG_REGION = (0, 680, 0, 338)
+
+
+def region(image, bounds):
+    y0, y1, x0, x1 = bounds
+    return image[y0:y1, x0:x1]
+
+
+class Compositor:
+    """Assembles each frame from persistent layers into one reused output buffer
+
+    Layers, bottom to top:
+      static   background color and chrome (webcam border, instructions), built once
+      avatar   drawn every frame
+      debug    stage timings / FPS text, re-rasterized every DEBUG_REFRESH_INTERVAL
+      preview  scaled webcam frame, border restored from the static layer
+      hud      status indicators, re-rasterized only when a shown value changes
+
+    The debug and hud layers only cover the pixels their text was drawn on
+    (their own mask), so avatar pixels inside their regions stay visible.
+
+    The returned canvas is reused on the next frame; copy it if it must outlive
+    the current iteration.
+    """
+
+    def __init__(self, size=(config.CANVAS_WIDTH, config.CANVAS_HEIGHT),
+                 bg_color=config.CANVAS_BG_COLOR, debug_refresh=config.DEBUG_REFRESH_INTERVAL):
+        width, height = size
+        self.shape = (height, width, 3)
+        self.bg_color = bg_color
+        self.debug_refresh = debug_refresh
+
+        self.output = np.empty(self.shape, dtype=np.uint8)
+        self.static = None
+        self.border_mask = None
+        # Scratch canvas the HUD and debug layers are rasterized into, and the
+        # pixels each of them drew
+        self.layers = None
+        self.layer_masks = {}
+        self.hud_key = None
+        self.debug_time = 0.0
+
+    def build_static(self, avatar):
+        """Rasterize the background and chrome layer"""
+        self.static = np.empty(self.shape, dtype=np.uint8)
+        self.static[:] = self.bg_color
+        avatar.draw_chrome(self.static)
+
+        # Border pixels are copied back over the webcam preview each frame
+        self.border_mask = np.zeros(self.shape[:2], dtype=np.uint8)
+        cv2.rectangle(self.border_mask, (10, 10), (330, 250), 255, 2)
+
+        self.layers = self.static.copy()
+        self.layer_masks = {bounds: np.zeros((bounds[1] - bounds[0], bounds[3] - bounds[2]), dtype=np.uint8)
+                            for bounds in (HUD_REGION, DEBUG_REGION)}
+        self.hud_key = None
+        self.debug_time = 0.0
+
+    def update_mask(self, bounds):
+        """Record which pixels of a freshly rasterized layer differ from the static layer"""
+        changed = np.any(region(self.layers, bounds) != region(self.static, bounds), axis=2)
+        np.multiply(changed, 255, out=self.layer_masks[bounds], casting='unsafe')
+
+    def blend_layer(self, output, bounds):
+        """Copy only the drawn pixels of a cached layer over the output"""
+        cv2.copyTo(region(self.layers, bounds), self.layer_masks[bounds], region(output, bounds))
+
+    def compose(self, avatar, frame, face_detected):
+        """Assemble the output canvas for one frame"""
+        profiler = avatar.profiler
+        if self.static is None:
+            self.build_static(avatar)
+        output = self.output
+
+        with profiler.span('canvas'):
+            np.copyto(output, self.static)
+
+        with avatar.state_lock:
+            with profiler.span('draw_avatar'):
+                avatar.draw_avatar(output, show_landmarks=False)
+                hands_detected = avatar.hands_detected()
+
+            # Debug text changes every frame, refresh it at a readable rate
+            now = time.time()
+            if now - self.debug_time >= self.debug_refresh:
+                with profiler.span('debug'):
+                    np.copyto(region(self.layers, DEBUG_REGION), region(self.static, DEBUG_REGION))
+                    avatar.draw_debug_info(self.layers)
+                    self.update_mask(DEBUG_REGION)
+                self.debug_time = now
+        self.blend_layer(output, DEBUG_REGION)
+
+        # Nothing to resize or draw while the preview is hidden
+        if avatar.show_preview:
+            with profiler.span('preview'):
+                avatar.draw_preview(output, frame)
+        # The border stays on top of the preview and of the debug text under it
+        cv2.copyTo(region(self.static, PREVIEW_BORDER_REGION),
+                   region(self.border_mask, PREVIEW_BORDER_REGION),
+                   region(output, PREVIEW_BORDER_REGION))
+
+        # HUD only changes when one of the shown values changes
+        rec_time = int(time.time() - avatar.recording_start_time) if avatar.is_recording else None
+        hud_key = (face_detected, avatar.show_hands, hands_detected, avatar.use_background_removal,
+                   rec_time, avatar.avatar_style)
+        if hud_key != self.hud_key:
+            with profiler.span('hud'):
+                np.copyto(region(self.layers, HUD_REGION), region(self.static, HUD_REGION))
+                avatar.draw_hud(self.layers, face_detected, hands_detected)
+                self.update_mask(HUD_REGION)
+            self.hud_key = hud_key
+        self.blend_layer(output, HUD_REGION)
+
+        return output
@@ -12,20 +12,53 @@ HEAD_RADIUS = 120
 # Avatar styles available: 'cute', 'anime', 'cool', 'warm'
 DEFAULT_AVATAR_STYLE = 'cute'
 
+# Draw the avatar from cached pre-rendered part sprites
+RENDER_CACHE_ENABLED = True
+
+# Maximum number of cached part sprites (least recently used are dropped)
+RENDER_CACHE_SIZE = 256
+
 # ==================== CANVAS SETTINGS ====================
 
 # Canvas resolution (width, height)
 CANVAS_WIDTH = 1280
 CANVAS_HEIGHT = 720
 
+# Hand indicators: a hand moving across the whole webcam frame moves this
+# fraction of the canvas (width, height) around the avatar center
+HAND_INDICATOR_SPAN = (0.25, 1 / 3)
+
 # Canvas background color (B, G, R)
 CANVAS_BG_COLOR = (40, 40, 60)
 
+# Assemble the canvas from cached layers instead of redrawing it every frame
+COMPOSITOR_ENABLED = True
+
+# Seconds between refreshes of the debug text (FPS, stage timings)
+DEBUG_REFRESH_INTERVAL = 0.25
+
 # ==================== WEBCAM SETTINGS ====================
 
+# Capture source: 'webcam', 'webcam:N', 'synthetic[:COUNT]', an image directory
+# or a video file (see capture.py)
+CAPTURE_SOURCE = 'webcam'
+
 # Webcam index (usually 0 for default camera)
 WEBCAM_INDEX = 0
 
+# Requested capture format, the camera may fall back (capture.py probe shows
+# what it delivers). MJPG avoids the bandwidth cap of uncompressed YUYV;
+# None leaves a setting at the driver default.
+WEBCAM_RESOLUTION = (640, 480)
+WEBCAM_FOURCC = 'MJPG'
+WEBCAM_FPS = 30
+
+# Frames queued in the driver, 1 keeps the newest frame close to real time
+WEBCAM_BUFFER_SIZE = 1
+
+# Frame size of the synthetic capture source
+SYNTHETIC_SIZE = (640, 480)
+
 # Webcam preview size on canvas (width, height)
 WEBCAM_PREVIEW_SIZE = (320, 240)
 
@@ -43,6 +76,16 @@ HAND_DETECTION_CONFIDENCE = 0.5
 HAND_TRACKING_CONFIDENCE = 0.5
 MAX_NUM_HANDS = 2
 
+# Faces tracked at once, each gets its own avatar (1 = single avatar)
+MAX_FACES = 1
+
+# Seconds a face may go undetected before its avatar slot is freed
+FACE_LOST_TIMEOUT = 0.5
+
+# Largest nose movement between frames (fraction of the frame width) still
+# considered the same face
+FACE_MATCH_DISTANCE = 0.15
+
 # Eye Aspect Ratio (EAR) multiplier for blink sensitivity
 # Higher = eyes stay more open, Lower = more sensitive to blinks
 EAR_MULTIPLIER = 3.5
@@ -70,13 +113,57 @@ SLEEPY_THRESHOLD = 0.3
 # Recording codec (mp4v, XVID, etc.)
 RECORDING_CODEC = 'mp4v'
 
-# Recording FPS
-RECORDING_FPS = 20.0
+# Recording FPS (output frame rate, frames are placed by capture timestamp)
+RECORDING_FPS = 30.0
 
 # Recording filename format
 # Uses datetime.strftime format
 RECORDING_FILENAME_FORMAT = "vtuber_recording_%Y%m%d_%H%M%S.mp4"
 
+# Frames buffered for the background encoder thread (at least 1)
+RECORDING_QUEUE_SIZE = 8
+
+# What to do when the encoder queue is full:
+# 'block' (wait for the encoder), 'drop_oldest' (discard the oldest queued frame)
+# or 'duplicate' (discard the new frame, its slot repeats the previous frame)
+RECORDING_OVERFLOW_POLICY = 'drop_oldest'
+
+# Motion track recording (per-frame avatar state, re-render with motion_track.py)
+MOTION_TRACK_FILENAME_FORMAT = "vtuber_track_%Y%m%d_%H%M%S.track"
+
+# Records buffered in memory before each write to disk
+MOTION_TRACK_CHUNK_FRAMES = 300
+
+# Raw landmark capture (face and hand landmarks, replay with landmark_cache.py)
+LANDMARK_CAPTURE_FILENAME_FORMAT = "vtuber_landmarks_%Y%m%d_%H%M%S.landmarks"
+
+# Records (about 3 KB each) buffered in memory before each write to disk
+LANDMARK_CAPTURE_CHUNK_FRAMES = 60
+
+# ==================== PARAMETER STREAMING ====================
+
+# Stream avatar parameters as UDP packets (receive with streaming.py)
+STREAMING_ENABLED = False
+
+# Destination of the packets
+STREAM_HOST = '127.0.0.1'
+STREAM_PORT = 39540
+
+# Packets per second, independent of camera and render rates
+STREAM_RATE = 120
+
+# ==================== FRAME RING OUTPUT ====================
+
+# Publish every finished canvas into a shared-memory ring (read with frame_ring.py)
+FRAME_RING_ENABLED = False
+
+# Shared-memory segment name (/dev/shm/<name> on Linux)
+FRAME_RING_NAME = 'vtuber_frames'
+
+# Frames kept in the ring, a zero-copy reader has (slots - 1) frame times to
+# finish with a frame before it is overwritten
+FRAME_RING_SLOTS = 3
+
 # ==================== BACKGROUND REMOVAL ====================
 
 # Default background color when using background removal (B, G, R)
@@ -85,11 +172,170 @@ DEFAULT_BG_COLOR = (50, 150, 50)  # Green
 # Selfie segmentation model (0 = general, 1 = landscape)
 SEGMENTATION_MODEL = 1
 
+# Scale of the frame fed to selfie segmentation (the model itself runs at
+# 256x144 / 256x256, so half resolution loses almost nothing)
+SEGMENTATION_INPUT_SCALE = 0.5
+
+# Soft mask edge width in pixels (0 = hard edge, cheapest)
+BACKGROUND_FEATHER = 0
+
+# ==================== DETECTOR INPUT REGIONS ====================
+
+# Crop Face Mesh / Hands inputs to the area around last frame's landmarks
+ROI_CROPPING_ENABLED = True
+
+# Longest side (pixels) a cropped region is downscaled to before inference
+ROI_TARGET_SIZE = {'face': 256, 'hands': 320}
+
+# Padding added on each side of the landmark bounding box (fraction of its size)
+ROI_PADDING = {'face': 0.25, 'hands': 0.5}
+
+# Frames between full-frame passes while tracking (0 = only when tracking is lost),
+# lets Hands notice a second hand (and multi-face mode a new face) entering the frame
+ROI_REFRESH_INTERVAL = {'face': 0, 'faces': 15, 'hands': 15}
+
+# Full-frame fallback input is downscaled to at most this longest side
+ROI_FULL_FRAME_MAX_SIDE = 640
+
 # ==================== PERFORMANCE SETTINGS ====================
 
 # FPS counter history length (smoothing)
 FPS_HISTORY_LENGTH = 30
 
+# Time each pipeline stage (capture, detectors, drawing, encoding, display)
+PROFILING_ENABLED = True
+
+# Keep recent timing spans so they can be saved as a Chrome trace (T key)
+TRACE_ENABLED = True
+
+# Maximum number of spans kept for the trace (oldest are dropped)
+TRACE_BUFFER_SIZE = 100000
+
+# Trace filename format (datetime.strftime)
+TRACE_FILENAME_FORMAT = "vtuber_trace_%Y%m%d_%H%M%S.json"
+
+# Run capture, inference and rendering on separate threads
+PIPELINED_MODE = False
+
+# Frames buffered between pipeline stages (1 = always use the newest frame)
+PIPELINE_QUEUE_SIZE = 1
+
+# Fixed render/output rate of pipelined mode, independent of the detection rate
+# (avatar parameters are predicted to each display time); 0 = render once per
+# inference result
+RENDER_FPS = 60
+
+# Build the detectors of features enabled at startup on a background thread
+# when the live app starts (others are built when their feature is first
+# turned on; offline tools build them on first use)
+DETECTOR_WARMUP = True
+
+# Run Face Mesh, Hands and Segmentation in separate worker processes
+USE_PROCESS_POOL = False
+
+# Shared-memory frame slots used to hand frames to the detector processes
+PROCESS_POOL_RING_SLOTS = 4
+
+# Seconds to wait for detector workers before giving up on a frame
+PROCESS_POOL_TIMEOUT = 5.0
+
+# Run each detector every N frames (1 = every frame). On skipped frames the
+# last segmentation mask is shifted with the face and hand positions are
+# extrapolated.
+DETECTOR_CADENCE = {'face': 1, 'hands': 2, 'segmentation': 3}
+
+# Pick hand / segmentation cadence automatically from measured detector cost
+# (ignored while ADAPTIVE_QUALITY is on, the quality ladder sets cadences then)
+AUTO_CADENCE = False
+
+# Detector time per frame (ms) that automatic cadence tries to stay under
+DETECTOR_BUDGET_MS = 25.0
+
+# Slowest cadence automatic mode may choose
+MAX_DETECTOR_CADENCE = 4
+
+# Never extrapolate hand positions further than this many seconds ahead
+MAX_EXTRAPOLATION_TIME = 0.1
+
+# ==================== ADAPTIVE QUALITY ====================
+
+# Step down the quality ladder below when frames take longer than the target
+# frame time, and back up when there is headroom again
+ADAPTIVE_QUALITY = True
+
+# Frame rate the controller defends (per-frame processing time: detection,
+# animation and drawing in the serial loop and session host, inference time in
+# pipelined mode; capture and display waits are not counted)
+QUALITY_TARGET_FPS = 30
+
+# Frames averaged before each decision (and refilled after every change)
+QUALITY_WINDOW = 30
+
+# Step down when the average is this much over budget (0.15 = 15%)
+QUALITY_DOWN_MARGIN = 0.15
+
+# Step up only after QUALITY_UPGRADE_FRAMES frames below this share of the budget
+QUALITY_UP_RATIO = 0.7
+QUALITY_UPGRADE_FRAMES = 90
+
+# Quality ladder, from full quality to cheapest:
+# input_scale scales detector input sizes (ROI_TARGET_SIZE, ROI_FULL_FRAME_MAX_SIDE,
+# SEGMENTATION_INPUT_SCALE), refine_landmarks is Face Mesh iris refinement,
+# max_num_hands the Hands limit, segmentation_model the Selfie Segmentation
+# model (1 = landscape, 0 = general) and cadence replaces DETECTOR_CADENCE (None = keep it)
+# (Face Mesh always runs every frame)
+QUALITY_LEVELS = [
+    dict(name='full', input_scale=1.0, refine_landmarks=True, max_num_hands=2,
+         segmentation_model=1, cadence=None),
+    dict(name='high', input_scale=0.75, refine_landmarks=True, max_num_hands=2,
+         segmentation_model=1, cadence={'hands': 2, 'segmentation': 3}),
+    dict(name='medium', input_scale=0.75, refine_landmarks=False, max_num_hands=2,
+         segmentation_model=1, cadence={'hands': 3, 'segmentation': 4}),
+    dict(name='low', input_scale=0.5, refine_landmarks=False, max_num_hands=1,
+         segmentation_model=0, cadence={'hands': 3, 'segmentation': 6}),
+    dict(name='minimum', input_scale=0.5, refine_landmarks=False, max_num_hands=1,
+         segmentation_model=0, cadence={'hands': 4, 'segmentation': 8})
+]
+
+# ==================== SESSION HOST SETTINGS ====================
+
+# Detector worker processes shared by all sessions of session_host.py
+# (None = one per CPU core)
+SESSION_WORKERS = None
+
+# Frame rate cap of each session, frames above it would only take worker
+# time from the other sessions
+SESSION_BUDGET_FPS = 30
+
+# Seconds between per-session statistics reports
+SESSION_REPORT_INTERVAL = 2.0
+
+# Size of each session's tile in the host window (width, height)
+SESSION_TILE_SIZE = (640, 360)
+
+# ==================== OFFLINE RENDERING ====================
+
+# Frames per chunk handed to each worker when rendering a video file
+OFFLINE_CHUNK_FRAMES = 900
+
+# Frames tracked (but not written) before each chunk so tracking has settled
+OFFLINE_CHUNK_WARMUP = 15
+
+# ffmpeg executable used to join rendered chunks without re-encoding (stream
+# copy); when it is not found the chunks are decoded and re-encoded instead
+OFFLINE_FFMPEG = 'ffmpeg'
+
+# ==================== BENCHMARKS ====================
+
+# Frames measured per feature combination
+BENCHMARK_FRAMES = 300
+
+# Frames run before measuring (model initialization, tracking lock-on)
+BENCHMARK_WARMUP_FRAMES = 30
+
+# Slowdown (percent) against the baseline reported as a regression
+BENCHMARK_REGRESSION_THRESHOLD = 10.0
+
 # ==================== UI SETTINGS ====================
 
 # Show debug information by default
@@ -115,13 +361,34 @@ STATUS_DISABLED_COLOR = (100, 100, 100)  # Gray
 DEFAULT_HAND_TRACKING = True
 DEFAULT_BACKGROUND_REMOVAL = False
 DEFAULT_SHOW_MESH = True
+DEFAULT_SHOW_PREVIEW = True
 
-# Hand gesture smoothing (not implemented yet)
+# Hand gesture smoothing: a new gesture is shown only after it was detected
+# on GESTURE_SMOOTHING_FRAMES consecutive hand tracking frames
 GESTURE_SMOOTHING = True
-
-# Avatar animation smoothing (not implemented yet)
+GESTURE_SMOOTHING_FRAMES = 3
+
+# Gesture finger-state thresholds as (switch on, switch off) pairs, the gap
+# between them keeps a state from flickering (see gestures.py):
+# finger extended while its curl (0 = straight, 1 = folded back) is below
+GESTURE_CURL_THRESHOLDS = (0.35, 0.5)
+# thumb out while its tip is this far from the index knuckle (palm sizes)
+GESTURE_THUMB_SPREAD = (0.7, 0.55)
+# thumb and index pinched while their tips are closer than this (palm sizes)
+GESTURE_PINCH_DISTANCE = (0.25, 0.35)
+
+# Avatar animation smoothing: One Euro filter over head rotation, eye and mouth
+# openness, predicted forward to display time (at most MAX_EXTRAPOLATION_TIME)
 ANIMATION_SMOOTHING = True
 
+# One Euro parameters per avatar parameter: min_cutoff (Hz, lower = smoother
+# when still), beta (higher = less lag when moving, in 1 / parameter units)
+ANIMATION_FILTER = {
+    'head_rotation': dict(min_cutoff=1.0, beta=0.05),
+    'eye_open': dict(min_cutoff=3.0, beta=1.0),
+    'mouth_open': dict(min_cutoff=2.0, beta=1.0)
+}
+
 # ==================== CUSTOM COLORS ====================
 
 # You can override avatar color schemes here
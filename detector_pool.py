@@ -0,0 +1,567 @@
+import os
+import time
+import signal
+import queue
+import threading
+import multiprocessing as mp_proc
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import config
+from features import landmarks_to_array
+from background import downscale
+from roi import crop_to_region, region_to_frame
+
+DETECTOR_KINDS = ('face', 'hands', 'segmentation')
+
+
+def build_detector(kind, settings):
+    """Create the MediaPipe solution for a detector kind"""
+    import mediapipe as mp
+
+    if kind == 'face':
+        return mp.solutions.face_mesh.FaceMesh(**settings)
+    elif kind == 'hands':
+        return mp.solutions.hands.Hands(**settings)
+    elif kind == 'segmentation':
+        return mp.solutions.selfie_segmentation.SelfieSegmentation(**settings)
+    raise ValueError(f"Unknown detector kind: {kind}")
+
+
+def run_detector(kind, detector, rgb, region, frame_size, mask_out, segmentation_scale=1.0):
+    """Run one detector on a read-only RGB frame, returns its compact payload
+
+    face: (M, 478, 3) array or None, hands: list of (label, (21, 3) array),
+    both in frame coordinates. segmentation writes its (downscaled) mask into
+    mask_out as 0-255 alpha and returns its (height, width).
+    """
+    if kind == 'segmentation':
+        rgb = downscale(rgb, segmentation_scale)
+    elif region is not None:
+        rgb = crop_to_region(rgb, region)
+    output = detector.process(rgb)
+
+    # Only compact arrays go back through the result queue
+    if kind == 'face':
+        payload = None
+        if output.multi_face_landmarks:
+            # (M, 478, 3), every detected face
+            payload = np.stack([landmarks_to_array(face_landmarks)
+                                for face_landmarks in output.multi_face_landmarks])
+            if region is not None:
+                region_to_frame(payload.reshape(-1, 3), region, frame_size)
+    elif kind == 'hands':
+        payload = []
+        if output.multi_hand_landmarks and output.multi_handedness:
+            for hand_landmarks, handedness in zip(output.multi_hand_landmarks,
+                                                  output.multi_handedness):
+                label = handedness.classification[0].label.lower()
+                points = landmarks_to_array(hand_landmarks)
+                if region is not None:
+                    region_to_frame(points, region, frame_size)
+                payload.append((label, points))
+    else:
+        mask = output.segmentation_mask
+        height, width = mask.shape
+        np.multiply(mask, 255, out=mask_out[:height, :width], casting='unsafe')
+        payload = (height, width)
+    return payload
+
+
+def detector_worker(kind, settings, frame_ring_name, mask_ring_name, ring_shape, tasks, results,
+                    segmentation_scale=1.0):
+    """Worker process: run one MediaPipe solution on frames from the shared ring"""
+    detector = build_detector(kind, settings)
+    frame_shm = shared_memory.SharedMemory(name=frame_ring_name)
+    mask_shm = shared_memory.SharedMemory(name=mask_ring_name)
+    frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=frame_shm.buf)
+    masks = np.ndarray(ring_shape[:3], dtype=np.uint8, buffer=mask_shm.buf)
+    frame_size = (ring_shape[2], ring_shape[1])
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if task[0] == 'configure':
+                # New settings (quality level): rebuild before the next frame
+                detector.close()
+                detector = build_detector(kind, task[1])
+                continue
+            slot, index, region = task
+            rgb = frames[slot]
+            rgb.flags.writeable = False
+            start = time.perf_counter()
+            payload = run_detector(kind, detector, rgb, region, frame_size, masks[slot], segmentation_scale)
+            if kind == 'segmentation':
+                # The mask itself stays in shared memory
+                payload = (slot,) + payload
+            results.put((kind, index, payload, time.perf_counter() - start))
+    finally:
+        del frames, masks
+        frame_shm.close()
+        mask_shm.close()
+        detector.close()
+
+
+class DetectorPool:
+    """Runs Face Mesh, Hands and Selfie Segmentation in separate worker processes
+
+    Frames are handed to the workers through shared-memory ring slots instead of
+    pickled arrays, so the three models run in parallel on separate cores without
+    competing for the GIL. Per-frame latency is roughly that of the slowest model.
+    """
+
+    def __init__(self, frame_size, detector_settings, slots=config.PROCESS_POOL_RING_SLOTS,
+                 timeout=config.PROCESS_POOL_TIMEOUT, segmentation_scale=config.SEGMENTATION_INPUT_SCALE):
+        width, height = frame_size
+        self.ring_shape = (slots, height, width, 3)
+        self.timeout = timeout
+        self.settings = {kind: dict(values) for kind, values in detector_settings.items()}
+        self.frame_index = 0
+        self.free_slots = list(range(slots))
+        # Seconds each detector took on the last collected frame (for the cadence scheduler)
+        self.last_costs = {}
+        # Slots of timed-out frames: frame index -> [slot, detectors still running on it]
+        self.abandoned = {}
+
+        self.frame_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.ring_shape)))
+        self.mask_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.ring_shape[:3])))
+        self.frames = np.ndarray(self.ring_shape, dtype=np.uint8, buffer=self.frame_shm.buf)
+        self.masks = np.ndarray(self.ring_shape[:3], dtype=np.uint8, buffer=self.mask_shm.buf)
+
+        # Spawned, not forked: forking a process that already runs MediaPipe graphs
+        # corrupts the child's heap
+        context = mp_proc.get_context('spawn')
+        self.results = context.Queue()
+        self.tasks = {}
+        self.workers = {}
+        for kind in DETECTOR_KINDS:
+            self.tasks[kind] = context.Queue()
+            worker = context.Process(
+                target=detector_worker,
+                args=(kind, detector_settings[kind], self.frame_shm.name, self.mask_shm.name,
+                      self.ring_shape, self.tasks[kind], self.results, segmentation_scale),
+                name=f'vtuber-{kind}',
+                daemon=True
+            )
+            worker.start()
+            self.workers[kind] = worker
+
+    def submit(self, packet, kinds, regions=None):
+        """Copy the packet's RGB frame into a free ring slot and dispatch it
+
+        regions optionally maps a detector kind to the roi.py region spec its
+        worker should crop the frame to (landmarks come back in frame coordinates).
+        """
+        if (packet.height, packet.width) != self.ring_shape[1:3]:
+            raise ValueError(f"Frame size {packet.size} does not match detector pool ring")
+        if not self.free_slots and self.abandoned:
+            self.drain_abandoned()
+        if not self.free_slots:
+            raise RuntimeError("No free shared-memory slot, collect pending frames first")
+
+        slot = self.free_slots.pop(0)
+        self.frames[slot] = packet.rgb
+        index = self.frame_index
+        self.frame_index += 1
+        regions = regions or {}
+        for kind in kinds:
+            self.tasks[kind].put((slot, index, regions.get(kind)))
+        return slot, index, tuple(kinds)
+
+    def collect(self, ticket):
+        """Wait for every detector of a submitted frame, returns {kind: result}"""
+        slot, index, kinds = ticket
+        outputs = {}
+        costs = {}
+        try:
+            while len(outputs) < len(kinds):
+                kind, result_index, payload, seconds = self.results.get(timeout=self.timeout)
+                if result_index != index:
+                    self.release_late(result_index)
+                    continue
+                if kind == 'segmentation':
+                    mask_slot, height, width = payload
+                    payload = self.masks[mask_slot, :height, :width].copy()
+                outputs[kind] = payload
+                costs[kind] = seconds
+        except queue.Empty:
+            # Workers may still read the frame or write the mask, the slot is
+            # only reused once all their late results came in
+            self.abandoned[index] = [slot, len(kinds) - len(outputs)]
+            raise RuntimeError(f"Detector workers timed out after {self.timeout}s")
+        self.free_slots.append(slot)
+        self.last_costs = costs
+        return outputs
+
+    def release_late(self, index):
+        """Count a late result of an abandoned frame, freeing its slot after the last one"""
+        entry = self.abandoned.get(index)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.abandoned[index]
+            self.free_slots.append(entry[0])
+
+    def drain_abandoned(self):
+        """Wait for late results until a slot of an abandoned frame is free again"""
+        try:
+            while self.abandoned and not self.free_slots:
+                _, index, _, _ = self.results.get(timeout=self.timeout)
+                self.release_late(index)
+        except queue.Empty:
+            pass
+
+    def process(self, packet, kinds, regions=None):
+        """Run the requested detectors on a packet in parallel"""
+        return self.collect(self.submit(packet, kinds, regions))
+
+    def reconfigure(self, kind, **changes):
+        """Change a detector's settings, its worker rebuilds the model before its next frame"""
+        settings = dict(self.settings[kind], **changes)
+        if settings == self.settings[kind]:
+            return
+        self.settings[kind] = settings
+        self.tasks[kind].put(('configure', settings))
+
+    def close(self):
+        """Stop worker processes and release shared memory"""
+        for kind in self.workers:
+            self.tasks[kind].put(None)
+        for worker in self.workers.values():
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = {}
+
+        del self.frames, self.masks
+        self.frame_shm.close()
+        self.frame_shm.unlink()
+        self.mask_shm.close()
+        self.mask_shm.unlink()
+
+
+def session_frame_views(buffer, shape):
+    """(frame, mask) views of a session segment: one (H, W, 3) RGB frame, then an (H, W) mask"""
+    height, width = shape
+    frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=buffer)
+    mask = np.ndarray((height, width), dtype=np.uint8, buffer=buffer, offset=height * width * 3)
+    return frame, mask
+
+
+def shared_detector_worker(worker, detector_settings, tasks, results, segmentation_scale=1.0, warm_up=()):
+    """Worker process of a SharedDetectorPool: every detector kind, frames of any session
+
+    Every session gets its own graph per detector kind, built on its first
+    frame here and closed when the session detaches, so one session's
+    tracking state never leaks into another's frames. Graphs built for
+    warm_up wait as spares for the first session with default settings.
+    Session segments are attached on their first frame as well. A failing
+    frame is reported back instead of killing the worker.
+    """
+    # Ctrl+C reaches the whole process group, the host stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    spares = {kind: build_detector(kind, detector_settings[kind]) for kind in warm_up}
+    # (session segment name, kind) -> graph, segment name -> {kind: settings}
+    detectors = {}
+    session_settings = {}
+    segments = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if task[0] == 'detach':
+                name = task[1]
+                segment = segments.pop(name, None)
+                if segment is not None:
+                    segment[1] = None
+                    segment[0].close()
+                session_settings.pop(name, None)
+                for key in [key for key in detectors if key[0] == name]:
+                    detectors.pop(key).close()
+                continue
+            if task[0] == 'configure':
+                # Rebuilt with the new settings on the session's next frame
+                _, name, kind, settings = task
+                session_settings.setdefault(name, {})[kind] = settings
+                detector = detectors.pop((name, kind), None)
+                if detector is not None:
+                    detector.close()
+                continue
+
+            _, ticket, name, shape, kinds, regions = task
+            start = time.perf_counter()
+            try:
+                if name not in segments:
+                    shm = shared_memory.SharedMemory(name=name)
+                    segments[name] = [shm, session_frame_views(shm.buf, shape)]
+                rgb, mask = segments[name][1]
+                rgb.flags.writeable = False
+                frame_size = (shape[1], shape[0])
+
+                payloads, costs = {}, {}
+                for kind in kinds:
+                    detector = detectors.get((name, kind))
+                    if detector is None:
+                        settings = session_settings.get(name, {}).get(kind, detector_settings[kind])
+                        if kind in spares and settings == detector_settings[kind]:
+                            detector = spares.pop(kind)
+                        else:
+                            detector = build_detector(kind, settings)
+                        detectors[(name, kind)] = detector
+                    kind_start = time.perf_counter()
+                    payloads[kind] = run_detector(kind, detector, rgb, regions.get(kind),
+                                                  frame_size, mask, segmentation_scale)
+                    costs[kind] = time.perf_counter() - kind_start
+                error = None
+            except Exception as exception:
+                payloads, costs, error = None, {}, f"{type(exception).__name__}: {exception}"
+            results.put((worker, ticket, payloads, costs, error, time.perf_counter() - start))
+    finally:
+        for segment in segments.values():
+            segment[1] = None
+            segment[0].close()
+        for detector in list(detectors.values()) + list(spares.values()):
+            detector.close()
+
+
+class PendingFrame:
+    """A session's frame waiting for (or being run by) a shared pool worker"""
+
+    __slots__ = ('session', 'ticket', 'kinds', 'regions', 'submitted', 'done', 'outputs', 'costs', 'error',
+                 'busy')
+
+    def __init__(self, session, ticket, kinds, regions):
+        self.session = session
+        self.ticket = ticket
+        self.kinds = tuple(kinds)
+        self.regions = regions
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.outputs = None
+        self.costs = {}
+        self.error = None
+        self.busy = 0.0
+
+
+class PoolSession:
+    """One session's connection to a SharedDetectorPool
+
+    Has the process() / reconfigure() / close() interface of DetectorPool, so
+    an avatar uses it as its detector_pool unchanged. One frame is in flight
+    at a time; the frame and the segmentation mask travel through the
+    session's own shared-memory segment.
+    """
+
+    def __init__(self, pool, session_id, frame_size, weight=1.0):
+        width, height = frame_size
+        self.pool = pool
+        self.id = session_id
+        self.shape = (height, width)
+        self.weight = weight
+        # This session's detector settings, its graphs in the workers are built with them
+        self.settings = {kind: dict(values) for kind, values in pool.detector_settings.items()}
+        self.shm = shared_memory.SharedMemory(create=True, size=height * width * 4)
+        self.frame, self.mask = session_frame_views(self.shm.buf, self.shape)
+
+        # Worker seconds used, over weight: the pool serves the lowest first
+        self.usage = 0.0
+        self.last_costs = {}
+        self.last_worker = None
+        self.pending = None
+        # Timed-out frame a worker may still be reading the segment for (or writing the mask of)
+        self.late = None
+        self.frames = 0
+        self.wait_total = 0.0
+        self.busy_total = 0.0
+
+    def process(self, packet, kinds, regions=None):
+        """Run the requested detectors on a packet in a pool worker, returns {kind: result}"""
+        if (packet.height, packet.width) != self.shape:
+            raise ValueError(f"Frame size {packet.size} does not match the session's pool segment")
+        if self.late is not None:
+            # The segment is only rewritten once the worker is done with the timed-out frame
+            if not self.late.done.wait(self.pool.timeout):
+                raise RuntimeError("Detector workers still busy with the session's timed-out frame")
+            self.late = None
+        np.copyto(self.frame, packet.rgb)
+        frame = self.pool.submit(self, kinds, regions or {})
+        if not frame.done.wait(self.pool.timeout):
+            self.pool.abandon(frame)
+            raise RuntimeError(f"Detector workers timed out after {self.pool.timeout}s")
+        if frame.error is not None:
+            raise RuntimeError(f"Detector worker failed: {frame.error}")
+
+        self.frames += 1
+        self.wait_total += time.perf_counter() - frame.submitted
+        self.busy_total += frame.busy
+        self.last_costs = frame.costs
+        outputs = frame.outputs
+        if 'segmentation' in outputs:
+            height, width = outputs['segmentation']
+            outputs['segmentation'] = self.mask[:height, :width].copy()
+        return outputs
+
+    def reconfigure(self, kind, **changes):
+        """Change a detector's settings for this session only (its graphs are rebuilt in every worker)"""
+        settings = dict(self.settings[kind], **changes)
+        if settings == self.settings[kind]:
+            return
+        self.settings[kind] = settings
+        self.pool.configure(self, kind, settings)
+
+    def close(self):
+        """Leave the pool and release the shared-memory segment"""
+        self.pool.remove(self)
+        del self.frame, self.mask
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedDetectorPool:
+    """Fixed set of detector worker processes shared by several sessions
+
+    Every worker can run every detector kind for any session, so the number
+    of processes (and MediaPipe graphs) follows the core count instead of the
+    session count. Each session has at most one frame in flight; whenever a
+    worker is free it takes the waiting frame of the session that has used the
+    least worker time relative to its weight, so a session with expensive
+    frames (hands, segmentation) cannot starve the others. Workers keep a
+    separate graph per (session, detector kind), so tracking state and
+    per-session settings (quality levels) never mix between sessions. A
+    session goes back to the worker that ran its previous frame when that one
+    is free, since that worker's graphs hold its tracking state (on another
+    worker the session's graph re-detects on its own).
+    """
+
+    def __init__(self, detector_settings, workers=config.SESSION_WORKERS, timeout=config.PROCESS_POOL_TIMEOUT,
+                 segmentation_scale=config.SEGMENTATION_INPUT_SCALE,
+                 warm_up=('face', 'hands') if config.DETECTOR_WARMUP else ()):
+        self.count = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.detector_settings = detector_settings
+        self.sessions = []
+        self.waiting = []
+        self.in_flight = {}
+        self.idle = list(range(self.count))
+        self.next_ticket = 0
+        self.next_session = 0
+        self.lock = threading.Lock()
+
+        # Spawned, not forked (see DetectorPool)
+        context = mp_proc.get_context('spawn')
+        self.results = context.Queue()
+        self.tasks = []
+        self.workers = []
+        for worker in range(self.count):
+            tasks = context.Queue()
+            process = context.Process(
+                target=shared_detector_worker,
+                args=(worker, detector_settings, tasks, self.results, segmentation_scale, warm_up),
+                name=f'vtuber-pool-{worker}',
+                daemon=True
+            )
+            process.start()
+            self.tasks.append(tasks)
+            self.workers.append(process)
+
+        self.collector = threading.Thread(target=self.collect_loop, name='vtuber-pool-results', daemon=True)
+        self.collector.start()
+
+    def session(self, frame_size, weight=1.0):
+        """Connect a new session (frames of frame_size) to the pool"""
+        with self.lock:
+            session = PoolSession(self, self.next_session, frame_size, weight)
+            self.next_session += 1
+            # Start level with the others instead of owning the workers until it caught up
+            session.usage = min((other.usage for other in self.sessions), default=0.0)
+            self.sessions.append(session)
+        return session
+
+    def submit(self, session, kinds, regions):
+        """Queue the frame in the session's segment, returns its PendingFrame"""
+        with self.lock:
+            frame = PendingFrame(session, self.next_ticket, kinds, regions)
+            self.next_ticket += 1
+            session.pending = frame
+            self.waiting.append(session)
+            self.dispatch()
+        return frame
+
+    def dispatch(self):
+        """Hand waiting frames to idle workers, least served session first (lock held)"""
+        while self.idle and self.waiting:
+            session = min(self.waiting, key=lambda waiting: waiting.usage)
+            self.waiting.remove(session)
+            worker = session.last_worker if session.last_worker in self.idle else self.idle[0]
+            self.idle.remove(worker)
+            session.last_worker = worker
+
+            frame, session.pending = session.pending, None
+            self.in_flight[frame.ticket] = frame
+            self.tasks[worker].put(('frame', frame.ticket, session.shm.name, session.shape,
+                                    frame.kinds, frame.regions))
+
+    def collect_loop(self):
+        """Route worker results back to their sessions (collector thread)"""
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            worker, ticket, payloads, costs, error, busy = message
+            with self.lock:
+                self.idle.append(worker)
+                frame = self.in_flight.pop(ticket, None)
+                if frame is not None:
+                    frame.session.usage += busy / frame.session.weight
+                    frame.outputs, frame.costs, frame.error, frame.busy = payloads, costs, error, busy
+                    frame.done.set()
+                self.dispatch()
+
+    def configure(self, session, kind, settings):
+        """Have every worker rebuild a session's graph of one kind with new settings"""
+        with self.lock:
+            # Queued before the session's next frame, so no worker runs it with the old graph
+            for tasks in self.tasks:
+                tasks.put(('configure', session.shm.name, kind, settings))
+
+    def abandon(self, frame):
+        """Give up on a frame that timed out
+
+        A frame still waiting for a worker is dropped. One a worker already
+        runs stays in flight as the session's late frame: the worker still
+        reads the session's segment, so the session holds its next frame until
+        the late result came in.
+        """
+        with self.lock:
+            if frame.session.pending is frame:
+                self.waiting.remove(frame.session)
+                frame.session.pending = None
+            elif not frame.done.is_set():
+                frame.session.late = frame
+
+    def remove(self, session):
+        """Disconnect a session and have the workers detach its segment"""
+        with self.lock:
+            if session in self.waiting:
+                self.waiting.remove(session)
+            if session in self.sessions:
+                self.sessions.remove(session)
+            for tasks in self.tasks:
+                tasks.put(('detach', session.shm.name))
+
+    def close(self):
+        """Stop the worker processes and the result collector"""
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.workers:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.workers = []
+        self.results.put(None)
+        self.collector.join(timeout=1.0)
@@ -0,0 +1,115 @@
+import time
+import threading
+
+import numpy as np
+
+from detector_pool import build_detector
+
+
+class DetectorSet:
+    """MediaPipe solutions of this process, each built on first use
+
+    Building a solution loads its model and starts its graph, so nothing is
+    built up front. warm_up() builds a detector, and runs it once on a blank
+    frame, on a background thread; get() with wait=False returns None until
+    that has finished instead of stalling the caller, so turning a feature on
+    never freezes the live loop. reconfigure() rebuilds a detector with new
+    settings the same way, the old instance stays in use until the new one is
+    ready.
+    """
+
+    def __init__(self, settings):
+        self.settings = {kind: dict(values) for kind, values in settings.items()}
+        self.instances = {}
+        self.threads = {}
+        self.build_times = {}
+        # Replaced instances, closed by the next get() (on the thread that used them)
+        self.retired = []
+        self.lock = threading.Lock()
+
+    def build(self, kind):
+        """Build and warm up a detector until it matches the current settings (warm-up thread)"""
+        while True:
+            settings = dict(self.settings[kind])
+            start = time.perf_counter()
+            try:
+                detector = build_detector(kind, settings)
+                # The first process() call initializes the graph, keep it off the live loop
+                blank = np.zeros((64, 64, 3), dtype=np.uint8)
+                blank.flags.writeable = False
+                detector.process(blank)
+            except Exception:
+                with self.lock:
+                    del self.threads[kind]
+                raise
+
+            with self.lock:
+                previous = self.instances.get(kind)
+                if previous is not None:
+                    self.retired.append(previous)
+                self.instances[kind] = detector
+                self.build_times[kind] = time.perf_counter() - start
+                # Settings changed while building, go again
+                if settings == self.settings[kind]:
+                    del self.threads[kind]
+                    return
+
+    def start_build(self, kind):
+        """Start a build thread for kind unless one is running (lock held)"""
+        if kind in self.threads:
+            return
+        thread = threading.Thread(target=self.build, args=(kind,), name=f'vtuber-warmup-{kind}', daemon=True)
+        self.threads[kind] = thread
+        thread.start()
+
+    def warm_up(self, kind):
+        """Start building a detector in the background (no-op if built or building)"""
+        with self.lock:
+            if kind not in self.instances:
+                self.start_build(kind)
+
+    def reconfigure(self, kind, **changes):
+        """Change a detector's settings, rebuilding it in the background if it was built"""
+        with self.lock:
+            settings = dict(self.settings[kind], **changes)
+            if settings == self.settings[kind]:
+                return
+            self.settings[kind] = settings
+            if kind in self.instances:
+                self.start_build(kind)
+
+    def get(self, kind, wait=True):
+        """The detector for kind; with wait=False None while it is still being built"""
+        if self.retired:
+            with self.lock:
+                retired, self.retired = self.retired, []
+            for detector in retired:
+                detector.close()
+
+        while True:
+            detector = self.instances.get(kind)
+            if detector is not None:
+                return detector
+            self.warm_up(kind)
+            if not wait:
+                return None
+            with self.lock:
+                thread = self.threads.get(kind)
+            if thread is not None:
+                thread.join()
+            if kind not in self.instances:
+                raise RuntimeError(f"Could not build the {kind} detector")
+
+    def close(self):
+        """Release every built detector (waits for builds still running)"""
+        while True:
+            with self.lock:
+                threads = list(self.threads.values())
+            if not threads:
+                break
+            for thread in threads:
+                thread.join()
+        for detector in list(self.instances.values()) + self.retired:
+            detector.close()
+        self.instances.clear()
+        self.retired = []
@@ -0,0 +1,133 @@
+import numpy as np
+
+import config
+from features import EMOTIONS, extract_features_batch
+from filters import OneEuroFilter
+
+# Landmark used to follow a face between frames (nose tip)
+ANCHOR_INDEX = 4
+
+
+class FaceSlots:
+    """Struct-of-arrays avatar state for up to capacity faces with stable ids
+
+    Every per-face value is a row in a fixed-size array, so features, identity
+    matching and smoothing are one vectorized pass whatever the number of
+    faces. A face keeps its slot (and so its place on the canvas) while it is
+    tracked; slots not matched for lost_timeout seconds are freed.
+    """
+
+    def __init__(self, capacity, lost_timeout=config.FACE_LOST_TIMEOUT,
+                 match_distance=config.FACE_MATCH_DISTANCE, smoothing=config.ANIMATION_SMOOTHING):
+        self.capacity = capacity
+        self.lost_timeout = lost_timeout
+        self.match_distance = match_distance
+        self.next_id = 0
+
+        # Identity, -1 = free slot
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.anchors = np.zeros((capacity, 2), dtype=np.float32)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+
+        # Measured avatar parameters
+        self.head_rotation = np.zeros((capacity, 3), dtype=np.float64)
+        self.eye_open = np.ones((capacity, 2), dtype=np.float64)
+        self.mouth_open = np.zeros((capacity, 1), dtype=np.float64)
+        self.emotion = np.zeros(capacity, dtype=np.int64)
+
+        # Values shown on the next rendered frame
+        self.shown = (self.head_rotation, self.eye_open, self.mouth_open)
+
+        self.filters = None
+        if smoothing:
+            settings = config.ANIMATION_FILTER
+            self.filters = tuple(OneEuroFilter(**settings[name])
+                                 for name in ('head_rotation', 'eye_open', 'mouth_open'))
+
+    @property
+    def active(self):
+        return self.ids >= 0
+
+    @property
+    def count(self):
+        return int(np.count_nonzero(self.ids >= 0))
+
+    def match(self, anchors):
+        """Slot of each detected anchor (-1 = new face), greedy nearest-first"""
+        slots = np.full(len(anchors), -1, dtype=np.int64)
+        active = np.flatnonzero(self.ids >= 0)
+        if len(active) == 0 or len(anchors) == 0:
+            return slots
+
+        # (detections, active slots) distance matrix
+        diff = anchors[:, None, :] - self.anchors[active][None, :, :]
+        distance = np.sqrt((diff ** 2).sum(axis=-1))
+        distance[distance > self.match_distance] = np.inf
+        for _ in range(min(distance.shape)):
+            detection, column = np.unravel_index(np.argmin(distance), distance.shape)
+            if not np.isfinite(distance[detection, column]):
+                break
+            slots[detection] = active[column]
+            distance[detection, :] = np.inf
+            distance[:, column] = np.inf
+        return slots
+
+    def update(self, points, timestamp, frame_size):
+        """Add (M, 478, 3) detected faces, returns the slot of each (-1 if no slot was free)"""
+        width, height = frame_size
+        points = np.asarray(points, dtype=np.float32)
+        anchors = points[:, ANCHOR_INDEX, :2]
+        slots = self.match(anchors)
+
+        # New identities take free slots
+        new = np.flatnonzero(slots < 0)
+        free = np.flatnonzero(self.ids < 0)[:len(new)]
+        new = new[:len(free)]
+        slots[new] = free
+        self.ids[free] = np.arange(self.next_id, self.next_id + len(free))
+        self.next_id += len(free)
+
+        seen = slots >= 0
+        rows = slots[seen]
+        if len(rows):
+            features = extract_features_batch(points[seen], width, height)
+            self.anchors[rows] = anchors[seen]
+            self.last_seen[rows] = timestamp
+            self.head_rotation[rows] = features['head_pose']
+            self.eye_open[rows] = features['eye_open']
+            self.mouth_open[rows, 0] = features['mouth_open']
+            self.emotion[rows] = features['emotion']
+
+        # Free slots of faces gone for too long
+        lost = (self.ids >= 0) & (timestamp - self.last_seen > self.lost_timeout)
+        self.ids[lost] = -1
+
+        if self.filters is not None:
+            for one_euro, measured in zip(self.filters, (self.head_rotation, self.eye_open, self.mouth_open)):
+                one_euro.reseed(free, measured)
+                one_euro.update(timestamp, measured)
+        return slots
+
+    def features(self, slot):
+        """Last measured parameters of a slot, in the form of extract_features() output"""
+        return {
+            'head_pose': tuple(self.head_rotation[slot].tolist()),
+            'eye_open': self.eye_open[slot].tolist(),
+            'mouth_open': float(self.mouth_open[slot, 0]),
+            'emotion': EMOTIONS[int(self.emotion[slot])]
+        }
+
+    def animate(self, display_time):
+        """Predict every slot's parameters to display_time into self.shown"""
+        if self.filters is None or self.filters[0].value is None:
+            self.shown = (self.head_rotation, self.eye_open, self.mouth_open)
+            return
+        head, eyes, mouth = (one_euro.predict(display_time) for one_euro in self.filters)
+        self.shown = (head, np.clip(eyes, 0.0, 1.0), np.clip(mouth, 0.0, 1.0))
+
+    def primary(self):
+        """Slot of the oldest tracked identity, None when no face is tracked"""
+        active = np.flatnonzero(self.ids >= 0)
+        if len(active) == 0:
+            return None
+        return int(active[np.argmin(self.ids[active])])
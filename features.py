@@ -0,0 +1,112 @@
+import numpy as np
+
+import config
+
+EMOTIONS = ('neutral', 'happy', 'surprised', 'angry', 'sleepy')
+
+# Eye landmarks in EAR order: outer corner, top-outer, top-inner, inner corner,
+# bottom-inner, bottom-outer. Row 0 = left eye, row 1 = right eye.
+EYE_INDICES = np.array([
+    [33, 160, 158, 133, 153, 144],
+    [362, 385, 387, 263, 373, 380]
+])
+
+# Mouth landmarks: upper lip, lower lip, left corner, right corner
+MOUTH_INDICES = np.array([13, 14, 61, 291])
+
+# Head pose landmarks: nose tip, chin, left eye, right eye
+POSE_INDICES = np.array([4, 152, 33, 263])
+
+# Brow landmarks: left brow, right brow, nose bridge
+BROW_INDICES = np.array([70, 300, 6])
+
+
+def landmarks_to_array(landmark_list):
+    """Convert a MediaPipe NormalizedLandmarkList into an (N, 3) float32 array"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmark_list.landmark], dtype=np.float32)
+
+
+def _distance(a, b):
+    """2D Euclidean distance over the last axis (x, y only, depth is ignored)"""
+    diff = a[..., :2] - b[..., :2]
+    return np.sqrt(np.einsum('...i,...i->...', diff, diff))
+
+
+def extract_features_batch(landmarks, img_w, img_h):
+    """Compute avatar features for a batch of faces in one vectorized pass
+
+    landmarks is an (N, 478, 3) (or (N, 468, 3)) array of normalized face mesh
+    landmarks. Returns a dict of per-frame arrays:
+      ear (N, 2), eye_open (N, 2), mar (N,), mouth_open (N,),
+      head_pose (N, 3) as pitch/yaw/roll, smile_ratio (N,), brow_height (N,),
+      emotion (N,) as indices into EMOTIONS
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+
+    # Eye Aspect Ratio for both eyes at once: (N, 2, 6, 3)
+    eyes = landmarks[:, EYE_INDICES]
+    vertical = _distance(eyes[:, :, 1], eyes[:, :, 5]) + _distance(eyes[:, :, 2], eyes[:, :, 4])
+    horizontal = _distance(eyes[:, :, 0], eyes[:, :, 3])
+    ear = np.divide(vertical, 2.0 * horizontal, out=np.zeros_like(vertical), where=horizontal > 0)
+    eye_open = np.clip(ear * config.EAR_MULTIPLIER, 0.0, 1.0)
+
+    # Mouth Aspect Ratio and smile ratio share the same two distances
+    mouth = landmarks[:, MOUTH_INDICES]
+    mouth_height = _distance(mouth[:, 0], mouth[:, 1])
+    mouth_width = _distance(mouth[:, 2], mouth[:, 3])
+    mar = np.divide(mouth_height, mouth_width, out=np.zeros_like(mouth_height), where=mouth_width > 0)
+    smile_ratio = np.divide(mouth_width, mouth_height, out=np.zeros_like(mouth_width), where=mouth_height > 0)
+    mouth_open = np.clip(mar * config.MAR_MULTIPLIER, 0.0, 1.0)
+
+    # Head pose in pixel space: yaw from the eye center offset, pitch from
+    # nose-chin height, roll from the eye line
+    pose = landmarks[:, POSE_INDICES]
+    nose, chin, left_eye, right_eye = pose[:, 0], pose[:, 1], pose[:, 2], pose[:, 3]
+    eye_center_x = (left_eye[:, 0] + right_eye[:, 0]) * (img_w / 2)
+    yaw = (eye_center_x - img_w / 2) / (img_w / 2) * 45
+    pitch = (nose[:, 1] - chin[:, 1]) * 90
+    roll = np.degrees(np.arctan2((right_eye[:, 1] - left_eye[:, 1]) * img_h,
+                                 (right_eye[:, 0] - left_eye[:, 0]) * img_w))
+    head_pose = np.stack((pitch, yaw, roll), axis=-1)
+
+    # Eyebrow height relative to the nose bridge
+    brow = landmarks[:, BROW_INDICES]
+    brow_height = (brow[:, 0, 1] + brow[:, 1, 1]) / 2 - brow[:, 2, 1]
+
+    # Emotion rules, the first matching one wins
+    emotion = np.select(
+        [
+            smile_ratio > config.SMILE_THRESHOLD,
+            mouth_open > config.SURPRISED_THRESHOLD,
+            brow_height < config.ANGRY_THRESHOLD,
+            (eye_open < config.SLEEPY_THRESHOLD).all(axis=1)
+        ],
+        [1, 2, 3, 4],
+        default=0
+    )
+
+    return {
+        'ear': ear,
+        'eye_open': eye_open,
+        'mar': mar,
+        'mouth_open': mouth_open,
+        'head_pose': head_pose,
+        'smile_ratio': smile_ratio,
+        'brow_height': brow_height,
+        'emotion': emotion
+    }
+
+
+def extract_features(landmarks, img_w, img_h):
+    """Compute avatar features for a single (478, 3) face as plain Python values"""
+    batch = extract_features_batch(np.asarray(landmarks)[None], img_w, img_h)
+    return {
+        'ear': batch['ear'][0].tolist(),
+        'eye_open': batch['eye_open'][0].tolist(),
+        'mar': float(batch['mar'][0]),
+        'mouth_open': float(batch['mouth_open'][0]),
+        'head_pose': tuple(batch['head_pose'][0].tolist()),
+        'smile_ratio': float(batch['smile_ratio'][0]),
+        'brow_height': float(batch['brow_height'][0]),
+        'emotion': EMOTIONS[int(batch['emotion'][0])]
+    }
@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+
+import config
+
+
+def smoothing_factor(elapsed, cutoff):
+    """Exponential smoothing factor of a first-order low-pass at cutoff Hz"""
+    r = 2 * math.pi * cutoff * elapsed
+    return r / (r + 1)
+
+
+class OneEuroFilter:
+    """One Euro filter over a vector of values, with forward prediction
+
+    Low speeds get a low cutoff (no jitter), high speeds a higher one (little
+    lag). The filtered derivative is kept so the value can be extrapolated to
+    the time a frame is actually displayed.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, max_horizon=config.MAX_EXTRAPOLATION_TIME):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_horizon = max_horizon
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.derivative = None
+        self.timestamp = None
+
+    def reseed(self, rows, value):
+        """Restart rows (first axis) of a batched filter at value, e.g. for a new face"""
+        if self.value is not None:
+            self.value[rows] = np.asarray(value, dtype=np.float64)[rows]
+            self.derivative[rows] = 0.0
+
+    def update(self, timestamp, value):
+        """Add a measurement taken at timestamp, returns the filtered value"""
+        value = np.asarray(value, dtype=np.float64)
+        if self.value is None:
+            self.value = value.copy()
+            self.derivative = np.zeros_like(value)
+            self.timestamp = timestamp
+            return self.value
+
+        elapsed = timestamp - self.timestamp
+        if elapsed <= 0:
+            return self.value
+
+        alpha_d = smoothing_factor(elapsed, self.d_cutoff)
+        self.derivative += alpha_d * ((value - self.value) / elapsed - self.derivative)
+
+        # Cutoff rises with speed, per component
+        cutoff = self.min_cutoff + self.beta * np.abs(self.derivative)
+        self.value += smoothing_factor(elapsed, cutoff) * (value - self.value)
+        self.timestamp = timestamp
+        return self.value
+
+    def predict(self, timestamp):
+        """Filtered value extrapolated to timestamp (at most max_horizon ahead)"""
+        if self.value is None:
+            return None
+        ahead = min(max(timestamp - self.timestamp, 0.0), self.max_horizon)
+        return self.value + self.derivative * ahead
+
+
+class AvatarFilter:
+    """Smooths head rotation, eye and mouth openness and predicts them to display time"""
+
+    def __init__(self, settings=config.ANIMATION_FILTER):
+        self.filters = {name: OneEuroFilter(**params) for name, params in settings.items()}
+
+    def reset(self):
+        for one_euro in self.filters.values():
+            one_euro.reset()
+
+    def update(self, timestamp, features):
+        """Feed one frame of extract_features() output measured at timestamp"""
+        self.filters['head_rotation'].update(timestamp, features['head_pose'])
+        self.filters['eye_open'].update(timestamp, features['eye_open'])
+        self.filters['mouth_open'].update(timestamp, (features['mouth_open'],))
+
+    def predict(self, timestamp):
+        """(head_rotation, eye_open_ratio, mouth_open_ratio) at timestamp, None before any update"""
+        head = self.filters['head_rotation'].predict(timestamp)
+        if head is None:
+            return None
+        eyes = np.clip(self.filters['eye_open'].predict(timestamp), 0.0, 1.0)
+        mouth = np.clip(self.filters['mouth_open'].predict(timestamp), 0.0, 1.0)
+        return head.tolist(), eyes.tolist(), float(mouth[0])
+
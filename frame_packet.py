@@ -0,0 +1,51 @@
+import time
+import cv2
+import numpy as np
+
+
+class FramePacket:
+    """Per-frame data shared by every detector and render stage"""
+
+    __slots__ = ('frame', 'rgb', 'width', 'height', 'timestamp', 'index',
+                 'face_landmarks', 'hand_landmarks')
+
+    def __init__(self, frame, timestamp=None, index=0, convert=True):
+        # Mirrored BGR frame (background removal and overlays write into this)
+        self.frame = frame
+
+        # Single BGR -> RGB conversion for Face Mesh, Hands and Selfie Segmentation.
+        # Marked read-only so MediaPipe can take it by reference instead of copying.
+        if convert:
+            self.rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            self.rgb.flags.writeable = False
+        else:
+            self.rgb = None
+
+        self.height, self.width = frame.shape[:2]
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.index = index
+
+        # Raw detector outputs for this frame, None while the detector has not run:
+        # face (478, 3) array, hands list of (label, (21, 3) array)
+        self.face_landmarks = None
+        self.hand_landmarks = None
+
+    @classmethod
+    def from_capture(cls, raw_frame, timestamp=None, index=0, mirror=True):
+        """Build a packet from a raw webcam frame, mirrored like the live view"""
+        if timestamp is None:
+            timestamp = time.time()
+        frame = cv2.flip(raw_frame, 1) if mirror else raw_frame
+        return cls(frame, timestamp=timestamp, index=index)
+
+    @classmethod
+    def blank(cls, size, timestamp=None, index=0):
+        """Packet with an empty frame and no RGB copy, for replaying recorded landmarks"""
+        width, height = size
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        return cls(frame, timestamp=timestamp, index=index, convert=False)
+
+    @property
+    def size(self):
+        """Frame size as (width, height)"""
+        return self.width, self.height
@@ -0,0 +1,274 @@
+"""Shared-memory frame ring: finished canvases for local compositors
+
+Usage:
+    python main.py --frame-ring [--no-window]       # publish canvases
+    python frame_ring.py read [--name vtuber_frames] # reference reader (shows / counts frames)
+    python frame_ring.py remove [--name vtuber_frames]   # delete a ring left by a crashed session
+
+The ring is one POSIX shared-memory segment (/dev/shm/<name> on Linux):
+
+    header (64 bytes)   RING_HEADER_DTYPE: magic, version, width, height,
+                        channels, format ('BGR8'), slot count, frame counter
+                        and timestamp of the newest complete frame
+    slot table          SLOT_DTYPE per slot: seqlock sequence, frame number,
+                        timestamp
+    slot images         height * width * channels bytes per slot
+
+Each slot is guarded by a seqlock: the writer makes the slot's sequence odd,
+writes the image, then makes it even again. A reader notes the (even)
+sequence, uses the image and checks the sequence again; if it changed the
+frame was torn and is read again from the newest slot. With several slots the
+writer fills the others first, so a reader holding a zero-copy view of the
+newest frame has (slots - 1) frame times to finish before it can be overwritten.
+"""
+import time
+import argparse
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+import config
+
+MAGIC = b'VTFR'
+VERSION = 1
+
+RING_HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u4'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('channels', '<u4'),
+    ('format', 'S4'),
+    ('slots', '<u4'),
+    ('latest_slot', '<u4'),
+    ('frame', '<u8'),
+    ('timestamp', '<f8'),
+    ('reserved', 'u1', (16,))
+])
+
+SLOT_DTYPE = np.dtype([
+    ('sequence', '<u8'),
+    ('frame', '<u8'),
+    ('timestamp', '<f8'),
+    ('reserved', 'u1', (8,))
+])
+
+
+def ring_layout(width, height, channels, slots):
+    """(slot table offset, first image offset, image size, total size) in bytes"""
+    table = RING_HEADER_DTYPE.itemsize
+    images = table + SLOT_DTYPE.itemsize * slots
+    # Images start on a cache line
+    images = (images + 63) // 64 * 64
+    image_size = width * height * channels
+    return table, images, image_size, images + image_size * slots
+
+
+class RingViews:
+    """NumPy views of the header, slot table and slot images of a ring segment"""
+
+    def __init__(self, buffer, width, height, channels, slots):
+        table, images, image_size, _ = ring_layout(width, height, channels, slots)
+        self.header = np.ndarray((), dtype=RING_HEADER_DTYPE, buffer=buffer)
+        self.slots = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=buffer, offset=table)
+        self.images = np.ndarray((slots, height, width, channels), dtype=np.uint8,
+                                 buffer=buffer, offset=images)
+
+
+class FrameRingWriter:
+    """Publishes canvases into a shared-memory ring (one copy per frame)"""
+
+    def __init__(self, size, name=config.FRAME_RING_NAME, slots=config.FRAME_RING_SLOTS, channels=3):
+        width, height = size
+        self.name = name
+        *_, total = ring_layout(width, height, channels, slots)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        except FileExistsError:
+            # Another session may still be publishing (or readers attached) under
+            # this name, never take it over
+            raise FileExistsError(f"Frame ring '{name}' already exists; if no session is publishing to it, "
+                                  f"remove it with: python frame_ring.py remove --name {name}") from None
+
+        self.views = RingViews(self.shm.buf, width, height, channels, slots)
+        self.views.slots[:] = np.zeros(1, dtype=SLOT_DTYPE)
+        header = self.views.header
+        header['version'] = VERSION
+        header['width'] = width
+        header['height'] = height
+        header['channels'] = channels
+        header['format'] = b'BGR8' if channels == 3 else b'BGRA'
+        header['slots'] = slots
+        header['frame'] = 0
+        # Magic last, readers treat the ring as ready once it is set
+        header['magic'] = MAGIC
+        self.slot_count = slots
+        self.frames = 0
+
+    def write(self, canvas, timestamp=None):
+        """Copy a finished canvas into the next slot and publish it"""
+        if timestamp is None:
+            timestamp = time.time()
+        views = self.views
+        slot = self.frames % self.slot_count
+        entry = views.slots[slot:slot + 1]
+
+        entry['sequence'] += 1  # odd: being written
+        np.copyto(views.images[slot], canvas)
+        entry['frame'] = self.frames + 1
+        entry['timestamp'] = timestamp
+        entry['sequence'] += 1  # even: complete
+
+        self.frames += 1
+        header = views.header
+        header['latest_slot'] = slot
+        header['timestamp'] = timestamp
+        header['frame'] = self.frames
+
+    def close(self):
+        """Mark the ring closed and remove the segment (attached readers keep their mapping)"""
+        self.views.header['magic'] = b'\0\0\0\0'
+        del self.views
+        self.shm.close()
+        self.shm.unlink()
+
+
+def remove_ring(name=config.FRAME_RING_NAME):
+    """Unlink a ring segment left over from a session that did not exit cleanly"""
+    stale = shared_memory.SharedMemory(name=name)
+    stale.close()
+    stale.unlink()
+
+
+class FrameRingReader:
+    """Reads frames from a ring published by FrameRingWriter
+
+    read() returns a copy; read(copy=False) returns a view into shared memory
+    together with a token, and still_valid(token) tells whether the writer has
+    started overwriting it since.
+    """
+
+    def __init__(self, name=config.FRAME_RING_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Attaching registers the segment for removal at exit, only the writer may unlink it
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        header = np.frombuffer(self.shm.buf, dtype=RING_HEADER_DTYPE, count=1)[0].copy()
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            self.shm.close()
+            raise ValueError(f"Not a VTuber frame ring: {name}")
+        self.width = int(header['width'])
+        self.height = int(header['height'])
+        self.channels = int(header['channels'])
+        self.format = header['format'].decode('ascii')
+        self.views = RingViews(self.shm.buf, self.width, self.height, self.channels, int(header['slots']))
+        self.last_frame = 0
+        self.torn = 0
+
+    @property
+    def latest_frame(self):
+        return int(self.views.header['frame'])
+
+    @property
+    def closed(self):
+        return self.views.header['magic'] != MAGIC
+
+    def read(self, copy=True, out=None):
+        """Newest complete frame as (image, frame number, timestamp), None if nothing new
+
+        With copy=False the image is a zero-copy view and a (slot, sequence)
+        token is returned as fourth item.
+        """
+        views = self.views
+        while True:
+            if int(views.header['frame']) == self.last_frame:
+                return None
+            slot = int(views.header['latest_slot'])
+            entry = views.slots[slot]
+            sequence = int(entry['sequence'])
+            if sequence & 1:
+                self.torn += 1
+                continue  # Being written, the header already points elsewhere or soon will
+            frame, timestamp = int(entry['frame']), float(entry['timestamp'])
+            if copy:
+                if out is None:
+                    image = views.images[slot].copy()
+                else:
+                    np.copyto(out, views.images[slot])
+                    image = out
+            else:
+                image = views.images[slot]
+            if int(views.slots[slot]['sequence']) != sequence:
+                self.torn += 1
+                continue  # Overwritten while copying, try the newest again
+            self.last_frame = frame
+            if copy:
+                return image, frame, timestamp
+            return image, frame, timestamp, (slot, sequence)
+
+    def still_valid(self, token):
+        """True while the slot behind a zero-copy view has not been rewritten"""
+        slot, sequence = token
+        return int(self.views.slots[slot]['sequence']) == sequence
+
+    def close(self):
+        del self.views
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read VTuber canvases from the shared-memory frame ring")
+    commands = parser.add_subparsers(dest='command', required=True)
+    read = commands.add_parser('read', help="show (or just count) frames from the ring")
+    read.add_argument('--name', default=config.FRAME_RING_NAME)
+    read.add_argument('--no-window', action='store_true', help="only print frame statistics")
+    remove = commands.add_parser('remove', help="delete a ring left over by a session that did not exit cleanly")
+    remove.add_argument('--name', default=config.FRAME_RING_NAME)
+    args = parser.parse_args()
+
+    if args.command == 'remove':
+        try:
+            remove_ring(args.name)
+        except FileNotFoundError:
+            print(f"No frame ring named '{args.name}'")
+            return
+        print(f"Removed frame ring '{args.name}'")
+        return
+
+    reader = FrameRingReader(args.name)
+    print(f"Reading {reader.width}x{reader.height} {reader.format} frames from '{args.name}' (Ctrl+C to stop)")
+    if not args.no_window:
+        import cv2
+    frame_buffer = np.empty((reader.height, reader.width, reader.channels), dtype=np.uint8)
+    window_start, received, skipped, latencies = time.time(), 0, 0, []
+    previous = None
+    try:
+        while not reader.closed:
+            result = reader.read(out=frame_buffer)
+            if result is None:
+                time.sleep(0.001)
+            else:
+                image, frame, timestamp = result
+                if previous is not None:
+                    skipped += frame - previous - 1
+                previous = frame
+                received += 1
+                latencies.append(time.time() - timestamp)
+                if not args.no_window:
+                    cv2.imshow('VTuber Frame Ring', image)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+
+            now = time.time()
+            if now - window_start >= 1.0:
+                latency = np.mean(latencies) * 1000 if latencies else 0.0
+                print(f"{received / (now - window_start):6.1f} FPS  latency {latency:5.2f}ms  "
+                      f"skipped {skipped}  torn retries {reader.torn}")
+                window_start, received, skipped, latencies = now, 0, 0, []
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import numpy as np
+
+import config
+
+# Gesture codes, stored in motion tracks and streamed packets: only append
+GESTURES = ('none', 'peace', 'open', 'fist', 'point', 'thumbs_up', 'ok', 'rock', 'call', 'three')
+
+# Declarative gesture table, first matching row wins. Each pattern gives the
+# required state of: thumb, index, middle, ring, pinky ('1' extended, '0'
+# folded) and thumb-index pinch ('1' touching); '.' = don't care.
+GESTURE_TABLE = [
+    ('ok',        '..1111'),
+    ('peace',     '.1100.'),
+    ('three',     '.1110.'),
+    ('rock',      '.1001.'),
+    ('call',      '10001.'),
+    ('thumbs_up', '10000.'),
+    ('open',      '.1111.'),
+    ('point',     '.10...'),
+    ('fist',      '.0000.'),
+]
+
+# Hand landmarks of each finger from base to tip, row 0 = thumb
+FINGER_JOINTS = np.array([
+    [1, 2, 3, 4],
+    [5, 6, 7, 8],
+    [9, 10, 11, 12],
+    [13, 14, 15, 16],
+    [17, 18, 19, 20]
+])
+
+WRIST, INDEX_MCP, MIDDLE_MCP = 0, 5, 9
+STATE_BITS = 6
+
+
+def compile_table(table=GESTURE_TABLE):
+    """Lookup array from every finger-state code (0-63) to a gesture code
+
+    Matching is done once here, so classifying a hand is a single table
+    lookup however many gestures the table holds.
+    """
+    codes = np.arange(1 << STATE_BITS)
+    bits = (codes[:, None] >> np.arange(STATE_BITS)) & 1
+    lookup = np.zeros(len(codes), dtype=np.uint8)
+    assigned = np.zeros(len(codes), dtype=bool)
+    for name, pattern in table:
+        match = ~assigned
+        for bit, required in enumerate(pattern):
+            if required != '.':
+                match &= bits[:, bit] == int(required)
+        lookup[match] = GESTURES.index(name)
+        assigned |= match
+    return lookup
+
+
+GESTURE_LOOKUP = compile_table()
+
+
+def hand_features(landmarks, aspect=1.0):
+    """Per-finger features for a batch of hands in one vectorized pass
+
+    landmarks is an (N, 21, 3) array of normalized hand landmarks, aspect the
+    frame's width / height (so distances are isotropic). Returns:
+      curl (N, 5) total bend at a finger's two middle joints over 180 degrees,
+        0 = straight, about 1 for a finger folded into the palm
+      pinch (N, 4) thumb tip to the other fingertips over palm size
+      thumb_spread (N,) thumb tip to the index knuckle over palm size
+    """
+    points = np.array(landmarks, dtype=np.float32)
+    points[..., 0] *= aspect
+    points[..., 2] *= aspect
+
+    palm = np.linalg.norm(points[:, MIDDLE_MCP] - points[:, WRIST], axis=-1)
+    palm = np.maximum(palm, 1e-6)[:, None]
+
+    # (N, 5, 3, 3) bone vectors, base to tip
+    bones = np.diff(points[:, FINGER_JOINTS], axis=2)
+    lengths = np.maximum(np.linalg.norm(bones, axis=-1), 1e-6)
+    cos = (bones[:, :, :-1] * bones[:, :, 1:]).sum(axis=-1) / (lengths[:, :, :-1] * lengths[:, :, 1:])
+    curl = np.arccos(np.clip(cos, -1.0, 1.0)).sum(axis=-1) / np.pi
+
+    tips = points[:, FINGER_JOINTS[:, 3]]
+    pinch = np.linalg.norm(tips[:, 1:] - tips[:, :1], axis=-1) / palm
+    thumb_spread = np.linalg.norm(tips[:, 0] - points[:, INDEX_MCP], axis=-1) / palm[:, 0]
+
+    return {
+        'curl': curl,
+        'pinch': pinch,
+        'thumb_spread': thumb_spread
+    }
+
+
+def finger_states(features, previous=None):
+    """(N, 6) bool finger states: 5 extended flags and the thumb-index pinch
+
+    With the previous states of the same hands each flag has hysteresis: it
+    only flips once its feature has crossed the far threshold of its pair.
+    """
+    curl_on, curl_off = config.GESTURE_CURL_THRESHOLDS
+    spread_on, spread_off = config.GESTURE_THUMB_SPREAD
+    pinch_on, pinch_off = config.GESTURE_PINCH_DISTANCE
+
+    curl = features['curl']
+    spread = features['thumb_spread'][:, None]
+    pinch = features['pinch'][:, :1]
+    if previous is None:
+        extended = curl < (curl_on + curl_off) / 2
+        spread_out = spread > (spread_on + spread_off) / 2
+        pinched = pinch < (pinch_on + pinch_off) / 2
+    else:
+        extended = np.where(previous[:, :5], curl < curl_off, curl < curl_on)
+        spread_out = np.where(previous[:, :1], spread > spread_off, spread > spread_on)
+        pinched = np.where(previous[:, 5:], pinch < pinch_off, pinch < pinch_on)
+
+    # The thumb barely curls, it counts as extended when it also sticks out
+    extended[:, :1] &= spread_out
+    return np.concatenate([extended, pinched], axis=1)
+
+
+def classify(landmarks, aspect=1.0, previous=None):
+    """Gesture codes (N,) and finger states (N, 6) of a batch of (N, 21, 3) hands"""
+    states = finger_states(hand_features(landmarks, aspect), previous)
+    codes = GESTURE_LOOKUP[states @ (1 << np.arange(STATE_BITS))]
+    return codes, states
+
+
+def hold_sequence(codes, hold_frames):
+    """Temporal hysteresis over a sequence of gesture codes (one hand, consecutive frames)
+
+    A new gesture is only shown once it lasted hold_frames frames; shorter runs
+    keep showing the previous gesture. Works per run, not per frame.
+    """
+    codes = np.asarray(codes)
+    if hold_frames <= 1 or len(codes) == 0:
+        return codes.copy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, len(codes)])
+
+    shown = codes.copy()
+    current = codes[0]
+    for start, length in zip(starts, lengths):
+        value = codes[start]
+        if value == current:
+            continue
+        if length >= hold_frames:
+            # Switches once the run has been seen hold_frames times
+            shown[start:start + hold_frames - 1] = current
+            current = value
+        else:
+            shown[start:start + length] = current
+    return shown
+
+
+class GestureEngine:
+    """Per-hand gesture recognition for the live loop
+
+    Finger states keep their threshold hysteresis between frames, and a hand
+    only switches gesture after hold_frames consecutive detections of the new
+    one (1 = switch immediately).
+    """
+
+    def __init__(self, hold_frames=None):
+        if hold_frames is None:
+            hold_frames = config.GESTURE_SMOOTHING_FRAMES if config.GESTURE_SMOOTHING else 1
+        self.hold_frames = hold_frames
+        self.states = {}
+        self.shown = {}
+        self.candidate = {}
+        self.count = {}
+
+    def reset(self, hand=None):
+        for state in (self.states, self.shown, self.candidate, self.count):
+            if hand is None:
+                state.clear()
+            else:
+                state.pop(hand, None)
+
+    def update(self, hands, landmarks, aspect=1.0):
+        """Classify one frame: hand labels and their (K, 21, 3) landmarks, returns gesture names"""
+        previous = None
+        if hands and all(hand in self.states for hand in hands):
+            previous = np.stack([self.states[hand] for hand in hands])
+        codes, states = classify(landmarks, aspect, previous)
+
+        names = []
+        for hand, code, state in zip(hands, codes.tolist(), states):
+            self.states[hand] = state
+            names.append(GESTURES[self.hold(hand, code)])
+        return names
+
+    def hold(self, hand, code):
+        """Gesture code to show for a hand after a new detection"""
+        if hand not in self.shown or self.hold_frames <= 1:
+            self.shown[hand] = code
+            return code
+        if code == self.shown[hand]:
+            self.count[hand] = 0
+            return code
+
+        if code == self.candidate.get(hand):
+            self.count[hand] += 1
+        else:
+            self.candidate[hand] = code
+            self.count[hand] = 1
+        if self.count[hand] >= self.hold_frames:
+            self.shown[hand] = code
+            self.count[hand] = 0
+        return self.shown[hand]
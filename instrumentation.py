@@ -0,0 +1,175 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+
+import config
+
+
+class Histogram:
+    """Fixed-size log-scale histogram of durations (seconds)
+
+    Bins cover 1 microsecond to 10 seconds with BINS_PER_DECADE bins per decade,
+    so recording a sample is one log10 and one list increment.
+    """
+
+    MIN_EXPONENT = -6
+    MAX_EXPONENT = 1
+    BINS_PER_DECADE = 10
+
+    def __init__(self):
+        self.bin_count = (self.MAX_EXPONENT - self.MIN_EXPONENT) * self.BINS_PER_DECADE + 1
+        self.bins = [0] * self.bin_count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Moving average for live display
+        self.recent = 0.0
+
+    def record(self, seconds):
+        """Add one duration sample"""
+        if seconds > 0:
+            index = int((math.log10(seconds) - self.MIN_EXPONENT) * self.BINS_PER_DECADE)
+            index = min(max(index, 0), self.bin_count - 1)
+        else:
+            index = 0
+        self.bins[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent += 0.1 * (seconds - self.recent) if self.count > 1 else seconds
+
+    def bin_upper_bound(self, index):
+        """Upper edge of a bin in seconds"""
+        return 10 ** (self.MIN_EXPONENT + (index + 1) / self.BINS_PER_DECADE)
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100) in seconds"""
+        if self.count == 0:
+            return 0.0
+        target = self.count * q / 100.0
+        cumulative = 0
+        for index, count in enumerate(self.bins):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.bin_upper_bound(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        """Stats in milliseconds"""
+        return {
+            'count': self.count,
+            'mean_ms': self.mean * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000
+        }
+
+
+class Span:
+    """Context manager timing one named stage"""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class NullSpan:
+    """No-op span used when profiling is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    """Hot-path timing spans collected into per-stage histograms
+
+    When tracing is enabled the most recent spans are also kept in a bounded
+    buffer that can be written out as Chrome trace-event JSON
+    (open in chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self, enabled=config.PROFILING_ENABLED, trace=config.TRACE_ENABLED,
+                 trace_buffer_size=config.TRACE_BUFFER_SIZE):
+        self.enabled = enabled
+        self.trace = trace
+        self.histograms = {}
+        self.events = deque(maxlen=trace_buffer_size)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        """Time the enclosed block under the given stage name"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name, start, end):
+        """Record a span measured with time.perf_counter()"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.record(end - start)
+        if self.trace:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def breakdown(self):
+        """Recent average time per stage in milliseconds, in first-seen order"""
+        return [(name, histogram.recent * 1000) for name, histogram in list(self.histograms.items())]
+
+    def summary(self):
+        """Histogram stats for every stage"""
+        return {name: histogram.summary() for name, histogram in list(self.histograms.items())}
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.events.clear()
+
+    def dump_trace(self, path):
+        """Write buffered spans as Chrome trace-event JSON, returns event count"""
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events = []
+        for tid, name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': name}})
+        spans = list(self.events)
+        for name, start, end, tid in spans:
+            events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self.origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': tid
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'stages': self.summary()}}, f)
+        return len(spans)
@@ -0,0 +1,279 @@
+"""Raw landmark captures: replay tracking results without running MediaPipe
+
+Usage:
+    python landmark_cache.py analyze session.landmarks [--set SMILE_THRESHOLD=4.0]
+    python landmark_cache.py render session.landmarks output.mp4 [--style anime]
+
+A capture stores the raw face (478x3) and hand (21x3 per hand, plus handedness)
+landmarks of every frame as float16 in a record file (see record_file.py), so
+record number = frame index. Replaying feeds them through the same feature,
+emotion, gesture and rendering code as the live app, which makes threshold
+tuning take seconds and gives deterministic fixtures.
+"""
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+import config
+from features import EMOTIONS, extract_features_batch
+from gestures import GESTURE_LOOKUP, GESTURES, STATE_BITS, finger_states, hand_features, hold_sequence
+from frame_packet import FramePacket
+from record_file import RecordWriter, read_records
+
+MAGIC = b'VTLMARK1'
+FACE_POINTS = 478
+HAND_POINTS = 21
+HANDS = ('left', 'right')
+
+LANDMARK_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('timestamp', '<f8'),
+    ('face_present', 'u1'),
+    # Hands ran on this frame (on skipped frames replay extrapolates like the live app)
+    ('hands_run', 'u1'),
+    ('hand_count', 'u1'),
+    ('hand_label', 'u1', (2,)),
+    ('face', '<f2', (FACE_POINTS, 3)),
+    ('hands', '<f2', (2, HAND_POINTS, 3))
+])
+
+
+class LandmarkWriter(RecordWriter):
+    """Appends the raw landmarks of each processed frame packet"""
+
+    def __init__(self, path, frame_size=(640, 480), chunk_frames=config.LANDMARK_CAPTURE_CHUNK_FRAMES):
+        super().__init__(path, MAGIC, LANDMARK_DTYPE, {'version': 1, 'frame_size': list(frame_size)},
+                         chunk_frames)
+
+    def append(self, packet):
+        """Store packet.face_landmarks / packet.hand_landmarks"""
+        record = self.next_record()
+        record['frame'] = packet.index
+        record['timestamp'] = packet.timestamp
+        if packet.face_landmarks is not None:
+            record['face_present'] = 1
+            # 468 points without iris refinement, the iris rows stay zero
+            face = packet.face_landmarks[:FACE_POINTS]
+            record['face'][:len(face)] = face
+        if packet.hand_landmarks is not None:
+            record['hands_run'] = 1
+            hands = packet.hand_landmarks[:2]
+            record['hand_count'] = len(hands)
+            for i, (label, points) in enumerate(hands):
+                record['hand_label'][i] = HANDS.index(label)
+                record['hands'][i] = points
+        self.commit()
+
+
+class LandmarkReplay:
+    """Memory-mapped landmark capture that drives the avatar without inference"""
+
+    def __init__(self, path):
+        self.metadata, self.records = read_records(path, MAGIC, LANDMARK_DTYPE)
+        self.frame_size = tuple(self.metadata['frame_size'])
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        if len(self.records) == 0:
+            return 0.0
+        return float(self.records['timestamp'][-1] - self.records['timestamp'][0])
+
+    def sample(self, fps):
+        """Record index shown at each output frame of a constant-rate timeline"""
+        timestamps = self.records['timestamp']
+        if len(timestamps) == 0:
+            return np.zeros(0, dtype=np.int64)
+        frame_count = int(self.duration * fps) + 1
+        times = timestamps[0] + np.arange(frame_count) / fps
+        # Latest record captured at or before each output time
+        return np.searchsorted(timestamps, times, side='right') - 1
+
+    def packet(self, index):
+        """Blank frame packet carrying record index's timestamp and frame number"""
+        record = self.records[index]
+        return FramePacket.blank(self.frame_size, timestamp=float(record['timestamp']),
+                                 index=int(record['frame']))
+
+    def hands(self, index):
+        """(label, (21, 3) landmark array) pairs of record index, None if hands did not run"""
+        record = self.records[index]
+        if not record['hands_run']:
+            return None
+        return [(HANDS[record['hand_label'][i]], record['hands'][i].astype(np.float32))
+                for i in range(record['hand_count'])]
+
+    def apply(self, avatar, index, packet=None):
+        """Feed record index into the avatar's face and hand stages, returns face_detected"""
+        if packet is None:
+            packet = self.packet(index)
+        record = self.records[index]
+
+        hands = self.hands(index)
+        with avatar.state_lock:
+            if hands is not None:
+                avatar.update_hands(hands, packet)
+            else:
+                avatar.predict_hands(packet.timestamp)
+
+        if not record['face_present']:
+            return avatar.update_faces(None, packet)
+        # Same path as live detection, so the mesh shows on the preview
+        return avatar.update_faces(record['face'][None].astype(np.float32), packet)
+
+    def gestures(self, hold_frames=None):
+        """Gesture codes of every hand-tracking frame per hand: {label: (frame indices, codes)}
+
+        Features of all hands are computed in one batch. Finger states are
+        then thresholded frame by frame with the previous states of the same
+        hands, and the temporal hold is applied per hand, both forgotten on a
+        frame where hand tracking found no hand, like GestureEngine in the
+        live app.
+        """
+        if hold_frames is None:
+            hold_frames = config.GESTURE_SMOOTHING_FRAMES if config.GESTURE_SMOOTHING else 1
+        width, height = self.frame_size
+        records = self.records
+
+        # (frame, hand slot) of every detected hand, in frame order
+        slots = np.arange(2)[None, :]
+        frames, hands = np.nonzero(slots < records['hand_count'][:, None])
+        labels = records['hand_label'][frames, hands]
+        features = hand_features(records['hands'][frames, hands].astype(np.float32), width / height)
+
+        states = np.zeros((len(frames), STATE_BITS), dtype=bool)
+        # Runs of hand-tracking frames between frames that found no hand
+        runs = np.zeros(len(frames), dtype=np.int64)
+        previous = {}
+        run = 0
+        bounds = np.searchsorted(frames, np.arange(len(records) + 1))
+        for frame in np.flatnonzero(records['hands_run']):
+            start, end = bounds[frame], bounds[frame + 1]
+            if start == end:
+                previous.clear()
+                run += 1
+                continue
+            frame_labels = labels[start:end].tolist()
+            last = None
+            if all(label in previous for label in frame_labels):
+                last = np.stack([previous[label] for label in frame_labels])
+            states[start:end] = finger_states({key: value[start:end] for key, value in features.items()}, last)
+            previous.update(zip(frame_labels, states[start:end]))
+            runs[start:end] = run
+        codes = GESTURE_LOOKUP[states @ (1 << np.arange(STATE_BITS))]
+
+        result = {}
+        for code, label in enumerate(HANDS):
+            rows = np.flatnonzero(labels == code)
+            if len(rows) == 0:
+                continue
+            # The hold starts over after every reset
+            splits = np.flatnonzero(np.diff(runs[rows])) + 1
+            held = [hold_sequence(part, hold_frames) for part in np.split(codes[rows], splits)]
+            result[label] = (frames[rows], np.concatenate(held))
+        return result
+
+    def features(self):
+        """Vectorized features of every frame with a face, plus those frames' indices"""
+        present = np.flatnonzero(self.records['face_present'])
+        width, height = self.frame_size
+        faces = self.records['face'][present].astype(np.float32)
+        return present, extract_features_batch(faces, width, height)
+
+
+def render_replay(capture_path, output_path, style='cute', fps=config.RECORDING_FPS):
+    """Render a landmark capture through the full canvas, returns frames written"""
+    from main import VTuberAvatar
+
+    replay = LandmarkReplay(capture_path)
+    # Landmarks come from the capture, no MediaPipe graph is needed
+    avatar = VTuberAvatar(avatar_style=style, use_detectors=False)
+    writer = None
+    written = 0
+    applied = -1
+    try:
+        # Every record is applied in order so tracking state evolves like it did
+        # live; output frames follow a constant-rate timeline and show the
+        # latest record captured before them
+        for index in replay.sample(fps):
+            while applied < index:
+                applied += 1
+                packet = replay.packet(applied)
+                face_detected = replay.apply(avatar, applied, packet)
+            display_time = float(replay.records['timestamp'][0]) + written / fps
+            canvas = avatar.render_canvas(packet.frame, face_detected, packet.timestamp, display_time)
+            if writer is None:
+                fourcc = cv2.VideoWriter_fourcc(*config.RECORDING_CODEC)
+                writer = cv2.VideoWriter(output_path, fourcc, fps, (canvas.shape[1], canvas.shape[0]))
+                if not writer.isOpened():
+                    raise IOError(f"Could not open video writer: {output_path}")
+            writer.write(canvas)
+            written += 1
+    finally:
+        if writer is not None:
+            writer.release()
+        avatar.close()
+    return written
+
+
+def parse_override(text):
+    """NAME=VALUE config override, VALUE parsed as a float"""
+    name, value = text.split('=', 1)
+    if not hasattr(config, name):
+        raise argparse.ArgumentTypeError(f"Unknown config setting: {name}")
+    return name, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze or re-render raw landmark captures")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="print feature, emotion and gesture statistics")
+    analyze.add_argument('capture')
+    analyze.add_argument('--set', type=parse_override, action='append', default=[], metavar='NAME=VALUE',
+                         help="override a config threshold, e.g. SMILE_THRESHOLD=4.0")
+
+    render = commands.add_parser('render', help="replay a capture through the avatar renderer")
+    render.add_argument('capture')
+    render.add_argument('output')
+    render.add_argument('--style', default='cute', choices=['cute', 'anime', 'cool', 'warm'])
+    render.add_argument('--fps', type=float, default=config.RECORDING_FPS)
+    args = parser.parse_args()
+
+    if args.command == 'render':
+        start = time.time()
+        frames = render_replay(args.capture, args.output, style=args.style, fps=args.fps)
+        print(f"Rendered {frames} frames in {time.time() - start:.1f}s: {args.output}")
+        return
+
+    for name, value in args.set:
+        setattr(config, name, value)
+
+    replay = LandmarkReplay(args.capture)
+    start = time.time()
+    present, features = replay.features()
+    gestures = replay.gestures()
+    elapsed = time.time() - start
+
+    print(f"Frames:        {len(replay)} ({len(present)} with a face)")
+    print(f"Hand frames:   {int(np.count_nonzero(replay.records['hand_count']))}")
+    if len(present):
+        emotions = np.bincount(features['emotion'], minlength=len(EMOTIONS))
+        print("Emotions:      " + ", ".join(f"{name} {count}" for name, count in zip(EMOTIONS, emotions)))
+        for key in ('ear', 'mar', 'smile_ratio', 'brow_height'):
+            values = features[key]
+            print(f"{key + ':':<15}mean {values.mean():.3f}  p5 {np.percentile(values, 5):.3f}  "
+                  f"p95 {np.percentile(values, 95):.3f}")
+    for label, (_, codes) in gestures.items():
+        counts = np.bincount(codes, minlength=len(GESTURES))
+        print(f"{label.title() + ' hand:':<15}" + ", ".join(f"{name} {count}"
+                                                           for name, count in zip(GESTURES, counts) if count))
+    print(f"Analyzed in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,78 @@
 import cv2
-import mediapipe as mp
 import numpy as np
-import math
 import time
+import argparse
+import sys
+import threading
 from datetime import datetime
 from collections import deque
 
+import config
+from frame_packet import FramePacket
+from pipeline import PipelinedRunner
+from capture import open_source, WebcamSource
+from detector_pool import DetectorPool
+from scheduler import DetectorScheduler, PositionTrack
+from features import EMOTIONS, extract_features, landmarks_to_array
+from instrumentation import Profiler
+from render_cache import AvatarRenderCache
+from compositor import Compositor
+from background import BackgroundRemover
+from filters import AvatarFilter
+from gestures import GestureEngine
+from roi import ROITracker, crop_to_region, region_to_frame
+from recorder import AsyncRecorder
+from motion_track import MotionTrackWriter
+from landmark_cache import LandmarkWriter
+from faces import FaceSlots
+from detectors import DetectorSet
+from preview import PreviewRenderer
+from quality import QualityController
+from streaming import ParameterStreamer
+from frame_ring import FrameRingWriter
+
+# Styles handed out to extra faces in multi-face mode, in order
+FACE_STYLES = ('cute', 'anime', 'cool', 'warm')
+
+# Short labels drawn on the hand indicator for gestures without an icon
+GESTURE_LABELS = {'thumbs_up': 'Up', 'ok': 'OK', 'rock': 'RK', 'call': 'Hi', 'three': '3'}
+
+
 class VTuberAvatar:
-    def __init__(self, avatar_style='cute'):
-        # Initialize MediaPipe Face Mesh
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
-        
-        # Initialize MediaPipe Hands
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            max_num_hands=2,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        # Background removal
-        self.mp_selfie_segmentation = mp.solutions.selfie_segmentation
-        self.selfie_segmentation = self.mp_selfie_segmentation.SelfieSegmentation(
-            model_selection=1
-        )
+    def __init__(self, avatar_style='cute', use_process_pool=False, max_faces=config.MAX_FACES,
+                 use_detectors=True):
+        # MediaPipe solution settings (also used by the detector worker processes)
+        self.detector_settings = {
+            'face': dict(
+                max_num_faces=max_faces,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ),
+            'hands': dict(
+                max_num_hands=2,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ),
+            'segmentation': dict(
+                model_selection=1
+            )
+        }
+        
+        # MediaPipe solutions are built on first use (or warmed up in the background).
+        # Renderers of recorded state pass use_detectors=False and never build any.
+        self.detectors = DetectorSet(self.detector_settings) if use_detectors else None
+        
+        # Block on a detector still being built (offline / benchmarks); the live
+        # loop runs without it instead until it is ready
+        self.wait_for_detectors = True
+        self.launch_time = time.perf_counter()
+        self.first_frame_time = None
+        
+        # Optional process pool running each detector in its own process
+        # (created on the first frame, once the frame size is known)
+        self.use_process_pool = use_process_pool
+        self.detector_pool = None
         
         # Avatar parameters
         self.avatar_center = (1000, 360)  # Position of avatar on screen
@@ -41,26 +82,89 @@ class VTuberAvatar:
         self.emotion = 'neutral'  # Current emotion
         self.avatar_style = avatar_style
         
-        # Hand tracking
+        # Hand tracking (positions in pixels of a hand_frame_size webcam frame)
         self.hand_positions = {'left': None, 'right': None}
+        self.hand_frame_size = (640, 480)
+        # Canvas the hand indicators are scaled to
+        self.canvas_size = (config.CANVAS_WIDTH, config.CANVAS_HEIGHT)
         self.hand_gestures = {'left': 'none', 'right': 'none'}
         
+        # Multi-face mode: per-face state as struct-of-arrays, one avatar per face.
+        # The scalar parameters above follow the primary (longest tracked) face.
+        self.faces = FaceSlots(max_faces) if max_faces > 1 else None
+        self.face_centers = self.layout_faces(max_faces)
+        
+        # Smoothing / prediction of avatar parameters and gestures
+        self.motion_filter = AvatarFilter() if config.ANIMATION_SMOOTHING else None
+        self.gesture_engine = GestureEngine()
+        
+        # Quality ladder stepped by measured frame time (live loops only)
+        self.quality = QualityController() if config.ADAPTIVE_QUALITY else None
+        
+        # Detector cadence and state reused on frames where a detector is skipped.
+        # The quality ladder owns the cadences while it is active, automatic
+        # cadence would undo its changes.
+        self.scheduler = DetectorScheduler(auto=config.AUTO_CADENCE and self.quality is None)
+        self.hand_tracks = {'left': PositionTrack(), 'right': PositionTrack()}
+        self.background = BackgroundRemover()
+        
+        # Detector input regions planned from the previous frame's landmarks
+        self.face_roi = ROITracker(config.ROI_TARGET_SIZE['face'], config.ROI_PADDING['face'],
+                                   config.ROI_REFRESH_INTERVAL['faces' if self.faces else 'face'])
+        self.hands_roi = ROITracker(config.ROI_TARGET_SIZE['hands'], config.ROI_PADDING['hands'],
+                                    config.ROI_REFRESH_INTERVAL['hands'])
+        
         # Recording
         self.is_recording = False
-        self.video_writer = None
+        self.recorder = None
         self.recording_start_time = None
+        self.motion_writer = None
+        self.landmark_writer = None
+        self.streamer = None
+        self.frame_ring = None
+        self.show_window = True
         
         # Performance metrics
         self.fps_counter = deque(maxlen=30)
         self.current_fps = 0
+        self.profiler = Profiler()
         
         # Background settings
         self.background_color = (50, 150, 50)  # Green screen default
         self.use_background_removal = False
         
+        # Display toggles
+        self.show_mesh = True
+        self.show_hands = True
+        self.show_preview = config.DEFAULT_SHOW_PREVIEW
+        
+        # Last detected landmarks (normalized), drawn over the webcam preview
+        self.preview = PreviewRenderer()
+        self.mesh_faces = None
+        self.mesh_hands = []
+        
+        # Guards avatar state shared between the inference and render threads
+        self.state_lock = threading.Lock()
+        
         # Avatar colors based on style
         self.avatar_colors = self.get_avatar_colors(avatar_style)
         
+        # Sprite cache for avatar parts (None = draw every part each frame)
+        self.render_cache = AvatarRenderCache() if config.RENDER_CACHE_ENABLED else None
+        
+        # Layered canvas compositor (None = redraw the whole canvas each frame)
+        self.compositor = Compositor() if config.COMPOSITOR_ENABLED else None
+        
+    def warm_up_detectors(self):
+        """Start loading the models of the enabled features in the background (live loop only)"""
+        if not config.DETECTOR_WARMUP or self.use_process_pool or self.detectors is None:
+            return
+        self.detectors.warm_up('face')
+        if self.show_hands:
+            self.detectors.warm_up('hands')
+        if self.use_background_removal:
+            self.detectors.warm_up('segmentation')
+    
     def get_avatar_colors(self, style):
         """Get color scheme based on avatar style"""
         color_schemes = {
@@ -107,208 +211,226 @@ class VTuberAvatar:
         }
         return color_schemes.get(style, color_schemes['cute'])
     
-    def calculate_distance(self, p1, p2):
-        """Calculate Euclidean distance between two points"""
-        return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
-    
-    def calculate_eye_aspect_ratio(self, landmarks, eye_indices):
-        """Calculate Eye Aspect Ratio (EAR) to detect blinks"""
-        # Vertical distances
-        v1 = self.calculate_distance(landmarks[eye_indices[1]], landmarks[eye_indices[5]])
-        v2 = self.calculate_distance(landmarks[eye_indices[2]], landmarks[eye_indices[4]])
-        # Horizontal distance
-        h = self.calculate_distance(landmarks[eye_indices[0]], landmarks[eye_indices[3]])
-        
-        ear = (v1 + v2) / (2.0 * h)
-        return ear
-    
-    def calculate_mouth_aspect_ratio(self, landmarks):
-        """Calculate Mouth Aspect Ratio (MAR) to detect mouth opening"""
-        # Upper and lower lip landmarks
-        upper_lip = landmarks[13]
-        lower_lip = landmarks[14]
-        left_mouth = landmarks[61]
-        right_mouth = landmarks[291]
-        
-        vertical = self.calculate_distance(upper_lip, lower_lip)
-        horizontal = self.calculate_distance(left_mouth, right_mouth)
-        
-        mar = vertical / horizontal if horizontal > 0 else 0
-        return mar
-    
-    def estimate_head_pose(self, landmarks, img_w, img_h):
-        """Estimate head pose angles"""
-        # Key facial landmarks for pose estimation
-        nose_tip = landmarks[4]
-        chin = landmarks[152]
-        left_eye = landmarks[33]
-        right_eye = landmarks[263]
-        left_mouth = landmarks[61]
-        right_mouth = landmarks[291]
-        
-        # Convert to pixel coordinates
-        nose_2d = (nose_tip.x * img_w, nose_tip.y * img_h)
-        chin_2d = (chin.x * img_w, chin.y * img_h)
-        left_eye_2d = (left_eye.x * img_w, left_eye.y * img_h)
-        right_eye_2d = (right_eye.x * img_w, right_eye.y * img_h)
-        
-        # Calculate yaw (left-right rotation)
-        eye_center_x = (left_eye_2d[0] + right_eye_2d[0]) / 2
-        face_center_x = img_w / 2
-        yaw = (eye_center_x - face_center_x) / (img_w / 2) * 45
-        
-        # Calculate pitch (up-down rotation)
-        nose_chin_distance = nose_2d[1] - chin_2d[1]
-        pitch = (nose_chin_distance / img_h) * 90
-        
-        # Calculate roll (tilt)
-        dy = right_eye_2d[1] - left_eye_2d[1]
-        dx = right_eye_2d[0] - left_eye_2d[0]
-        roll = math.degrees(math.atan2(dy, dx))
-        
-        return pitch, yaw, roll
-    
-    def detect_emotion(self, landmarks):
-        """Simple emotion detection based on facial features"""
-        # Calculate smile (mouth corners vs center)
-        left_mouth = landmarks[61]
-        right_mouth = landmarks[291]
-        mouth_top = landmarks[13]
-        mouth_bottom = landmarks[14]
-        
-        # Mouth width vs height ratio
-        mouth_width = self.calculate_distance(left_mouth, right_mouth)
-        mouth_height = self.calculate_distance(mouth_top, mouth_bottom)
-        smile_ratio = mouth_width / mouth_height if mouth_height > 0 else 0
-        
-        # Eyebrow position (simple check)
-        left_brow = landmarks[70]
-        right_brow = landmarks[300]
-        nose_bridge = landmarks[6]
-        
-        brow_height = ((left_brow.y + right_brow.y) / 2 - nose_bridge.y)
-        
-        # Determine emotion
-        if smile_ratio > 6.5:
-            return 'happy'
-        elif self.mouth_open_ratio > 0.6:
-            return 'surprised'
-        elif brow_height < -0.02:
-            return 'angry'
-        elif self.eye_open_ratio[0] < 0.3 and self.eye_open_ratio[1] < 0.3:
-            return 'sleepy'
-        else:
-            return 'neutral'
-    
-    def process_hands(self, frame):
+    def process_hands(self, packet):
         """Process hand tracking"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        # Padded crop around last frame's hands, full frame when tracking is lost
+        hands_detector = self.detectors.get('hands', self.wait_for_detectors)
+        if hands_detector is None:
+            return
+        region = self.hands_roi.plan(packet.size)
+        with self.profiler.span('hands'):
+            image = crop_to_region(packet.rgb, region) if region is not None else packet.rgb
+            results = hands_detector.process(image)
         
+        hands = []
         if results.multi_hand_landmarks and results.multi_handedness:
             for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+                points = landmarks_to_array(hand_landmarks)
+                if region is not None:
+                    region_to_frame(points, region, packet.size)
                 # Determine left or right hand
-                hand_label = handedness.classification[0].label.lower()
-                
+                hands.append((handedness.classification[0].label.lower(), points))
+        
+        with self.state_lock:
+            self.update_hands(hands, packet)
+        self.hands_roi.update(list(self.mesh_hands))
+    
+    def update_hands(self, hands, packet):
+        """Update hand positions and gestures from (label, (21, 3) landmark array) pairs"""
+        packet.hand_landmarks = hands
+        self.hand_frame_size = packet.size
+        if hands:
+            # (K, 21, 3) arrays for the gesture engine, also drawn over the webcam preview
+            labels = [hand_label for hand_label, _ in hands]
+            self.mesh_hands = points = np.stack([hand_points for _, hand_points in hands])
+            
+            # Gestures of all hands in one pass (held for a few frames before switching)
+            gestures = self.gesture_engine.update(labels, points, packet.width / packet.height)
+            for hand_label, hand_points, gesture in zip(labels, points, gestures):
                 # Get hand position (wrist as reference)
-                wrist = hand_landmarks.landmark[0]
-                h, w = frame.shape[:2]
-                hand_x = int(wrist.x * w)
-                hand_y = int(wrist.y * h)
+                hand_x = int(hand_points[0, 0] * packet.width)
+                hand_y = int(hand_points[0, 1] * packet.height)
                 
                 self.hand_positions[hand_label] = (hand_x, hand_y)
-                
-                # Detect gesture
-                self.hand_gestures[hand_label] = self.detect_hand_gesture(hand_landmarks)
-                
-                # Draw hand landmarks
-                self.mp_drawing.draw_landmarks(
-                    frame,
-                    hand_landmarks,
-                    self.mp_hands.HAND_CONNECTIONS,
-                    self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                    self.mp_drawing_styles.get_default_hand_connections_style()
-                )
+                self.hand_tracks[hand_label].add(packet.timestamp, (hand_x, hand_y))
+                self.hand_gestures[hand_label] = gesture
         else:
+            self.mesh_hands = []
             self.hand_positions = {'left': None, 'right': None}
             self.hand_gestures = {'left': 'none', 'right': 'none'}
+            for track in self.hand_tracks.values():
+                track.reset()
+            self.gesture_engine.reset()
     
-    def detect_hand_gesture(self, hand_landmarks):
-        """Detect simple hand gestures"""
-        # Get fingertip and base landmarks
-        thumb_tip = hand_landmarks.landmark[4]
-        index_tip = hand_landmarks.landmark[8]
-        middle_tip = hand_landmarks.landmark[12]
-        ring_tip = hand_landmarks.landmark[16]
-        pinky_tip = hand_landmarks.landmark[20]
-        
-        index_base = hand_landmarks.landmark[5]
-        middle_base = hand_landmarks.landmark[9]
-        ring_base = hand_landmarks.landmark[13]
-        pinky_base = hand_landmarks.landmark[17]
-        
-        # Check if fingers are extended
-        index_extended = index_tip.y < index_base.y
-        middle_extended = middle_tip.y < middle_base.y
-        ring_extended = ring_tip.y < ring_base.y
-        pinky_extended = pinky_tip.y < pinky_base.y
-        
-        # Peace sign (index and middle extended)
-        if index_extended and middle_extended and not ring_extended and not pinky_extended:
-            return 'peace'
-        # Open hand (all extended)
-        elif index_extended and middle_extended and ring_extended and pinky_extended:
-            return 'open'
-        # Fist (none extended)
-        elif not index_extended and not middle_extended and not ring_extended and not pinky_extended:
-            return 'fist'
-        # Pointing (only index)
-        elif index_extended and not middle_extended:
-            return 'point'
-        else:
-            return 'none'
+    def face_anchor(self, frame_size):
+        """Pixel center of the first tracked face, None without one"""
+        if self.mesh_faces is None:
+            return None
+        x, y = self.mesh_faces[0, :, :2].mean(axis=0)
+        return x * frame_size[0], y * frame_size[1]
     
-    def apply_background_removal(self, frame):
-        """Remove background and replace with custom color"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.selfie_segmentation.process(rgb_frame)
-        
-        # Create mask
-        condition = np.stack((results.segmentation_mask,) * 3, axis=-1) > 0.5
-        
-        # Create background
-        bg_image = np.zeros(frame.shape, dtype=np.uint8)
-        bg_image[:] = self.background_color
-        
-        # Combine foreground and background
-        output_image = np.where(condition, frame, bg_image)
-        
-        return output_image
+    def predict_hands(self, timestamp):
+        """Extrapolate hand positions on frames where hand tracking was skipped"""
+        for hand_label, position in self.hand_positions.items():
+            if position is not None:
+                self.hand_positions[hand_label] = self.hand_tracks[hand_label].predict(timestamp)
+    
+    def apply_background_removal(self, packet):
+        """Segment the person on a downscaled frame and replace the background in place"""
+        segmentation = self.detectors.get('segmentation', self.wait_for_detectors)
+        if segmentation is None:
+            return packet.frame
+        with self.profiler.span('segmentation'):
+            results = segmentation.process(self.background.segmentation_input(packet.rgb))
+            self.background.update_mask(results.segmentation_mask, packet.size)
+        return self.composite_background(packet.frame)
+    
+    def composite_background(self, frame):
+        """Replace everything outside the last person mask with the background color"""
+        with self.profiler.span('composite_bg'):
+            return self.background.composite(frame, self.background_color)
     
-    def start_recording(self, canvas_shape):
-        """Start video recording"""
+    def start_recording(self, canvas_shape, filename=None):
+        """Start video recording on a background encoder thread"""
         if not self.is_recording:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"vtuber_recording_{timestamp}.mp4"
+            if filename is None:
+                filename = datetime.now().strftime(config.RECORDING_FILENAME_FORMAT)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(filename, fourcc, 20.0, 
-                                                (canvas_shape[1], canvas_shape[0]))
-            self.is_recording = True
             self.recording_start_time = time.time()
+            self.recorder = AsyncRecorder(filename, (canvas_shape[1], canvas_shape[0]),
+                                          start_time=self.recording_start_time)
+            self.is_recording = True
             return filename
         return None
     
     def stop_recording(self):
-        """Stop video recording"""
-        if self.is_recording and self.video_writer:
-            self.video_writer.release()
+        """Stop video recording, flushing frames still queued for the encoder"""
+        if self.is_recording and self.recorder:
             self.is_recording = False
-            self.video_writer = None
+            self.recorder.close()
+            stats = self.recorder.stats()
+            print(f"Encoded {stats['written']} frames "
+                  f"({stats['duplicated']} duplicated, {stats['skipped']} skipped, "
+                  f"{stats['dropped']} dropped)")
+            self.recorder = None
             self.recording_start_time = None
     
+    def start_motion_track(self, frame_size=(640, 480), filename=None):
+        """Start recording per-frame avatar state to a compact track file"""
+        if self.motion_writer is None:
+            if filename is None:
+                filename = datetime.now().strftime(config.MOTION_TRACK_FILENAME_FORMAT)
+            self.motion_writer = MotionTrackWriter(filename, frame_size)
+            return filename
+        return None
+    
+    def stop_motion_track(self):
+        """Stop motion track recording, returns the number of frames stored"""
+        if self.motion_writer is not None:
+            self.motion_writer.close()
+            frames = self.motion_writer.frames
+            self.motion_writer = None
+            return frames
+        return 0
+    
+    def start_landmark_capture(self, frame_size=(640, 480), filename=None):
+        """Start saving raw face and hand landmarks of every processed frame"""
+        if self.landmark_writer is None:
+            if filename is None:
+                filename = datetime.now().strftime(config.LANDMARK_CAPTURE_FILENAME_FORMAT)
+            self.landmark_writer = LandmarkWriter(filename, frame_size)
+            return filename
+        return None
+    
+    def stop_landmark_capture(self):
+        """Stop landmark capture, returns the number of frames stored"""
+        with self.state_lock:
+            writer, self.landmark_writer = self.landmark_writer, None
+        if writer is None:
+            return 0
+        writer.close()
+        return writer.frames
+    
+    def start_streaming(self, frame_size=(640, 480), host=config.STREAM_HOST, port=config.STREAM_PORT):
+        """Start sending avatar parameters as UDP packets (see streaming.py)"""
+        if self.streamer is None:
+            self.streamer = ParameterStreamer(self, host, port, frame_size=frame_size)
+    
+    def stop_streaming(self):
+        """Stop parameter streaming, returns sender statistics"""
+        if self.streamer is None:
+            return None
+        self.streamer.close()
+        stats = self.streamer.stats()
+        self.streamer = None
+        return stats
+    
+    def start_frame_ring(self, name=config.FRAME_RING_NAME):
+        """Start publishing finished canvases into a shared-memory ring (see frame_ring.py)"""
+        if self.frame_ring is None:
+            self.frame_ring = FrameRingWriter((config.CANVAS_WIDTH, config.CANVAS_HEIGHT), name)
+    
+    def stop_frame_ring(self):
+        """Stop publishing canvases and remove the ring, returns the number of frames published"""
+        if self.frame_ring is None:
+            return 0
+        frames = self.frame_ring.frames
+        self.frame_ring.close()
+        self.frame_ring = None
+        return frames
+    
+    def layout_faces(self, count):
+        """Avatar centers for count faces, side by side right of the webcam preview"""
+        if count <= 1:
+            return [self.avatar_center]
+        left, right = 340, config.CANVAS_WIDTH
+        step = (right - left) / count
+        return [(int(left + step * (i + 0.5)), self.avatar_center[1]) for i in range(count)]
+    
+    def draw_faces(self, canvas):
+        """Draw one avatar per tracked face, each in its slot's place and style"""
+        head, eyes, mouth = self.faces.shown
+        base = FACE_STYLES.index(self.avatar_style) if self.avatar_style in FACE_STYLES else 0
+        for slot in np.flatnonzero(self.faces.active):
+            style = FACE_STYLES[(base + slot) % len(FACE_STYLES)]
+            colors = self.get_avatar_colors(style)
+            emotion = EMOTIONS[self.faces.emotion[slot]]
+            if self.render_cache is not None:
+                self.render_cache.draw(canvas, self.face_centers[slot], head[slot], eyes[slot],
+                                       float(mouth[slot, 0]), emotion, style, colors)
+                continue
+            # Uncached drawing reads the single-avatar attributes, swap them in
+            saved = (self.avatar_center, self.head_rotation, self.eye_open_ratio,
+                     self.mouth_open_ratio, self.emotion, self.avatar_colors)
+            self.avatar_center = self.face_centers[slot]
+            self.head_rotation, self.eye_open_ratio = head[slot], eyes[slot]
+            self.mouth_open_ratio, self.emotion = float(mouth[slot, 0]), emotion
+            self.avatar_colors = colors
+            self.draw_avatar_parts(canvas)
+            (self.avatar_center, self.head_rotation, self.eye_open_ratio,
+             self.mouth_open_ratio, self.emotion, self.avatar_colors) = saved
+    
     def draw_avatar(self, canvas, show_landmarks=False):
         """Draw the 2D avatar based on tracked parameters"""
+        if self.faces is not None:
+            self.draw_faces(canvas)
+        elif self.render_cache is not None:
+            # Pre-rendered part sprites, blitted at the tracked offsets
+            self.render_cache.draw(canvas, self.avatar_center, self.head_rotation,
+                                   self.eye_open_ratio, self.mouth_open_ratio,
+                                   self.emotion, self.avatar_style, self.avatar_colors)
+        else:
+            self.draw_avatar_parts(canvas)
+        
+        # Draw hands
+        self.draw_hand_indicators(canvas)
+        
+        # Display info
+        if show_landmarks:
+            self.draw_debug_info(canvas)
+    
+    def draw_avatar_parts(self, canvas):
+        """Draw head, eyes, brows, mouth and nose directly with OpenCV"""
         center_x, center_y = self.avatar_center
         pitch, yaw, roll = self.head_rotation
         colors = self.avatar_colors
@@ -426,22 +548,19 @@ class VTuberAvatar:
             [nose_x + 5, nose_y + 15]
         ], np.int32)
         cv2.polylines(canvas, [nose_points], True, (180, 140, 110), 2)
-        
-        # Draw hands
-        self.draw_hand_indicators(canvas)
-        
-        # Display info
-        if show_landmarks:
-            self.draw_debug_info(canvas)
     
     def draw_hand_indicators(self, canvas):
         """Draw hand indicators and gestures"""
+        # Webcam frame offsets from its center map to HAND_INDICATOR_SPAN of the canvas around the avatar
+        frame_width, frame_height = self.hand_frame_size
+        span_x = self.canvas_size[0] * config.HAND_INDICATOR_SPAN[0]
+        span_y = self.canvas_size[1] * config.HAND_INDICATOR_SPAN[1]
         # Draw hands if detected
         for hand_type, position in self.hand_positions.items():
             if position:
                 # Scale hand position to avatar canvas
-                hand_canvas_x = 1000 + int((position[0] - 320) * 0.5)
-                hand_canvas_y = 360 + int((position[1] - 240) * 0.5)
+                hand_canvas_x = self.avatar_center[0] + int((position[0] / frame_width - 0.5) * span_x)
+                hand_canvas_y = self.avatar_center[1] + int((position[1] / frame_height - 0.5) * span_y)
                 
                 gesture = self.hand_gestures[hand_type]
                 
@@ -462,6 +581,9 @@ class VTuberAvatar:
                 elif gesture == 'point':
                     cv2.putText(canvas, '!', (hand_canvas_x - 8, hand_canvas_y + 12),
                                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                elif gesture in GESTURE_LABELS:
+                    cv2.putText(canvas, GESTURE_LABELS[gesture], (hand_canvas_x - 16, hand_canvas_y + 8),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
     
     def draw_debug_info(self, canvas):
         """Draw debug information overlay"""
@@ -479,214 +601,599 @@ class VTuberAvatar:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         cv2.putText(canvas, f"FPS: {self.current_fps:.1f}", (10, info_y + 150), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        # Per-stage timing breakdown (below the webcam preview), as many stages
+        # as fit above the quality line
+        stage_y = 280
+        stages = self.profiler.breakdown()[:(640 - stage_y) // 20]
+        for i, (stage, ms) in enumerate(stages):
+            cv2.putText(canvas, f"{stage}: {ms:.1f} ms", (10, stage_y + i * 20), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+        
+        # Current step of the adaptive quality ladder, and how often it moved
+        quality = self.quality
+        if quality is not None:
+            cv2.putText(canvas, f"Quality: {quality.name} ({quality.level + 1}/{len(quality.levels)}) "
+                       f"{quality.mean_frame_time * 1000:.1f}/{quality.budget * 1000:.1f} ms  "
+                       f"{quality.changes} changes", (10, 640), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+        
+        # Encoder backlog while recording
+        recorder = self.recorder
+        if recorder is not None:
+            stats = recorder.stats()
+            cv2.putText(canvas, f"Encoder queue: {stats['queue_depth']}/{recorder.queue_size} "
+                       f"drop: {stats['dropped']} dup: {stats['duplicated']}", (10, 660), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
     
-    def process_frame(self, frame):
+    def process_frame(self, packet):
         """Process video frame and update avatar parameters"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        # Padded crop around last frame's face, full frame when tracking is lost
+        face_mesh = self.detectors.get('face', self.wait_for_detectors)
+        if face_mesh is None:
+            return 0
+        region = self.face_roi.plan(packet.size)
+        with self.profiler.span('face_mesh'):
+            image = crop_to_region(packet.rgb, region) if region is not None else packet.rgb
+            results = face_mesh.process(image)
         
-        if results.multi_face_landmarks:
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = face_landmarks.landmark
-            
-            h, w = frame.shape[:2]
-            
-            # Update head pose
-            self.head_rotation = self.estimate_head_pose(landmarks, w, h)
-            
-            # Update eye state
-            # Left eye landmarks: [33, 160, 158, 133, 153, 144]
-            # Right eye landmarks: [362, 385, 387, 263, 373, 380]
-            left_eye_indices = [33, 160, 158, 133, 153, 144]
-            right_eye_indices = [362, 385, 387, 263, 373, 380]
-            
-            left_ear = self.calculate_eye_aspect_ratio(landmarks, left_eye_indices)
-            right_ear = self.calculate_eye_aspect_ratio(landmarks, right_eye_indices)
-            
-            # Normalize EAR to 0-1 range (typical EAR is around 0.2-0.4)
-            self.eye_open_ratio[0] = min(1.0, max(0.0, left_ear * 3.5))
-            self.eye_open_ratio[1] = min(1.0, max(0.0, right_ear * 3.5))
-            
-            # Update mouth state
-            mouth_ratio = self.calculate_mouth_aspect_ratio(landmarks)
-            self.mouth_open_ratio = min(1.0, max(0.0, mouth_ratio * 5))
-            
-            # Detect emotion
-            self.emotion = self.detect_emotion(landmarks)
-            
-            # Draw face mesh on original frame (optional)
-            self.mp_drawing.draw_landmarks(
-                image=frame,
-                landmark_list=face_landmarks,
-                connections=self.mp_face_mesh.FACEMESH_TESSELATION,
-                landmark_drawing_spec=None,
-                connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_tesselation_style()
-            )
-            
-            return True
+        if not results.multi_face_landmarks:
+            return self.update_faces(None, packet)
         
-        return False
+        points = np.stack([landmarks_to_array(face_landmarks)
+                           for face_landmarks in results.multi_face_landmarks])
+        if region is not None:
+            # Back to full-frame coordinates before head pose and the preview overlay
+            region_to_frame(points.reshape(-1, 3), region, packet.size)
+        return self.update_faces(points, packet)
     
-    def run(self):
-        """Main loop for VTuber application"""
-        cap = cv2.VideoCapture(0)
+    def update_faces(self, points, packet):
+        """Update avatar state from (M, 478, 3) detected faces (or None), returns face count"""
+        if points is None or len(points) == 0:
+            self.face_roi.update([])
+            with self.state_lock:
+                self.mesh_faces = None
+                if self.faces is not None:
+                    self.faces.update(np.zeros((0, 478, 3), np.float32), packet.timestamp, packet.size)
+            return 0
+        
+        self.face_roi.update(list(points))
+        # Drawn over the webcam preview at preview resolution (draw_preview)
+        self.mesh_faces = points
+        primary = 0
+        features = None
+        if self.faces is not None:
+            with self.profiler.span('faces'), self.state_lock:
+                slots = self.faces.update(points, packet.timestamp, packet.size)
+                primary_slot = self.faces.primary()
+                if primary_slot in slots:
+                    primary = int(np.flatnonzero(slots == primary_slot)[0])
+                    # Measured in the slots' batch pass already
+                    features = self.faces.features(primary_slot)
+        
+        self.update_face(points[primary], packet, features)
+        return len(points)
+    
+    def update_face(self, points, packet, features=None):
+        """Update avatar parameters from one face's (478, 3) landmark array
+
+        features is that face's extract_features() output when it was already
+        computed, otherwise it is computed here.
+        """
+        w, h = packet.size
+        packet.face_landmarks = points
+        
+        # Head pose, EAR, MAR and emotion in one vectorized pass
+        if features is None:
+            with self.profiler.span('features'):
+                features = extract_features(points, w, h)
+        
+        with self.state_lock:
+            if self.motion_filter is not None:
+                # Shown values are predicted from the filter at render time (animate)
+                self.motion_filter.update(packet.timestamp, features)
+            else:
+                self.head_rotation = features['head_pose']
+                self.eye_open_ratio = features['eye_open']
+                self.mouth_open_ratio = features['mouth_open']
+            self.emotion = features['emotion']
+        
+        return True
+    
+    def animate(self, display_time):
+        """Set the shown avatar parameters to their predicted values at display_time"""
+        if self.faces is not None:
+            self.faces.animate(display_time)
+        if self.motion_filter is not None:
+            predicted = self.motion_filter.predict(display_time)
+            if predicted is not None:
+                self.head_rotation, self.eye_open_ratio, self.mouth_open_ratio = predicted
+            self.predict_hands(display_time)
+    
+    def process_packet(self, packet):
+        """Run every enabled detector on a frame packet"""
+        if self.detectors is None and not self.use_process_pool:
+            raise RuntimeError("Avatar was created without detectors (use_detectors=False)")
+        # Pick the detectors due on this frame
+        self.scheduler.begin_frame()
+        run_segmentation = self.use_background_removal and self.scheduler.should_run('segmentation')
+        run_hands = self.show_hands and self.scheduler.should_run('hands')
+        
+        if self.use_process_pool:
+            face_detected = self.process_packet_pooled(packet, run_hands, run_segmentation)
+        else:
+            face_detected = self.process_packet_local(packet, run_hands, run_segmentation)
+        
+        # Skipped detectors reuse the last mask, moved with the face, and
+        # extrapolated hand positions
+        if self.use_background_removal:
+            anchor = self.face_anchor(packet.size)
+            if run_segmentation:
+                self.background.set_anchor(anchor)
+            elif self.background.has_mask(packet.frame.shape):
+                self.background.follow(anchor)
+                self.composite_background(packet.frame)
+        if self.show_hands and not run_hands:
+            with self.state_lock:
+                self.predict_hands(packet.timestamp)
+        
+        # Raw landmarks for MediaPipe-free replay (landmark_cache.py)
+        if self.landmark_writer is not None:
+            with self.state_lock:
+                if self.landmark_writer is not None:
+                    self.landmark_writer.append(packet)
+        
+        return face_detected
+    
+    def process_packet_local(self, packet, run_hands, run_segmentation):
+        """Run the scheduled detectors one after another in this process"""
+        # Apply background removal if enabled
+        if run_segmentation:
+            start = time.perf_counter()
+            self.apply_background_removal(packet)
+            self.scheduler.record_cost('segmentation', time.perf_counter() - start)
+        
+        # Process hands if enabled
+        if run_hands:
+            start = time.perf_counter()
+            self.process_hands(packet)
+            self.scheduler.record_cost('hands', time.perf_counter() - start)
+        
+        # Process frame for face tracking
+        start = time.perf_counter()
+        face_detected = self.process_frame(packet)
+        self.scheduler.record_cost('face', time.perf_counter() - start)
+        return face_detected
+    
+    def process_packet_pooled(self, packet, run_hands, run_segmentation):
+        """Run the scheduled detectors in parallel worker processes"""
+        if self.detector_pool is None:
+            self.detector_pool = DetectorPool(packet.size, self.detector_settings)
+        
+        kinds = ['face']
+        if run_hands:
+            kinds.append('hands')
+        if run_segmentation:
+            kinds.append('segmentation')
+        # Workers crop their inputs to these regions and return full-frame landmarks
+        regions = {'face': self.face_roi.plan(packet.size)}
+        if run_hands:
+            regions['hands'] = self.hands_roi.plan(packet.size)
+        with self.profiler.span('detector_pool'):
+            outputs = self.detector_pool.process(packet, kinds, regions)
+        # Measured in the workers, so automatic cadence works in pool mode too
+        for kind, seconds in self.detector_pool.last_costs.items():
+            self.scheduler.record_cost(kind, seconds)
+        
+        # Workers return compact landmark arrays, rebuild landmark lists locally
+        if 'segmentation' in outputs:
+            self.background.update_mask(outputs['segmentation'], packet.size)
+            self.composite_background(packet.frame)
+        
+        if 'hands' in outputs:
+            self.hands_roi.update([array for _, array in outputs['hands']])
+            with self.state_lock:
+                self.update_hands(outputs['hands'], packet)
         
-        if not cap.isOpened():
-            print("Error: Could not open webcam")
+        return self.update_faces(outputs['face'], packet)
+    
+    def render_canvas(self, frame, face_detected, timestamp=None, display_time=None):
+        """Compose avatar, webcam preview and status indicators into a canvas
+
+        display_time is when the canvas will be shown (default: now), smoothed
+        avatar parameters are predicted to it. Offline renderers pass the
+        frame's own timestamp.
+        """
+        with self.state_lock:
+            self.animate(time.time() if display_time is None else display_time)
+        
+        if self.compositor is not None:
+            # Cached layers assembled into a reused output buffer
+            canvas = self.compositor.compose(self, frame, face_detected)
+        else:
+            canvas = self.draw_canvas(frame, face_detected)
+        
+        # Hand a copy to the encoder thread, placed by capture timestamp
+        if self.is_recording:
+            with self.profiler.span('encode'):
+                self.recorder.write(canvas, timestamp)
+        
+        # One copy into shared memory for local compositors
+        if self.frame_ring is not None:
+            with self.profiler.span('frame_ring'):
+                self.frame_ring.write(canvas, timestamp)
+        
+        # Avatar state only, a few dozen bytes per frame
+        if self.motion_writer is not None:
+            with self.state_lock:
+                self.motion_writer.append(self, time.time() if timestamp is None else timestamp)
+        
+        return canvas
+    
+    def draw_canvas(self, frame, face_detected):
+        """Draw every canvas element from scratch into a new canvas"""
+        # Create canvas for avatar
+        with self.profiler.span('canvas'):
+            canvas = np.zeros((720, 1280, 3), dtype=np.uint8)
+            canvas[:, :] = (40, 40, 60)  # Dark blue-gray background
+        
+        # Draw avatar
+        with self.state_lock, self.profiler.span('draw_avatar'):
+            self.draw_avatar(canvas, show_landmarks=True)
+            hands_detected = self.hands_detected()
+        
+        with self.profiler.span('preview'):
+            self.draw_preview(canvas, frame)
+        
+        with self.profiler.span('hud'):
+            self.draw_chrome(canvas)
+            self.draw_hud(canvas, face_detected, hands_detected)
+        
+        return canvas
+    
+    def hands_detected(self):
+        """Whether any hand currently has a position"""
+        return any(pos is not None for pos in self.hand_positions.values())
+    
+    def draw_preview(self, canvas, frame):
+        """Place the (scaled down) webcam feed on the canvas, with landmark overlays"""
+        if not self.show_preview:
             return
+        # Downscaled first, the mesh and hand skeletons are drawn at preview size
+        faces = self.mesh_faces if self.show_mesh else None
+        hands = self.mesh_hands if self.show_hands else None
+        self.preview.draw(canvas, frame, faces, hands)
+    
+    def draw_chrome(self, canvas):
+        """Draw the parts of the UI that never change (preview border, instructions)"""
+        cv2.rectangle(canvas, (10, 10), (330, 250), (255, 255, 255), 2)
+        
+        # Instructions
+        cv2.putText(canvas, "Q:Quit | S:Mesh | P:Preview | H:Hands | B:BG | R:Record | M:Track | L:Landmarks | 1-4:Style | T:Trace", 
+                   (10, 700), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+    
+    def draw_hud(self, canvas, face_detected, hands_detected):
+        """Draw status indicators and style label"""
+        # Status indicators
+        status_y = 30
+        
+        # Face detection status
+        status_color = (0, 255, 0) if face_detected else (0, 0, 255)
+        if self.faces is not None and face_detected:
+            status_text = f"{int(face_detected)} Faces Detected"
+        else:
+            status_text = "Face Detected" if face_detected else "No Face"
+        cv2.circle(canvas, (350, status_y), 10, status_color, -1)
+        cv2.putText(canvas, status_text, (370, status_y + 5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        # Hand tracking status
+        if self.show_hands:
+            hands_color = (0, 255, 0) if hands_detected else (100, 100, 100)
+            cv2.circle(canvas, (350, status_y + 30), 10, hands_color, -1)
+            cv2.putText(canvas, f"Hands: {self.show_hands}", (370, status_y + 35), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        # Background removal status
+        bg_text = "BG Remove: ON" if self.use_background_removal else "BG Remove: OFF"
+        bg_color = (0, 255, 0) if self.use_background_removal else (100, 100, 100)
+        cv2.circle(canvas, (350, status_y + 60), 10, bg_color, -1)
+        cv2.putText(canvas, bg_text, (370, status_y + 65), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
+        # Recording status
+        if self.is_recording:
+            rec_time = int(time.time() - self.recording_start_time)
+            rec_text = f"REC {rec_time}s"
+            cv2.circle(canvas, (350, status_y + 90), 10, (0, 0, 255), -1)
+            cv2.putText(canvas, rec_text, (370, status_y + 95), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        
+        # Avatar style indicator
+        cv2.putText(canvas, f"Style: {self.avatar_style.title()}", (350, status_y + 120), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    
+    def dump_trace(self, filename=None):
+        """Write the profiler's span buffer as a Chrome trace file"""
+        if filename is None:
+            filename = datetime.now().strftime(config.TRACE_FILENAME_FORMAT)
+        self.profiler.dump_trace(filename)
+        return filename
+    
+    def update_fps(self, frame_time):
+        """Add a frame time sample to the rolling FPS average"""
+        self.fps_counter.append(1.0 / frame_time if frame_time > 0 else 0)
+        self.current_fps = sum(self.fps_counter) / len(self.fps_counter)
+    
+    def update_quality(self, frame_time):
+        """Feed one measured frame time to the quality controller, applying any level change"""
+        if self.quality is None:
+            return
+        if self.quality.add(frame_time) is not None:
+            self.apply_quality(self.quality.settings)
+            print(f"Quality: {self.quality.name} (level {self.quality.level + 1}/{len(self.quality.levels)})")
+    
+    def apply_quality(self, settings):
+        """Apply one quality level: detector input sizes, model options and cadences"""
+        scale = settings['input_scale']
+        for roi, kind in ((self.face_roi, 'face'), (self.hands_roi, 'hands')):
+            roi.target_size = int(config.ROI_TARGET_SIZE[kind] * scale)
+            roi.full_max_side = int(config.ROI_FULL_FRAME_MAX_SIDE * scale)
+        self.background.input_scale = config.SEGMENTATION_INPUT_SCALE * scale
+        # Local detectors are rebuilt in the background (the current one keeps running
+        # meanwhile), pool workers rebuild theirs before their next frame
+        for detectors in (self.detectors, self.detector_pool):
+            if detectors is not None:
+                detectors.reconfigure('face', refine_landmarks=settings['refine_landmarks'])
+                detectors.reconfigure('hands', max_num_hands=settings['max_num_hands'])
+                detectors.reconfigure('segmentation', model_selection=settings['segmentation_model'])
+        self.scheduler.cadences.update(settings['cadence'] or config.DETECTOR_CADENCE)
+    
+    def mark_frame_shown(self):
+        """Report the time to first frame once, when the first canvas is displayed"""
+        if self.first_frame_time is not None:
+            return
+        self.first_frame_time = time.perf_counter() - self.launch_time
+        built = ", ".join(f"{kind} {seconds * 1000:.0f}ms"
+                          for kind, seconds in self.detectors.build_times.items()) if self.detectors else ""
+        if self.detector_pool is not None:
+            # Models are built in the worker processes, not by self.detectors
+            status = " (detector worker pool)"
+        elif built:
+            status = f" (detectors built: {built})"
+        else:
+            status = " (detectors still loading)"
+        print(f"First frame after {self.first_frame_time * 1000:.0f}ms{status}")
+    
+    def set_avatar_style(self, style):
+        """Switch avatar color scheme"""
+        self.avatar_style = style
+        self.avatar_colors = self.get_avatar_colors(style)
+    
+    def handle_key(self, key, canvas_shape=(720, 1280, 3)):
+        """Handle a key press, returns False when the app should quit"""
+        if key == ord('q'):
+            return False
+        elif key == ord('s'):
+            self.show_mesh = not self.show_mesh
+            print(f"Face mesh: {'ON' if self.show_mesh else 'OFF'}")
+        elif key == ord('p'):
+            self.show_preview = not self.show_preview
+            print(f"Webcam preview: {'ON' if self.show_preview else 'OFF'}")
+        elif key == ord('h'):
+            self.show_hands = not self.show_hands
+            if self.show_hands and not self.use_process_pool:
+                self.detectors.warm_up('hands')
+            print(f"Hand tracking: {'ON' if self.show_hands else 'OFF'}")
+        elif key == ord('b'):
+            self.use_background_removal = not self.use_background_removal
+            if self.use_background_removal and not self.use_process_pool:
+                self.detectors.warm_up('segmentation')
+            print(f"Background removal: {'ON' if self.use_background_removal else 'OFF'}")
+        elif key == ord('r'):
+            if not self.is_recording:
+                filename = self.start_recording(canvas_shape)
+                print(f"Recording started: {filename}")
+            else:
+                self.stop_recording()
+                print("Recording stopped")
+        elif key == ord('m'):
+            if self.motion_writer is None:
+                filename = self.start_motion_track()
+                print(f"Motion track started: {filename}")
+            else:
+                frames = self.stop_motion_track()
+                print(f"Motion track stopped ({frames} frames)")
+        elif key == ord('l'):
+            if self.landmark_writer is None:
+                filename = self.start_landmark_capture()
+                print(f"Landmark capture started: {filename}")
+            else:
+                frames = self.stop_landmark_capture()
+                print(f"Landmark capture stopped ({frames} frames)")
+        elif key == ord('1'):
+            self.set_avatar_style('cute')
+            print("Avatar style: Cute")
+        elif key == ord('2'):
+            self.set_avatar_style('anime')
+            print("Avatar style: Anime")
+        elif key == ord('3'):
+            self.set_avatar_style('cool')
+            print("Avatar style: Cool")
+        elif key == ord('4'):
+            self.set_avatar_style('warm')
+            print("Avatar style: Warm")
+        elif key == ord('t'):
+            filename = self.dump_trace()
+            print(f"Performance trace saved: {filename}")
+        return True
+    
+    def print_controls(self):
+        """Print keyboard controls"""
         print("=" * 60)
         print("VTuber Advanced - Controls:")
         print("Q: Quit")
         print("S: Toggle face mesh display")
+        print("P: Toggle webcam preview")
         print("H: Toggle hand tracking")
         print("B: Toggle background removal")
         print("R: Start/Stop recording")
+        print("M: Start/Stop motion track (avatar state only, re-render with motion_track.py)")
+        print("L: Start/Stop landmark capture (replay without MediaPipe with landmark_cache.py)")
         print("1-4: Change avatar style (1=Cute, 2=Anime, 3=Cool, 4=Warm)")
+        print("T: Save performance trace (Chrome trace JSON)")
         print("=" * 60)
-        
-        show_mesh = True
-        show_hands = True
-        
-        while True:
-            frame_start = time.time()
-            
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Could not read frame")
-                break
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Apply background removal if enabled
-            if self.use_background_removal:
-                frame = self.apply_background_removal(frame)
-            
-            # Process hands if enabled
-            if show_hands:
-                self.process_hands(frame)
-            
-            # Create canvas for avatar
-            canvas = np.zeros((720, 1280, 3), dtype=np.uint8)
-            canvas[:, :] = (40, 40, 60)  # Dark blue-gray background
+    
+    def run(self, pipelined=False, trace_path=None, render_fps=config.RENDER_FPS,
+            stream=config.STREAMING_ENABLED, frame_ring=config.FRAME_RING_ENABLED, show_window=True,
+            source=config.CAPTURE_SOURCE, loop=False):
+        """Main loop for VTuber application"""
+        # Models load while the camera opens (no-op if main() started them already)
+        self.warm_up_detectors()
+        cap = None
+        opened = False
+        try:
+            cap = open_source(source, loop=loop)
+            if not cap.isOpened():
+                print(f"Error: Could not open capture source: {source}")
+                return
+            opened = True
             
-            # Process frame for face tracking
-            face_detected = self.process_frame(frame)
+            print(f"Capture: {cap.describe()}")
+            if isinstance(cap, WebcamSource):
+                for name, wanted, actual in cap.mismatches():
+                    print(f"  Camera did not accept {name} {wanted}, using {actual}")
             
-            # Draw avatar
-            self.draw_avatar(canvas, show_landmarks=True)
+            self.print_controls()
+            # Live loop: a detector still loading is skipped rather than waited for
+            self.wait_for_detectors = False
+            if stream:
+                self.start_streaming(cap.size)
+                print(f"Streaming parameters to {config.STREAM_HOST}:{config.STREAM_PORT} "
+                      f"at {config.STREAM_RATE} packets/s")
+            if frame_ring:
+                self.start_frame_ring()
+                print(f"Publishing frames to shared memory '{config.FRAME_RING_NAME}'")
+            self.show_window = show_window
+            if not show_window:
+                print("No preview window, press Ctrl+C to quit")
             
-            # Prepare webcam feed
-            if not show_mesh:
-                # Show clean webcam without face mesh
-                display_frame = cv2.flip(frame, 1)
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                clean_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
-                small_frame = cv2.resize(clean_frame, (320, 240))
+            if pipelined:
+                # Capture, inference and render on separate threads
+                PipelinedRunner(self, cap, render_fps=render_fps).run()
             else:
-                small_frame = cv2.resize(frame, (320, 240))
-            
-            # Place webcam feed on canvas
-            canvas[10:250, 10:330] = small_frame
-            cv2.rectangle(canvas, (10, 10), (330, 250), (255, 255, 255), 2)
-            
-            # Status indicators
-            status_y = 30
-            
-            # Face detection status
-            status_color = (0, 255, 0) if face_detected else (0, 0, 255)
-            status_text = "Face Detected" if face_detected else "No Face"
-            cv2.circle(canvas, (350, status_y), 10, status_color, -1)
-            cv2.putText(canvas, status_text, (370, status_y + 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Hand tracking status
-            if show_hands:
-                hands_detected = any(pos is not None for pos in self.hand_positions.values())
-                hands_color = (0, 255, 0) if hands_detected else (100, 100, 100)
-                cv2.circle(canvas, (350, status_y + 30), 10, hands_color, -1)
-                cv2.putText(canvas, f"Hands: {show_hands}", (370, status_y + 35), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Background removal status
-            bg_text = "BG Remove: ON" if self.use_background_removal else "BG Remove: OFF"
-            bg_color = (0, 255, 0) if self.use_background_removal else (100, 100, 100)
-            cv2.circle(canvas, (350, status_y + 60), 10, bg_color, -1)
-            cv2.putText(canvas, bg_text, (370, status_y + 65), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Recording status
-            if self.is_recording:
-                rec_time = int(time.time() - self.recording_start_time)
-                rec_text = f"REC {rec_time}s"
-                cv2.circle(canvas, (350, status_y + 90), 10, (0, 0, 255), -1)
-                cv2.putText(canvas, rec_text, (370, status_y + 95), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-                # Write frame to video
-                self.video_writer.write(canvas)
+                self.run_serial(cap)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Cleanup, also after setup failed part way (close() skips what never started)
+            stream_stats = self.stop_streaming()
+            if stream_stats is not None:
+                print(f"Parameter stream: {stream_stats['sent']} packets sent, {stream_stats['dropped']} dropped")
+            if trace_path and opened:
+                self.dump_trace(trace_path)
+                print(f"Performance trace saved: {trace_path}")
+            self.close()
+            if cap is not None:
+                cap.release()
+            if opened:
+                stats = cap.stats()
+                print(f"Capture: {stats['frames']} frames at {stats['fps']:.1f} FPS, "
+                      f"read {stats['mean_read_ms']:.2f}ms mean / {stats['max_read_ms']:.2f}ms max")
+            cv2.destroyAllWindows()
+    
+    def close(self):
+        """Stop every output still running, release MediaPipe graphs and detector worker processes
+
+        Only releases what was started, so it is safe after a setup that failed
+        part way and when called twice.
+        """
+        if self.is_recording:
+            self.stop_recording()
+        self.stop_motion_track()
+        self.stop_landmark_capture()
+        self.stop_frame_ring()
+        self.stop_streaming()
+        if self.detector_pool is not None:
+            self.detector_pool.close()
+            self.detector_pool = None
+        if self.detectors is not None:
+            self.detectors.close()
+    
+    def run_serial(self, cap):
+        """Single-threaded loop: capture, detect and render one frame at a time"""
+        profiler = self.profiler
+        while True:
+            frame_start = time.time()
+            loop_start = time.perf_counter()
             
-            # Avatar style indicator
-            cv2.putText(canvas, f"Style: {self.avatar_style.title()}", (350, status_y + 120), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            with profiler.span('capture'):
+                ret, frame = cap.read()
+            if not ret:
+                print("Error: Could not read frame" if cap.kind == 'webcam' else "End of capture source")
+                break
+            process_start = time.perf_counter()
             
-            # Instructions
-            cv2.putText(canvas, "Q:Quit | S:Mesh | H:Hands | B:BG | R:Record | 1-4:Style", 
-                       (10, 700), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+            # Mirror the frame and convert it to RGB once for all detectors
+            with profiler.span('convert'):
+                packet = FramePacket.from_capture(frame, timestamp=frame_start)
             
-            # Calculate and display FPS
-            frame_time = time.time() - frame_start
-            self.fps_counter.append(1.0 / frame_time if frame_time > 0 else 0)
-            self.current_fps = sum(self.fps_counter) / len(self.fps_counter)
+            face_detected = self.process_packet(packet)
+            canvas = self.render_canvas(packet.frame, face_detected, packet.timestamp)
+            # The quality ladder only sees processing (detect, animate, draw): capture
+            # waits on the camera's frame rate and display on waitKey, neither gets
+            # cheaper at a lower level
+            processing_time = time.perf_counter() - process_start
             
             # Show result
-            cv2.imshow('VTuber Avatar Advanced', canvas)
+            key = 0xFF
+            if self.show_window:
+                with profiler.span('display'):
+                    cv2.imshow('VTuber Avatar Advanced', canvas)
+                    
+                    # Handle key presses
+                    key = cv2.waitKey(1) & 0xFF
+            self.mark_frame_shown()
+            profiler.record('frame', loop_start, time.perf_counter())
             
-            # Handle key presses
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
+            # FPS covers the whole loop, including display
+            self.update_fps(time.time() - frame_start)
+            self.update_quality(processing_time)
+            
+            if not self.handle_key(key, canvas.shape):
                 break
-            elif key == ord('s'):
-                show_mesh = not show_mesh
-                print(f"Face mesh: {'ON' if show_mesh else 'OFF'}")
-            elif key == ord('h'):
-                show_hands = not show_hands
-                print(f"Hand tracking: {'ON' if show_hands else 'OFF'}")
-            elif key == ord('b'):
-                self.use_background_removal = not self.use_background_removal
-                print(f"Background removal: {'ON' if self.use_background_removal else 'OFF'}")
-            elif key == ord('r'):
-                if not self.is_recording:
-                    filename = self.start_recording(canvas.shape)
-                    print(f"Recording started: {filename}")
-                else:
-                    self.stop_recording()
-                    print("Recording stopped")
-            elif key == ord('1'):
-                self.avatar_style = 'cute'
-                self.avatar_colors = self.get_avatar_colors('cute')
-                print("Avatar style: Cute")
-            elif key == ord('2'):
-                self.avatar_style = 'anime'
-                self.avatar_colors = self.get_avatar_colors('anime')
-                print("Avatar style: Anime")
-            elif key == ord('3'):
-                self.avatar_style = 'cool'
-                self.avatar_colors = self.get_avatar_colors('cool')
-                print("Avatar style: Cool")
-            elif key == ord('4'):
-                self.avatar_style = 'warm'
-                self.avatar_colors = self.get_avatar_colors('warm')
-                print("Avatar style: Warm")
-        
-        # Cleanup
-        if self.is_recording:
-            self.stop_recording()
-        cap.release()
-        cv2.destroyAllWindows()
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="VTuber Avatar Advanced")
+    parser.add_argument('--source', default=config.CAPTURE_SOURCE,
+                        help="webcam[:N], synthetic[:COUNT], image directory or video file")
+    parser.add_argument('--loop', action='store_true',
+                        help="restart a video file or image directory at its end")
+    parser.add_argument('--pipelined', action='store_true', default=config.PIPELINED_MODE,
+                        help="run capture, inference and rendering on separate threads")
+    parser.add_argument('--process-pool', action='store_true', default=config.USE_PROCESS_POOL,
+                        help="run each MediaPipe detector in its own worker process")
+    parser.add_argument('--render-fps', type=float, default=config.RENDER_FPS,
+                        help="fixed output rate in pipelined mode (0 = once per detection)")
+    parser.add_argument('--stream', action='store_true', default=config.STREAMING_ENABLED,
+                        help="stream avatar parameters over UDP (receive with streaming.py)")
+    parser.add_argument('--frame-ring', action='store_true', default=config.FRAME_RING_ENABLED,
+                        help="publish canvases into shared memory (read with frame_ring.py)")
+    parser.add_argument('--no-window', action='store_true',
+                        help="do not show the preview window (quit with Ctrl+C)")
+    parser.add_argument('--style', choices=['cute', 'anime', 'cool', 'warm'], default=None,
+                        help="avatar style (skips the interactive style prompt)")
+    parser.add_argument('--faces', type=int, default=config.MAX_FACES,
+                        help="number of faces tracked, each gets its own avatar")
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help="write a Chrome trace-event JSON of the session on exit")
+    return parser.parse_args()
 
 def main():
+    main_start = time.perf_counter()
+    args = parse_args()
+    
     print("=" * 70)
     print(" " * 20 + "VTuber Avatar Advanced")
     print(" " * 15 + "Pengolahan Citra Video Project")
@@ -698,31 +1205,44 @@ def main():
     print("  - Video recording capability")
     print("  - Multiple avatar styles")
     print("  - Customizable colors and emotions")
-    print("\nSelect Avatar Style:")
-    print("  1. Cute (Pink & Warm)")
-    print("  2. Anime (Blue & Vibrant)")
-    print("  3. Cool (Blue & Cold tones)")
-    print("  4. Warm (Orange & Earth tones)")
-    print("\nEnter style number (1-4) [default: 1]: ", end="")
-    
-    try:
-        choice = input().strip()
-        if choice == '2':
-            style = 'anime'
-        elif choice == '3':
-            style = 'cool'
-        elif choice == '4':
-            style = 'warm'
-        else:
-            style = 'cute'
-    except:
-        style = 'cute'
+    
+    # Models load in the background while the style is picked / the camera opens
+    vtuber = VTuberAvatar(avatar_style=args.style or 'cute', use_process_pool=args.process_pool,
+                          max_faces=args.faces)
+    vtuber.warm_up_detectors()
+    
+    style = args.style
+    if style is None and sys.stdin.isatty():
+        print("\nSelect Avatar Style:")
+        print("  1. Cute (Pink & Warm)")
+        print("  2. Anime (Blue & Vibrant)")
+        print("  3. Cool (Blue & Cold tones)")
+        print("  4. Warm (Orange & Earth tones)")
+        print("\nEnter style number (1-4) [default: 1]: ", end="")
+        
+        prompt_start = time.perf_counter()
+        try:
+            choice = input().strip()
+            if choice == '2':
+                style = 'anime'
+            elif choice == '3':
+                style = 'cool'
+            elif choice == '4':
+                style = 'warm'
+        except:
+            pass
+        # Time to first frame does not count waiting for the user
+        main_start += time.perf_counter() - prompt_start
+    style = style or 'cute'
+    vtuber.set_avatar_style(style)
+    vtuber.launch_time = main_start
     
     print(f"\nInitializing VTuber with '{style.title()}' style...")
     print("=" * 70)
     
-    vtuber = VTuberAvatar(avatar_style=style)
-    vtuber.run()
+    vtuber.run(pipelined=args.pipelined, trace_path=args.trace, render_fps=args.render_fps,
+               stream=args.stream, frame_ring=args.frame_ring, show_window=not args.no_window,
+               source=args.source, loop=args.loop)
     
     print("\nThank you for using VTuber Avatar!")
     print("Recording files saved in current directory.")
@@ -0,0 +1,188 @@
+"""Compact motion tracks: per-frame avatar state instead of rendered video
+
+Usage:
+    python motion_track.py info session.track
+    python motion_track.py render session.track output.mp4 [--style anime] [--size 1920x1080]
+
+A track stores one fixed-width record per frame (about 45 bytes, ~5 MB per hour
+at 30 FPS) in a record file (see record_file.py). Records are appended in
+chunks while recording and read back through a memory map, so a track can be
+re-rendered in any style or canvas size much faster than real time.
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+import config
+from features import EMOTIONS
+from gestures import GESTURES
+from record_file import RecordWriter, read_records
+
+MAGIC = b'VTTRACK1'
+HANDS = ('left', 'right')
+
+TRACK_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('head_rotation', '<f4', (3,)),
+    ('eye_open', '<f4', (2,)),
+    ('mouth_open', '<f4'),
+    ('emotion', 'u1'),
+    ('hand_present', 'u1', (2,)),
+    ('hand_position', '<i2', (2, 2)),
+    ('hand_gesture', 'u1', (2,))
+])
+
+EMOTION_CODES = {name: code for code, name in enumerate(EMOTIONS)}
+GESTURE_CODES = {name: code for code, name in enumerate(GESTURES)}
+
+
+class MotionTrackWriter(RecordWriter):
+    """Appends avatar state records to a track file in fixed-size chunks"""
+
+    def __init__(self, path, frame_size=(640, 480), chunk_frames=config.MOTION_TRACK_CHUNK_FRAMES):
+        # Hand positions are stored in webcam pixels, keep the frame size they refer to
+        super().__init__(path, MAGIC, TRACK_DTYPE, {'version': 1, 'frame_size': list(frame_size)},
+                         chunk_frames)
+
+    def append(self, avatar, timestamp):
+        """Add the avatar's current state (call with state_lock held)"""
+        fill_record(self.next_record(), avatar, timestamp)
+        self.commit()
+
+
+def fill_record(record, avatar, timestamp):
+    """Store the avatar's current state in a zeroed TRACK_DTYPE record (or a dtype containing its fields)"""
+    record['timestamp'] = timestamp
+    record['head_rotation'] = avatar.head_rotation
+    record['eye_open'] = avatar.eye_open_ratio
+    record['mouth_open'] = avatar.mouth_open_ratio
+    record['emotion'] = EMOTION_CODES.get(avatar.emotion, 0)
+    for i, hand in enumerate(HANDS):
+        position = avatar.hand_positions[hand]
+        if position is not None:
+            record['hand_present'][i] = 1
+            record['hand_position'][i] = position
+        record['hand_gesture'][i] = GESTURE_CODES.get(avatar.hand_gestures[hand], 0)
+
+
+class MotionTrack:
+    """Read-only, memory-mapped view of a track file"""
+
+    def __init__(self, path):
+        self.metadata, self.records = read_records(path, MAGIC, TRACK_DTYPE)
+        self.frame_size = tuple(self.metadata['frame_size'])
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        if len(self.records) == 0:
+            return 0.0
+        return float(self.records['timestamp'][-1] - self.records['timestamp'][0])
+
+    def sample(self, fps):
+        """Record index shown at each output frame of a constant-rate timeline"""
+        timestamps = self.records['timestamp']
+        if len(timestamps) == 0:
+            return np.zeros(0, dtype=np.int64)
+        frame_count = int(self.duration * fps) + 1
+        times = timestamps[0] + np.arange(frame_count) / fps
+        # Latest record captured at or before each output time
+        return np.searchsorted(timestamps, times, side='right') - 1
+
+    def apply(self, avatar, index):
+        """Set the avatar state to record index"""
+        record = self.records[index]
+        avatar.head_rotation = record['head_rotation'].tolist()
+        avatar.eye_open_ratio = record['eye_open'].tolist()
+        avatar.mouth_open_ratio = float(record['mouth_open'])
+        avatar.emotion = EMOTIONS[record['emotion']]
+        for i, hand in enumerate(HANDS):
+            if record['hand_present'][i]:
+                avatar.hand_positions[hand] = tuple(int(v) for v in record['hand_position'][i])
+            else:
+                avatar.hand_positions[hand] = None
+            avatar.hand_gestures[hand] = GESTURES[record['hand_gesture'][i]]
+
+
+def render_track(track_path, output_path, style='cute', size=(config.CANVAS_WIDTH, config.CANVAS_HEIGHT),
+                 fps=config.RECORDING_FPS, bg_color=config.CANVAS_BG_COLOR):
+    """Render a motion track to video without any tracking, returns frames written"""
+    # Imported here so reading tracks does not load MediaPipe
+    from main import VTuberAvatar
+
+    track = MotionTrack(track_path)
+    width, height = size
+    avatar = VTuberAvatar(avatar_style=style, use_detectors=False)
+    avatar.avatar_center = (width // 2, height // 2)
+    # Hand positions are stored in the recorded webcam frame's pixels
+    avatar.hand_frame_size = track.frame_size
+    avatar.canvas_size = size
+
+    fourcc = cv2.VideoWriter_fourcc(*config.RECORDING_CODEC)
+    writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer: {output_path}")
+
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    written = 0
+    try:
+        for index in track.sample(fps):
+            track.apply(avatar, index)
+            canvas[:] = bg_color
+            avatar.draw_avatar(canvas)
+            writer.write(canvas)
+            written += 1
+    finally:
+        writer.release()
+        avatar.close()
+    return written
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or re-render VTuber motion tracks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info = commands.add_parser('info', help="print track statistics")
+    info.add_argument('track')
+
+    render = commands.add_parser('render', help="render a track to video")
+    render.add_argument('track')
+    render.add_argument('output')
+    render.add_argument('--style', default='cute', choices=['cute', 'anime', 'cool', 'warm'])
+    render.add_argument('--size', type=parse_size, default=(config.CANVAS_WIDTH, config.CANVAS_HEIGHT),
+                        help="output canvas size, e.g. 1920x1080")
+    render.add_argument('--fps', type=float, default=config.RECORDING_FPS)
+    render.add_argument('--green-screen', action='store_true',
+                        help="render on the background removal color instead of the canvas color")
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        track = MotionTrack(args.track)
+        emotions = np.bincount(track.records['emotion'], minlength=len(EMOTIONS))
+        print(f"Frames:   {len(track)}")
+        print(f"Duration: {track.duration:.1f}s")
+        print(f"Size:     {os.path.getsize(args.track) / 1e6:.2f} MB")
+        print("Emotions: " + ", ".join(f"{name} {count}" for name, count in zip(EMOTIONS, emotions)))
+        return
+
+    bg_color = config.DEFAULT_BG_COLOR if args.green_screen else config.CANVAS_BG_COLOR
+    start = time.time()
+    written = render_track(args.track, args.output, style=args.style, size=args.size,
+                           fps=args.fps, bg_color=bg_color)
+    elapsed = time.time() - start
+    print(f"Rendered {written} frames in {elapsed:.1f}s "
+          f"({written / args.fps / max(elapsed, 1e-6):.1f}x real time): {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Headless offline rendering: turn recorded webcam footage into avatar video
+
+Usage:
+    python offline.py input.mp4 output.mp4 [--style anime] [--workers 8]
+
+Long files are split into chunks that are rendered by a process pool and
+stitched back together in order, so throughput scales with core count.
+Chunks are written in the final codec and joined by ffmpeg's concat demuxer
+with stream copy (no re-encode) when OFFLINE_FFMPEG is installed.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+import config
+from frame_packet import FramePacket
+from main import VTuberAvatar
+
+
+def get_video_info(path):
+    """Return (frame_count, fps) of a video file"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or config.RECORDING_FPS
+    cap.release()
+    return frame_count, fps
+
+
+def create_writer(path, fps, size):
+    """Open a VideoWriter using the configured recording codec"""
+    fourcc = cv2.VideoWriter_fourcc(*config.RECORDING_CODEC)
+    writer = cv2.VideoWriter(path, fourcc, fps, size)
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer: {path}")
+    return writer
+
+
+def render_chunk(input_path, output_path, start=0, end=None, style='cute', hands=True,
+                 background_removal=False, show_mesh=True, mirror=True,
+                 warmup=config.OFFLINE_CHUNK_WARMUP):
+    """Render frames [start, end) of input_path into output_path, returns frames written
+
+    A few frames before start are tracked but not written so face and hand
+    tracking have settled by the first frame of the chunk.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {input_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or config.RECORDING_FPS
+
+    avatar = VTuberAvatar(avatar_style=style)
+    avatar.show_hands = hands
+    avatar.show_mesh = show_mesh
+    avatar.use_background_removal = background_removal
+
+    first = max(0, start - warmup)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    writer = None
+    written = 0
+    index = first
+    try:
+        while end is None or index < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            # Timestamps follow the video timeline, not the wall clock
+            packet = FramePacket.from_capture(frame, timestamp=index / fps, index=index, mirror=mirror)
+            face_detected = avatar.process_packet(packet)
+
+            if index >= start:
+                canvas = avatar.render_canvas(packet.frame, face_detected, packet.timestamp, packet.timestamp)
+                if writer is None:
+                    writer = create_writer(output_path, fps, (canvas.shape[1], canvas.shape[0]))
+                writer.write(canvas)
+                written += 1
+            index += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+        avatar.close()
+
+    return written
+
+
+def concat_videos(chunk_paths, output_path, ffmpeg):
+    """Join chunks with ffmpeg's concat demuxer, copying the encoded streams"""
+    list_path = os.path.join(os.path.dirname(os.path.abspath(chunk_paths[0])), 'chunks.txt')
+    with open(list_path, 'w') as list_file:
+        for path in chunk_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                             '-i', list_path, '-c', 'copy', output_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg could not join chunks into {output_path}: {result.stderr.strip()}")
+
+
+def reencode_videos(chunk_paths, output_path, fps):
+    """Join chunks by decoding every frame and encoding it again (no ffmpeg)"""
+    writer = None
+    try:
+        for path in chunk_paths:
+            cap = cv2.VideoCapture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if writer is None:
+                    writer = create_writer(output_path, fps, (frame.shape[1], frame.shape[0]))
+                writer.write(frame)
+            cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+def stitch_videos(chunk_paths, output_path, fps, ffmpeg=config.OFFLINE_FFMPEG):
+    """Concatenate rendered chunks into one video, in order
+
+    All chunks share the codec, frame size and rate, so ffmpeg joins the
+    containers without touching the frames. Without ffmpeg the chunks are
+    re-encoded, which is serial and costs a second generation of compression.
+    """
+    # Chunks past the end of a file with a wrong frame count hold no frames
+    chunk_paths = [path for path in chunk_paths if os.path.exists(path)]
+    if not chunk_paths:
+        return
+    executable = shutil.which(ffmpeg) if ffmpeg else None
+    if executable:
+        concat_videos(chunk_paths, output_path, executable)
+    else:
+        print(f"{ffmpeg or 'ffmpeg'} not found, re-encoding chunks to join them")
+        reencode_videos(chunk_paths, output_path, fps)
+
+
+def render_video(input_path, output_path, workers=None, chunk_frames=config.OFFLINE_CHUNK_FRAMES,
+                 **options):
+    """Render a whole video, splitting it into chunks handled by a process pool
+
+    Extra keyword options are passed to render_chunk (style, hands,
+    background_removal, show_mesh, mirror). Returns the number of frames written.
+    """
+    frame_count, fps = get_video_info(input_path)
+    workers = workers or os.cpu_count() or 1
+
+    # Short files (or a single worker) are rendered directly
+    if workers <= 1 or frame_count <= chunk_frames:
+        return render_chunk(input_path, output_path, **options)
+
+    bounds = list(range(0, frame_count, chunk_frames))
+    temp_dir = tempfile.mkdtemp(prefix='vtuber_chunks_', dir=os.path.dirname(os.path.abspath(output_path)))
+    chunk_paths = [os.path.join(temp_dir, f'chunk_{i:05d}.mp4') for i in range(len(bounds))]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for i, start in enumerate(bounds):
+                # The last chunk runs to the end of the file in case the frame count is off
+                end = bounds[i + 1] if i + 1 < len(bounds) else None
+                futures.append(executor.submit(render_chunk, input_path, chunk_paths[i],
+                                               start, end, **options))
+            written = sum(future.result() for future in futures)
+
+        stitch_videos(chunk_paths, output_path, fps)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render recorded webcam footage into an avatar video (no window)")
+    parser.add_argument('input', help="input video file")
+    parser.add_argument('output', help="output video file")
+    parser.add_argument('--style', default=config.DEFAULT_AVATAR_STYLE,
+                        choices=['cute', 'anime', 'cool', 'warm'], help="avatar style")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-frames', type=int, default=config.OFFLINE_CHUNK_FRAMES,
+                        help="frames per chunk handed to a worker")
+    parser.add_argument('--no-hands', action='store_true', help="disable hand tracking")
+    parser.add_argument('--background-removal', action='store_true', help="enable background removal")
+    parser.add_argument('--no-mirror', action='store_true', help="do not mirror input frames")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    written = render_video(
+        args.input, args.output,
+        workers=args.workers,
+        chunk_frames=args.chunk_frames,
+        style=args.style,
+        hands=not args.no_hands,
+        background_removal=args.background_removal,
+        mirror=not args.no_mirror
+    )
+    elapsed = time.time() - start_time
+    print(f"Rendered {written} frames to {args.output} in {elapsed:.1f}s "
+          f"({written / elapsed if elapsed > 0 else 0:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
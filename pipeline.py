@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import deque
+
+import cv2
+
+import config
+from frame_packet import FramePacket
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, item):
+        """Add an item, discarding the stalest one if the queue is full"""
+        with self.condition:
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout / close"""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        """Wake up any waiting consumer so its thread can exit"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class PipelinedRunner:
+    """Runs capture, inference and render/output as separate pipeline stages
+
+    Capture and inference each get their own thread, render/display stays on the
+    main thread (OpenCV HighGUI is not thread-safe). Stages are connected by
+    LatestQueue so a slow stage only ever sees the newest frame, and frame
+    throughput is limited by the slowest stage instead of the sum of all stages.
+    """
+
+    def __init__(self, avatar, cap, queue_size=config.PIPELINE_QUEUE_SIZE, render_fps=config.RENDER_FPS):
+        self.avatar = avatar
+        self.cap = cap
+        self.render_fps = render_fps
+        self.capture_queue = LatestQueue(queue_size)
+        self.result_queue = LatestQueue(queue_size)
+        self.running = threading.Event()
+        self.threads = []
+        # Exception that stopped a worker stage, re-raised by run()
+        self.error = None
+
+    def capture_loop(self):
+        """Read frames continuously and hand over only the newest one"""
+        profiler = self.avatar.profiler
+        index = 0
+        while self.running.is_set():
+            with profiler.span('capture'):
+                ret, frame = self.cap.read()
+            if not ret:
+                print("Error: Could not read frame" if self.cap.kind == 'webcam' else "End of capture source")
+                self.running.clear()
+                break
+            with profiler.span('convert'):
+                packet = FramePacket.from_capture(frame, index=index)
+            self.capture_queue.put(packet)
+            index += 1
+        self.capture_queue.close()
+
+    def inference_loop(self):
+        """Run detectors on the newest captured frame"""
+        try:
+            while self.running.is_set():
+                packet = self.capture_queue.get(timeout=0.1)
+                if packet is None:
+                    continue
+                start = time.perf_counter()
+                with self.avatar.profiler.span('inference'):
+                    face_detected = self.avatar.process_packet(packet)
+                # Inference is the stage that limits the detection rate
+                self.avatar.update_quality(time.perf_counter() - start)
+                self.result_queue.put((packet, face_detected))
+        except Exception as exception:
+            # Stop the whole pipeline, run() re-raises it on the main thread
+            self.error = exception
+            self.running.clear()
+        finally:
+            self.result_queue.close()
+
+    def start(self):
+        """Start capture and inference threads"""
+        self.running.set()
+        for target, name in ((self.capture_loop, 'capture'), (self.inference_loop, 'inference')):
+            thread = threading.Thread(target=target, name=f'vtuber-{name}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Signal all stages to stop and wait for worker threads"""
+        self.running.clear()
+        self.capture_queue.close()
+        self.result_queue.close()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
+
+    def run(self):
+        """Render/output stage, runs on the calling (main) thread
+
+        With render_fps set the canvas is drawn on a fixed schedule from the
+        newest inference result, the avatar's smoothed parameters are
+        predicted to each display time, so the output rate does not depend on
+        how often detection finishes.
+        """
+        self.start()
+        interval = 1.0 / self.render_fps if self.render_fps else None
+        latest = None
+        canvas_shape = (720, 1280, 3)
+        last_output = next_render = time.time()
+        try:
+            while self.running.is_set():
+                if interval is None:
+                    result = self.result_queue.get(timeout=0.05)
+                else:
+                    result = self.result_queue.get(timeout=max(0.0, next_render - time.time()))
+                if result is not None:
+                    latest = result
+
+                now = time.time()
+                if interval is None:
+                    render = result is not None
+                else:
+                    if now < next_render:
+                        continue  # New result stored, next frame not due yet
+                    # Skip missed ticks instead of bursting to catch up
+                    next_render = max(next_render + interval, now)
+                    render = latest is not None
+
+                if render:
+                    packet, face_detected = latest
+                    # Decoupled frames are placed on the recording timeline by display time
+                    timestamp = packet.timestamp if interval is None else now
+                    canvas = self.avatar.render_canvas(packet.frame, face_detected, timestamp)
+
+                    # FPS is measured between displayed frames
+                    self.avatar.update_fps(now - last_output)
+                    last_output = now
+
+                    if self.avatar.show_window:
+                        with self.avatar.profiler.span('display'):
+                            cv2.imshow('VTuber Avatar Advanced', canvas)
+                    self.avatar.mark_frame_shown()
+                    canvas_shape = canvas.shape
+
+                if not self.avatar.show_window:
+                    continue
+                # Keep the window responsive even when no new frame arrived
+                with self.avatar.profiler.span('waitkey'):
+                    key = cv2.waitKey(1) & 0xFF
+                if not self.avatar.handle_key(key, canvas_shape):
+                    break
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+# Connection index arrays, (E, 2) landmark pairs: 'face' and 'hands'. Built on
+# the first overlay drawn, so importing the renderer (and main) does not load
+# MediaPipe for replays and offline renders that never draw one.
+EDGES = {}
+
+FACE_MESH_COLOR = (192, 192, 192)
+HAND_COLOR = (48, 255, 48)
+
+
+def connection_edges(kind):
+    """(E, 2) landmark index pairs of the face mesh tessellation or the hand skeleton"""
+    edges = EDGES.get(kind)
+    if edges is None:
+        import mediapipe as mp
+
+        connections = (mp.solutions.face_mesh.FACEMESH_TESSELATION if kind == 'face'
+                       else mp.solutions.hands.HAND_CONNECTIONS)
+        edges = EDGES[kind] = np.array(sorted(connections), dtype=np.intp)
+    return edges
+
+
+def edge_segments(point_arrays, edges, size):
+    """(S, 2, 2) int32 pixel line segments of edges over normalized (N, 3) landmark arrays"""
+    width, height = size
+    segments = np.concatenate([points[edges, :2] for points in point_arrays])
+    segments *= (width, height)
+    return np.rint(segments, out=segments).astype(np.int32)
+
+
+class PreviewRenderer:
+    """Webcam preview with landmark overlays drawn at preview resolution
+
+    The clean frame is downscaled first and the face mesh / hand skeletons are
+    drawn onto the small image, each as one batched cv2.polylines call over
+    precomputed connection arrays, so the full-size frame is never drawn on.
+    """
+
+    def __init__(self, size=(320, 240), position=(10, 10)):
+        self.size = size
+        self.position = position
+        self.image = np.empty((size[1], size[0], 3), dtype=np.uint8)
+
+    def draw(self, canvas, frame, faces=None, hands=None):
+        """Place frame, with faces / hands (lists of normalized (N, 3) arrays) drawn over it, on canvas"""
+        image = cv2.resize(frame, self.size, dst=self.image)
+        if faces is not None and len(faces):
+            cv2.polylines(image, edge_segments(faces, connection_edges('face'), self.size), False, FACE_MESH_COLOR, 1)
+        if hands is not None and len(hands):
+            cv2.polylines(image, edge_segments(hands, connection_edges('hands'), self.size), False, HAND_COLOR, 2)
+
+        x, y = self.position
+        width, height = self.size
+        canvas[y:y + height, x:x + width] = image
+        return canvas
@@ -0,0 +1,73 @@
+from collections import deque
+
+import config
+
+
+class QualityController:
+    """Moves along a quality ladder to keep frame time within the target budget
+
+    Level 0 is full quality, every following level is cheaper. The controller
+    watches the mean of the last window frame times: it steps down one level
+    as soon as that is over budget by more than down_margin, and steps back up
+    only after upgrade_frames consecutive frames where it stayed below
+    up_ratio of the budget (the next level up costs more, so it needs real
+    headroom). After every change the window is refilled before deciding
+    again, which together with the asymmetric thresholds stops it from
+    oscillating between two levels.
+    """
+
+    def __init__(self, levels=config.QUALITY_LEVELS, target_fps=config.QUALITY_TARGET_FPS,
+                 window=config.QUALITY_WINDOW, down_margin=config.QUALITY_DOWN_MARGIN,
+                 up_ratio=config.QUALITY_UP_RATIO, upgrade_frames=config.QUALITY_UPGRADE_FRAMES):
+        self.levels = levels
+        self.budget = 1.0 / target_fps
+        self.down_margin = down_margin
+        self.up_ratio = up_ratio
+        self.upgrade_frames = upgrade_frames
+        self.frame_times = deque(maxlen=window)
+        self.total = 0.0
+        self.headroom_frames = 0
+        self.level = 0
+        self.changes = 0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def name(self):
+        return self.settings['name']
+
+    @property
+    def mean_frame_time(self):
+        return self.total / len(self.frame_times) if self.frame_times else 0.0
+
+    def add(self, frame_time):
+        """Add one frame time (seconds), returns the new level when it changed, else None"""
+        if len(self.frame_times) == self.frame_times.maxlen:
+            self.total -= self.frame_times[0]
+        self.frame_times.append(frame_time)
+        self.total += frame_time
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return None
+
+        mean = self.mean_frame_time
+        if mean > self.budget * (1 + self.down_margin):
+            self.headroom_frames = 0
+            if self.level < len(self.levels) - 1:
+                return self.set_level(self.level + 1)
+        elif mean < self.budget * self.up_ratio:
+            self.headroom_frames += 1
+            if self.level > 0 and self.headroom_frames >= self.upgrade_frames:
+                return self.set_level(self.level - 1)
+        else:
+            self.headroom_frames = 0
+        return None
+
+    def set_level(self, level):
+        self.level = level
+        self.changes += 1
+        self.frame_times.clear()
+        self.total = 0.0
+        self.headroom_frames = 0
+        return level
@@ -0,0 +1,69 @@
+"""Fixed-width record files: a small JSON header followed by raw NumPy records
+
+Used by motion tracks and landmark captures. Records are appended in chunks
+and read back through np.memmap, so the record number is the frame index and
+files of any length open instantly.
+"""
+import os
+import json
+import struct
+
+import numpy as np
+
+HEADER_SIZE = 512
+
+
+class RecordWriter:
+    """Appends structured records to a file, buffering chunk_frames at a time"""
+
+    def __init__(self, path, magic, dtype, metadata, chunk_frames):
+        metadata = json.dumps(dict(metadata, dtype=dtype.descr)).encode('ascii')
+        if len(magic) + 4 + len(metadata) > HEADER_SIZE:
+            raise ValueError("Record file header too large")
+        header = magic + struct.pack('<I', len(metadata)) + metadata
+
+        self.path = path
+        self.buffer = np.zeros(chunk_frames, dtype=dtype)
+        self.empty = np.zeros(1, dtype=dtype)
+        self.count = 0
+        self.frames = 0
+        self.file = open(path, 'wb')
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def next_record(self):
+        """Zeroed record to fill in, stored by the following commit()"""
+        self.buffer[self.count:self.count + 1] = self.empty
+        return self.buffer[self.count]
+
+    def commit(self):
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to disk"""
+        if self.count:
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.frames += self.count
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_records(path, magic, dtype):
+    """Return (metadata, records) with records memory-mapped read-only"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(magic)] != magic:
+        raise ValueError(f"Unexpected file format: {path}")
+    length, = struct.unpack('<I', header[len(magic):len(magic) + 4])
+    metadata = json.loads(header[len(magic) + 4:len(magic) + 4 + length])
+
+    # A partially written last record (e.g. after a crash) is ignored
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count <= 0:
+        return metadata, np.zeros(0, dtype=dtype)
+    return metadata, np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
@@ -0,0 +1,163 @@
+import time
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+import config
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'duplicate')
+
+
+class AsyncRecorder:
+    """Background video encoder fed by a bounded queue of reused frame buffers
+
+    Frames are placed on the output timeline by their capture timestamps: a frame
+    lands in slot round((timestamp - start) * fps), frames arriving faster than
+    the output rate are skipped and gaps are filled by repeating the previous
+    frame. Recordings therefore play back in real time whatever the loop FPS.
+
+    When the queue is full the overflow policy decides what happens:
+      block        the caller waits for the encoder (no frame is lost)
+      drop_oldest  the oldest queued frame is discarded for the new one
+      duplicate    the new frame is discarded, its slot repeats the previous frame
+    """
+
+    def __init__(self, filename, size, fps=config.RECORDING_FPS, codec=config.RECORDING_CODEC,
+                 queue_size=config.RECORDING_QUEUE_SIZE, overflow=config.RECORDING_OVERFLOW_POLICY,
+                 start_time=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        if queue_size < 1:
+            # Every policy needs room for at least one queued frame
+            raise ValueError(f"Recording queue size must be at least 1, got {queue_size}")
+        width, height = size
+        self.filename = filename
+        self.fps = fps
+        self.overflow = overflow
+        self.queue_size = queue_size
+        self.start_time = time.time() if start_time is None else start_time
+
+        fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.writer = cv2.VideoWriter(filename, fourcc, fps, (width, height))
+        if not self.writer.isOpened():
+            raise IOError(f"Could not open video writer: {filename}")
+
+        # Buffers: queue_size queued + one held as the last encoded frame + one being filled
+        self.free = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(queue_size + 2)]
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # Counters
+        self.written = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.skipped = 0
+        self.next_slot = 0
+        self.last_frame = None
+        self.latest_timestamp = None
+
+        self.thread = threading.Thread(target=self.encode_loop, name='vtuber-encoder', daemon=True)
+        self.thread.start()
+
+    @property
+    def queue_depth(self):
+        return len(self.pending)
+
+    def stats(self):
+        """Encoder counters for the debug overlay"""
+        return {
+            'queue_depth': self.queue_depth,
+            'written': self.written,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+            'skipped': self.skipped
+        }
+
+    def write(self, canvas, timestamp=None):
+        """Queue a copy of canvas captured at timestamp (seconds, time.time())"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self.condition:
+            if self.closed:
+                return False
+            self.latest_timestamp = timestamp
+            if not self.free:
+                if self.overflow == 'block':
+                    while not self.free and not self.closed:
+                        self.condition.wait()
+                elif self.overflow == 'drop_oldest':
+                    buffer, _ = self.pending.popleft()
+                    self.free.append(buffer)
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return False
+            if self.closed:
+                return False
+            buffer = self.free.pop()
+
+        # Copy outside the lock so the encoder thread is not held up
+        np.copyto(buffer, canvas)
+
+        with self.condition:
+            self.pending.append((buffer, timestamp))
+            self.condition.notify_all()
+        return True
+
+    def encode_loop(self):
+        """Encoder thread: write queued frames onto the constant-rate timeline"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    break
+                buffer, timestamp = self.pending.popleft()
+            self.encode(buffer, timestamp)
+
+        # Frames dropped at the very end still count towards the duration
+        if self.last_frame is not None and self.latest_timestamp is not None:
+            self.fill_until(self.slot(self.latest_timestamp) + 1)
+
+    def slot(self, timestamp):
+        """Output frame index for a capture timestamp"""
+        return int(round((timestamp - self.start_time) * self.fps))
+
+    def fill_until(self, slot, filler=None):
+        """Repeat filler (default: the last encoded frame) up to, not including, slot"""
+        filler = self.last_frame if filler is None else filler
+        while self.next_slot < slot:
+            self.writer.write(filler)
+            self.duplicated += 1
+            self.next_slot += 1
+
+    def encode(self, buffer, timestamp):
+        """Write one queued frame into its slot and recycle the buffer it replaces"""
+        slot = self.slot(timestamp)
+        if slot < self.next_slot:
+            # Faster than the output rate, this slot is already filled
+            self.skipped += 1
+            recycled = buffer
+        else:
+            # The first frame also covers the time between start_recording and its capture
+            self.fill_until(slot, buffer if self.last_frame is None else None)
+            self.writer.write(buffer)
+            self.written += 1
+            self.next_slot = slot + 1
+            recycled, self.last_frame = self.last_frame, buffer
+
+        if recycled is not None:
+            with self.condition:
+                self.free.append(recycled)
+                self.condition.notify_all()
+
+    def close(self):
+        """Encode everything still queued and finalize the file"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.writer.release()
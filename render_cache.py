@@ -0,0 +1,190 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import config
+
+BROW_COLOR = (80, 60, 40)
+MOUTH_OUTLINE_COLOR = (100, 50, 50)
+NOSE_COLOR = (180, 140, 110)
+HIGHLIGHT_COLOR = (255, 255, 255)
+
+
+class Sprite:
+    """Pre-rasterized avatar part with a binary alpha mask
+
+    The anchor is the pixel inside the sprite that lines up with the point the
+    part is drawn around (head center, eye center, ...).
+    """
+
+    __slots__ = ('image', 'mask', 'anchor')
+
+    def __init__(self, half_width, half_height, draw):
+        width, height = 2 * half_width + 1, 2 * half_height + 1
+        self.anchor = (half_width, half_height)
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+        mask = np.zeros((height, width), dtype=np.uint8)
+
+        # Same primitives drawn twice: once in color, once as coverage
+        draw(self.image, lambda color: color, self.anchor)
+        draw(mask, lambda color: 255, self.anchor)
+        self.mask = mask
+
+    def blit(self, canvas, x, y):
+        """Copy the sprite onto the canvas with its anchor at (x, y)"""
+        height, width = self.image.shape[:2]
+        left, top = x - self.anchor[0], y - self.anchor[1]
+
+        # Clip to the canvas
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, canvas.shape[1]), min(top + height, canvas.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        sx, sy = x0 - left, y0 - top
+        # cv2.copyTo writes straight into the canvas ROI view
+        cv2.copyTo(self.image[sy:sy + y1 - y0, sx:sx + x1 - x0],
+                   self.mask[sy:sy + y1 - y0, sx:sx + x1 - x0],
+                   canvas[y0:y1, x0:x1])
+
+
+def _offset(anchor, dx=0, dy=0):
+    return (anchor[0] + dx, anchor[1] + dy)
+
+
+class AvatarRenderCache:
+    """LRU cache of avatar part sprites keyed by style and quantized expression
+
+    Eye and mouth openness are quantized to the integer pixel sizes draw_avatar
+    already uses, so the cached render matches the direct OpenCV drawing while
+    costing a handful of masked copies per frame. Keys include the style's
+    color values, so changing avatar_colors builds new sprites.
+    """
+
+    def __init__(self, max_entries=config.RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Return the sprite for key, building (and caching) it on a miss"""
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = build()
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    # ---- part builders -------------------------------------------------
+
+    def head(self, style_key, colors):
+        def draw(img, c, a):
+            cv2.circle(img, a, 120, c(colors['skin']), -1)
+            cv2.circle(img, a, 120, c(colors['skin_outline']), 3)
+        return self.get(('head', style_key), lambda: Sprite(124, 124, draw))
+
+    def blush(self, style_key, colors):
+        def draw(img, c, a):
+            cv2.circle(img, _offset(a, -70, 10), 15, c(colors['blush']), -1)
+            cv2.circle(img, _offset(a, 70, 10), 15, c(colors['blush']), -1)
+        return self.get(('blush', style_key), lambda: Sprite(88, 28, draw))
+
+    def eye(self, style_key, colors, eye_size):
+        def draw(img, c, a):
+            cv2.ellipse(img, a, (22, eye_size), 0, 0, 360, c(colors['eye_white']), -1)
+            cv2.ellipse(img, a, (22, eye_size), 0, 0, 360, c(colors['eye_outline']), 2)
+        return self.get(('eye', style_key, eye_size), lambda: Sprite(26, eye_size + 4, draw))
+
+    def iris(self, style_key, colors):
+        def draw(img, c, a):
+            cv2.circle(img, a, 14, c(colors['iris']), -1)
+            cv2.circle(img, a, 8, c(colors['pupil']), -1)
+            cv2.circle(img, _offset(a, 3, -3), 4, c(HIGHLIGHT_COLOR), -1)
+        return self.get(('iris', style_key), lambda: Sprite(16, 16, draw))
+
+    def closed_eye(self, style_key, colors):
+        def draw(img, c, a):
+            cv2.line(img, _offset(a, -20), _offset(a, 20), c(colors['eye_outline']), 3)
+        return self.get(('closed_eye', style_key), lambda: Sprite(24, 4, draw))
+
+    def brow(self, angle):
+        def draw(img, c, a):
+            cv2.ellipse(img, a, (25, 8), angle, 0, 180, c(BROW_COLOR), 4)
+        return self.get(('brow', angle), lambda: Sprite(30, 30, draw))
+
+    def mouth(self, style_key, colors, shape, mouth_height):
+        def draw(img, c, a):
+            if shape == 'smile':
+                cv2.ellipse(img, _offset(a, 0, -10), (50, 20), 0, 0, 180, c(colors['mouth']), 4)
+            elif shape == 'open':
+                cv2.ellipse(img, a, (50, mouth_height), 0, 0, 360, c(colors['mouth']), -1)
+                cv2.ellipse(img, a, (50, mouth_height), 0, 0, 360, c(MOUTH_OUTLINE_COLOR), 2)
+            else:
+                cv2.ellipse(img, _offset(a, 0, -5), (50, 15), 0, 0, 180, c(colors['mouth']), 3)
+        key = ('mouth', style_key, shape, mouth_height if shape == 'open' else 0)
+        return self.get(key, lambda: Sprite(54, max(mouth_height, 15) + 16, draw))
+
+    def nose(self):
+        def draw(img, c, a):
+            points = np.array([a, _offset(a, -5, 15), _offset(a, 5, 15)], np.int32)
+            cv2.polylines(img, [points], True, c(NOSE_COLOR), 2)
+        return self.get(('nose',), lambda: Sprite(8, 18, draw))
+
+    # ---- frame drawing -------------------------------------------------
+
+    def draw(self, canvas, center, head_rotation, eye_open_ratio, mouth_open_ratio,
+             emotion, style, colors):
+        """Draw head, eyes, brows, mouth and nose (same layout as draw_avatar)"""
+        style_key = (style, tuple(sorted(colors.items())))
+        center_x, center_y = center
+        pitch, yaw, roll = head_rotation
+
+        head_x = center_x + int(yaw * 2)
+        head_y = center_y + int(pitch * 2)
+        self.head(style_key, colors).blit(canvas, head_x, head_y)
+
+        if emotion in ('happy', 'surprised'):
+            self.blush(style_key, colors).blit(canvas, head_x, head_y)
+
+        # Eyes
+        eye_y = head_y - 20
+        iris_dx, iris_dy = int(yaw / 2), int(pitch / 2)
+        eye_size_multiplier = 1.2 if emotion == 'surprised' else 1.0
+        eye_xs = (head_x - 40 + int(yaw), head_x + 40 + int(yaw))
+        for eye_x, ratio in zip(eye_xs, eye_open_ratio):
+            eye_size = int(25 * ratio * eye_size_multiplier)
+            if eye_size > 5:
+                self.eye(style_key, colors, eye_size).blit(canvas, eye_x, eye_y)
+                self.iris(style_key, colors).blit(canvas, eye_x + iris_dx, eye_y + iris_dy)
+            else:
+                self.closed_eye(style_key, colors).blit(canvas, eye_x, eye_y)
+
+        # Eyebrows
+        brow_y = eye_y - 35
+        brow_angle = 0
+        if emotion == 'angry':
+            brow_y -= 5
+            brow_angle = -15
+        elif emotion == 'surprised':
+            brow_y -= 10
+        self.brow(brow_angle).blit(canvas, eye_xs[0], brow_y)
+        self.brow(-brow_angle).blit(canvas, eye_xs[1], brow_y)
+
+        # Mouth
+        mouth_height = int(20 * mouth_open_ratio) if mouth_open_ratio > 0.3 else 5
+        if emotion == 'happy':
+            shape = 'smile'
+        elif mouth_height > 10:
+            shape = 'open'
+        else:
+            shape = 'closed'
+        self.mouth(style_key, colors, shape, mouth_height).blit(canvas, head_x, head_y + 40)
+
+        # Nose
+        self.nose().blit(canvas, head_x + int(yaw / 2), head_y + 5)
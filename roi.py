@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+import config
+
+
+def crop_to_region(rgb, spec):
+    """Crop and downscale an RGB frame to a region spec (x0, y0, x1, y1, max_side)"""
+    x0, y0, x1, y1, max_side = spec
+    crop = rgb[y0:y1, x0:x1]
+    width, height = x1 - x0, y1 - y0
+    scale = max_side / max(width, height)
+    if scale < 1.0:
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        image = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+    else:
+        image = np.ascontiguousarray(crop)
+    # Read-only so MediaPipe takes it by reference
+    image.flags.writeable = False
+    return image
+
+
+def region_to_frame(points, spec, frame_size):
+    """Map (N, 3) landmarks normalized to the region back to full-frame coordinates, in place"""
+    x0, y0, x1, y1, _ = spec
+    width, height = frame_size
+    points[:, 0] = (points[:, 0] * (x1 - x0) + x0) / width
+    points[:, 1] = (points[:, 1] * (y1 - y0) + y0) / height
+    # Landmark depth is on the same scale as x
+    points[:, 2] *= (x1 - x0) / width
+    return points
+
+
+class ROITracker:
+    """Plans each detector's input region from the previous frame's landmarks
+
+    While tracking, the detector gets a padded square around last frame's
+    landmark bounding box, downscaled to target_size. When tracking is lost
+    (or every refresh_interval frames, so a second hand entering the frame is
+    picked up) it falls back to the whole frame, downscaled to full_max_side.
+    Inference cost therefore stays flat as the webcam resolution grows.
+    """
+
+    def __init__(self, target_size, padding, refresh_interval=0,
+                 full_max_side=config.ROI_FULL_FRAME_MAX_SIDE, enabled=config.ROI_CROPPING_ENABLED):
+        self.target_size = target_size
+        self.padding = padding
+        self.refresh_interval = refresh_interval
+        self.full_max_side = full_max_side
+        self.enabled = enabled
+        # Normalized (x0, y0, x1, y1) of the last landmarks, None = not tracking
+        self.bounds = None
+        self.frames_since_full = 0
+
+    def plan(self, frame_size):
+        """Region spec for the next inference, or None to use the frame as is"""
+        width, height = frame_size
+        refresh = self.refresh_interval and self.frames_since_full >= self.refresh_interval
+        if not self.enabled or self.bounds is None or refresh:
+            self.frames_since_full = 0
+            if max(width, height) <= self.full_max_side:
+                return None
+            return (0, 0, width, height, self.full_max_side)
+
+        self.frames_since_full += 1
+        x0, y0, x1, y1 = self.bounds
+        center_x, center_y = (x0 + x1) / 2 * width, (y0 + y1) / 2 * height
+        side = max((x1 - x0) * width, (y1 - y0) * height) * (1 + 2 * self.padding)
+        half = side / 2
+        left, top = max(0, int(center_x - half)), max(0, int(center_y - half))
+        right, bottom = min(width, int(center_x + half) + 1), min(height, int(center_y + half) + 1)
+        if right - left < 2 or bottom - top < 2:
+            return (0, 0, width, height, self.full_max_side)
+        return (left, top, right, bottom, self.target_size)
+
+    def update(self, point_arrays):
+        """Track the union bounding box of full-frame (N, 3) landmark arrays"""
+        if not point_arrays:
+            self.bounds = None
+            return
+        points = np.concatenate([array[:, :2] for array in point_arrays])
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        self.bounds = (float(x0), float(y0), float(x1), float(y1))
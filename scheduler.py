@@ -0,0 +1,101 @@
+import config
+
+
+class DetectorScheduler:
+    """Decides which detectors run on each frame
+
+    Every detector has its own cadence (run every Nth frame). Cadences come from
+    config.DETECTOR_CADENCE, or with auto mode they are picked from the measured
+    cost of each detector so the amortized detector time fits a frame budget.
+    Face Mesh always runs every frame because blinks and the mouth change fast.
+    """
+
+    def __init__(self, cadences=None, auto=config.AUTO_CADENCE,
+                 budget_ms=config.DETECTOR_BUDGET_MS, max_cadence=config.MAX_DETECTOR_CADENCE):
+        self.cadences = dict(config.DETECTOR_CADENCE if cadences is None else cadences)
+        self.auto = auto
+        self.budget = budget_ms / 1000.0
+        self.max_cadence = max_cadence
+        self.frame_count = -1
+
+        # Exponential moving average of each detector's cost in seconds
+        self.costs = {}
+        self.cost_smoothing = 0.1
+        self.retune_interval = 30
+
+    def begin_frame(self):
+        """Advance to the next frame"""
+        self.frame_count += 1
+        if self.auto and self.frame_count > 0 and self.frame_count % self.retune_interval == 0:
+            self.retune()
+
+    def should_run(self, kind):
+        """Whether a detector is due on the current frame"""
+        cadence = self.cadences.get(kind, 1)
+        return cadence <= 1 or self.frame_count % cadence == 0
+
+    def record_cost(self, kind, seconds):
+        """Record how long a detector call took"""
+        previous = self.costs.get(kind)
+        if previous is None:
+            self.costs[kind] = seconds
+        else:
+            self.costs[kind] = previous + self.cost_smoothing * (seconds - previous)
+
+    def amortized_cost(self):
+        """Average detector time per frame with the current cadences"""
+        return sum(cost / self.cadences.get(kind, 1) for kind, cost in self.costs.items())
+
+    def retune(self):
+        """Raise or lower cadences so the amortized detector cost fits the budget"""
+        adjustable = [kind for kind in self.costs if kind != 'face']
+        if not adjustable:
+            return
+
+        if self.amortized_cost() > self.budget:
+            # Slow down the detector that saves the most time per step
+            candidates = [kind for kind in adjustable if self.cadences.get(kind, 1) < self.max_cadence]
+            if candidates:
+                kind = max(candidates, key=lambda k: self.costs[k] / self.cadences.get(k, 1))
+                self.cadences[kind] = self.cadences.get(kind, 1) + 1
+        elif self.amortized_cost() < self.budget * 0.7:
+            # Plenty of headroom, run the cheapest slowed-down detector more often
+            candidates = [kind for kind in adjustable if self.cadences.get(kind, 1) > 1]
+            if candidates:
+                kind = min(candidates, key=lambda k: self.costs[k])
+                self.cadences[kind] -= 1
+
+
+class PositionTrack:
+    """Last two observations of a 2D point, used to extrapolate skipped frames"""
+
+    def __init__(self, max_horizon=config.MAX_EXTRAPOLATION_TIME):
+        self.max_horizon = max_horizon
+        self.samples = []
+
+    def add(self, timestamp, position):
+        """Record a detected position"""
+        self.samples.append((timestamp, position))
+        if len(self.samples) > 2:
+            self.samples.pop(0)
+
+    def reset(self):
+        self.samples = []
+
+    def predict(self, timestamp):
+        """Linear extrapolation from the last two samples, clamped to max_horizon"""
+        if not self.samples:
+            return None
+        t1, p1 = self.samples[-1]
+        if len(self.samples) < 2:
+            return p1
+        t0, p0 = self.samples[0]
+        if t1 <= t0:
+            return p1
+
+        dt = min(timestamp - t1, self.max_horizon)
+        if dt <= 0:
+            return p1
+        scale = dt / (t1 - t0)
+        return (int(p1[0] + (p1[0] - p0[0]) * scale),
+                int(p1[1] + (p1[1] - p0[1]) * scale))
@@ -0,0 +1,261 @@
+"""Multi-session host: several avatar sessions sharing one detector worker pool
+
+Usage:
+    python session_host.py webcam:0 webcam:1
+    python session_host.py clip1.mp4 clip2.mp4 synthetic --workers 2 --no-window
+    python session_host.py clip1.mp4 clip2.mp4 --frame-ring    # session n publishes to vtuber_frames_<n>
+
+Every capture source (see capture.py) gets its own session: a VTuberAvatar
+with its own tracking state, rendering and outputs, run on its own thread.
+The MediaPipe models run in one SharedDetectorPool (detector_pool.py) with a
+fixed number of worker processes, so processes and model memory do not grow
+with the number of sessions. Free workers go to the session that has used the
+least worker time, and each session is capped at its frame budget
+(--budget-fps), so one session cannot take the workers from the others.
+
+Every SESSION_REPORT_INTERVAL seconds each session reports its delivered
+FPS, capture-to-canvas latency (mean / p95), time spent waiting for the pool
+(queueing + inference) and its share of the pool's worker time.
+"""
+import time
+import argparse
+import threading
+
+import cv2
+import numpy as np
+
+import config
+from capture import open_source
+from frame_packet import FramePacket
+from instrumentation import Histogram
+from detector_pool import SharedDetectorPool
+from main import VTuberAvatar
+
+
+class Session:
+    """One avatar session: capture, pooled detection and rendering on its own thread"""
+
+    def __init__(self, index, spec, style='cute', budget_fps=config.SESSION_BUDGET_FPS, loop=False,
+                 hands=True, background_removal=False):
+        self.index = index
+        self.spec = spec
+        self.source = open_source(spec, loop=loop)
+        self.avatar = VTuberAvatar(avatar_style=style, use_process_pool=True)
+        self.avatar.show_window = False
+        self.avatar.show_hands = hands
+        self.avatar.use_background_removal = background_removal
+        self.interval = 1.0 / budget_fps if budget_fps else 0.0
+
+        self.thread = None
+        # Copy of the newest canvas: the avatar's compositor reuses its own buffer every frame
+        self.canvas = None
+        self.finished = False
+        self.reported_end = False
+        self.error = None
+
+        # Statistics of the current report window
+        self.lock = threading.Lock()
+        self.latency = Histogram()
+        self.window_frames = 0
+        self.window_start = time.perf_counter()
+        self.frames = 0
+        # Pool totals (frames, wait, worker time) at the previous report
+        self.pool_totals = (0, 0.0, 0.0)
+
+    def connect(self, pool):
+        """Use the shared pool for detection instead of per-session detector processes"""
+        self.avatar.detector_pool = pool.session(self.source.size)
+
+    def start(self, running):
+        self.thread = threading.Thread(target=self.run, args=(running,), name=f'vtuber-session-{self.index}',
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, running):
+        """Session loop: capture, detect through the pool, render, at most budget_fps frames per second"""
+        avatar = self.avatar
+        next_frame = last_frame = time.perf_counter()
+        try:
+            while running.is_set():
+                if self.interval:
+                    now = time.perf_counter()
+                    if now < next_frame:
+                        time.sleep(next_frame - now)
+                    next_frame = max(next_frame + self.interval, time.perf_counter())
+
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+                start = time.perf_counter()
+                packet = FramePacket.from_capture(frame, index=self.frames)
+                face_detected = avatar.process_packet(packet)
+                canvas = avatar.render_canvas(packet.frame, face_detected, packet.timestamp)
+                latency = time.perf_counter() - start
+
+                now = time.perf_counter()
+                avatar.update_fps(now - last_frame)
+                last_frame = now
+                avatar.update_quality(latency)
+                avatar.mark_frame_shown()
+                with self.lock:
+                    if self.canvas is None:
+                        self.canvas = canvas.copy()
+                    else:
+                        np.copyto(self.canvas, canvas)
+                    self.latency.record(latency)
+                    self.window_frames += 1
+                self.frames += 1
+        except Exception as exception:
+            self.error = exception
+        finally:
+            self.finished = True
+
+    def report(self):
+        """Statistics since the previous report, restarting the window"""
+        now = time.perf_counter()
+        with self.lock:
+            latency, frames = self.latency.summary(), self.window_frames
+            elapsed, self.window_start = now - self.window_start, now
+            self.latency = Histogram()
+            self.window_frames = 0
+        pool_session = self.avatar.detector_pool
+        totals = (pool_session.frames, pool_session.wait_total, pool_session.busy_total)
+        pool_frames, wait, busy = (total - previous for total, previous in zip(totals, self.pool_totals))
+        self.pool_totals = totals
+        pool_frames = max(pool_frames, 1)
+        return {
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': latency['mean_ms'],
+            'latency_p95_ms': latency['p95_ms'],
+            'wait_ms': wait / pool_frames * 1000,
+            'worker_ms': busy / pool_frames * 1000,
+            'worker_time': busy
+        }
+
+    def close(self):
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+        self.source.release()
+        self.avatar.stop_frame_ring()
+        self.avatar.close()
+
+
+class SessionHost:
+    """Runs several sessions against one SharedDetectorPool and reports on them"""
+
+    def __init__(self, specs, workers=config.SESSION_WORKERS, budget_fps=config.SESSION_BUDGET_FPS,
+                 style='cute', loop=False, hands=True, background_removal=False, frame_ring=False):
+        self.sessions = []
+        try:
+            for index, spec in enumerate(specs):
+                self.sessions.append(Session(index, spec, style, budget_fps, loop, hands, background_removal))
+                if not self.sessions[-1].source.isOpened():
+                    raise IOError(f"Could not open capture source: {spec}")
+        except Exception:
+            # Release the sources (and avatars) opened before the failing one
+            for session in self.sessions:
+                session.close()
+            raise
+
+        # Every session uses the same detector settings
+        self.pool = SharedDetectorPool(self.sessions[0].avatar.detector_settings, workers)
+        for session in self.sessions:
+            session.connect(self.pool)
+            if frame_ring:
+                session.avatar.start_frame_ring(f'{config.FRAME_RING_NAME}_{session.index}')
+        self.running = threading.Event()
+
+    def describe(self):
+        lines = [f"{len(self.sessions)} sessions on {self.pool.count} detector workers"]
+        for session in self.sessions:
+            lines.append(f"  session {session.index}: {session.source.describe()}")
+        return "\n".join(lines)
+
+    def report(self):
+        """Print one statistics line per session"""
+        # Ended sessions are reported once more, then left out
+        sessions = [session for session in self.sessions if not session.reported_end]
+        reports = [session.report() for session in sessions]
+        total = sum(report['worker_time'] for report in reports) or 1.0
+        for session, report in zip(sessions, reports):
+            state = ""
+            if session.finished:
+                session.reported_end = True
+                state = " (ended)"
+            print(f"session {session.index}: {report['fps']:5.1f} FPS  latency {report['latency_ms']:6.1f}ms "
+                  f"(p95 {report['latency_p95_ms']:6.1f})  pool wait {report['wait_ms']:5.1f}ms  "
+                  f"worker {report['worker_ms']:5.1f}ms/frame  share {report['worker_time'] / total:4.0%}{state}")
+
+    def mosaic(self, tile_size=config.SESSION_TILE_SIZE):
+        """Newest canvas of every session, downscaled and tiled into one image"""
+        width, height = tile_size
+        columns = int(np.ceil(np.sqrt(len(self.sessions))))
+        rows = int(np.ceil(len(self.sessions) / columns))
+        image = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+        for session in self.sessions:
+            row, column = divmod(session.index, columns)
+            tile = image[row * height:(row + 1) * height, column * width:(column + 1) * width]
+            # Under the lock, the session thread copies its next canvas into the same buffer
+            with session.lock:
+                if session.canvas is not None:
+                    cv2.resize(session.canvas, tile_size, dst=tile, interpolation=cv2.INTER_AREA)
+        return image
+
+    def run(self, show_window=True, report_interval=config.SESSION_REPORT_INTERVAL):
+        """Run every session until all sources ended, 'q' in the window or Ctrl+C"""
+        self.running.set()
+        for session in self.sessions:
+            session.start(self.running)
+
+        next_report = time.perf_counter() + report_interval
+        try:
+            while not all(session.finished for session in self.sessions):
+                if show_window:
+                    cv2.imshow('VTuber Session Host', self.mosaic())
+                    if cv2.waitKey(30) & 0xFF == ord('q'):
+                        break
+                else:
+                    time.sleep(0.05)
+                if time.perf_counter() >= next_report:
+                    self.report()
+                    next_report += report_interval
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running.clear()
+            self.report()
+            for session in self.sessions:
+                session.close()
+                if session.error is not None:
+                    print(f"session {session.index} stopped: {session.error}")
+            self.pool.close()
+            if show_window:
+                cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several VTuber sessions on a shared detector pool")
+    parser.add_argument('sources', nargs='+',
+                        help="one capture source per session: webcam[:N], synthetic[:COUNT], image directory or video file")
+    parser.add_argument('--workers', type=int, default=config.SESSION_WORKERS,
+                        help="detector worker processes (default: one per CPU core)")
+    parser.add_argument('--budget-fps', type=float, default=config.SESSION_BUDGET_FPS,
+                        help="frame rate cap of each session (0 = no cap)")
+    parser.add_argument('--style', choices=['cute', 'anime', 'cool', 'warm'], default='cute')
+    parser.add_argument('--loop', action='store_true', help="restart video files and image directories at their end")
+    parser.add_argument('--no-hands', action='store_true', help="disable hand tracking")
+    parser.add_argument('--background', action='store_true', help="enable background removal")
+    parser.add_argument('--frame-ring', action='store_true',
+                        help="publish session n's canvases to shared memory '<FRAME_RING_NAME>_<n>'")
+    parser.add_argument('--no-window', action='store_true', help="only print statistics")
+    args = parser.parse_args()
+
+    host = SessionHost(args.sources, workers=args.workers, budget_fps=args.budget_fps, style=args.style,
+                       loop=args.loop, hands=not args.no_hands, background_removal=args.background,
+                       frame_ring=args.frame_ring)
+    print(host.describe())
+    host.run(show_window=not args.no_window)
+
+
+if __name__ == '__main__':
+    main()
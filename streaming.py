@@ -0,0 +1,213 @@
+"""Avatar parameter streaming over UDP to local consumers
+
+Usage:
+    python main.py --stream                      # send to STREAM_HOST:STREAM_PORT
+    python streaming.py receive [--port 39540]   # bundled test receiver
+
+Every packet is one fixed-width little-endian record (PACKET_DTYPE, 57 bytes):
+a magic, a sequence number, the frame size hand positions refer to, then the
+same fields as a motion track record (timestamp, head rotation, eye and mouth
+openness, emotion, hand presence / position / gesture, see motion_track.py).
+A consumer can decode it with np.frombuffer(data, PACKET_DTYPE) or
+struct.unpack('<4sIHH' + ...), sequence gaps show dropped packets. A packet
+with a sequence at or below the newest one seen arrived out of order and is
+stale, ParameterReceiver drops it.
+
+Packets are sent from their own thread at STREAM_RATE, independent of the
+camera and render rates, with the avatar parameters predicted to send time.
+The prediction is computed for the packet only, the avatar's shown state
+belongs to the render loop and is never written by the streamer.
+"""
+import time
+import socket
+import argparse
+import threading
+
+import numpy as np
+
+import config
+from features import EMOTIONS
+from motion_track import TRACK_DTYPE, HANDS, GESTURES, fill_record
+
+MAGIC = b'VTP1'
+
+PACKET_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('sequence', '<u4'),
+    ('frame_size', '<u2', (2,))
+] + TRACK_DTYPE.descr)
+
+
+class ParameterStreamer:
+    """Sends the avatar's parameters as UDP packets at a fixed rate
+
+    The socket is non-blocking: a packet that cannot be sent right away (or
+    has no listener) is counted as dropped instead of stalling anything.
+    """
+
+    def __init__(self, avatar, host=config.STREAM_HOST, port=config.STREAM_PORT,
+                 rate=config.STREAM_RATE, frame_size=(640, 480)):
+        self.avatar = avatar
+        self.address = (host, port)
+        self.interval = 1.0 / rate
+        self.packet = np.zeros(1, dtype=PACKET_DTYPE)
+        self.empty = np.zeros(1, dtype=PACKET_DTYPE)
+        self.frame_size = frame_size
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.running = True
+        self.thread = threading.Thread(target=self.send_loop, name='vtuber-streamer', daemon=True)
+        self.thread.start()
+
+    def build_packet(self, timestamp):
+        """Fill the packet buffer with the avatar state predicted to timestamp"""
+        avatar = self.avatar
+        packet = self.packet
+        packet[:] = self.empty
+        record = packet[0]
+        record['magic'] = MAGIC
+        record['sequence'] = self.sequence
+        record['frame_size'] = self.frame_size
+        with avatar.state_lock:
+            fill_record(record, avatar, timestamp)
+            predicted, hand_positions = None, {}
+            if avatar.motion_filter is not None:
+                # Same prediction as avatar.animate(), without touching the shown state
+                predicted = avatar.motion_filter.predict(timestamp)
+                hand_positions = {hand: avatar.hand_tracks[hand].predict(timestamp) for hand in HANDS
+                                  if avatar.hand_positions[hand] is not None}
+        if predicted is not None:
+            record['head_rotation'], record['eye_open'], record['mouth_open'] = predicted
+        for i, hand in enumerate(HANDS):
+            if hand_positions.get(hand) is not None:
+                record['hand_position'][i] = hand_positions[hand]
+        return packet.tobytes()
+
+    def send_loop(self):
+        next_time = time.perf_counter()
+        while self.running:
+            data = self.build_packet(time.time())
+            self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+            try:
+                self.socket.sendto(data, self.address)
+                self.sent += 1
+            except OSError:
+                # Buffer full or nobody listening (ICMP port unreachable)
+                self.dropped += 1
+
+            # Fixed rate, skipping ticks that were missed
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+
+    def stats(self):
+        return {'sent': self.sent, 'dropped': self.dropped}
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.socket.close()
+
+
+class ParameterReceiver:
+    """Receives streamed packets, for consumers written in Python"""
+
+    def __init__(self, host=config.STREAM_HOST, port=config.STREAM_PORT, timeout=1.0):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.settimeout(timeout)
+        self.last_sequence = None
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+
+    def receive(self):
+        """Next packet as a PACKET_DTYPE record, None on timeout, a foreign or a stale packet"""
+        try:
+            data = self.socket.recv(PACKET_DTYPE.itemsize)
+        except socket.timeout:
+            return None
+        if len(data) != PACKET_DTYPE.itemsize or data[:4] != MAGIC:
+            return None
+        record = np.frombuffer(data, dtype=PACKET_DTYPE)[0]
+
+        sequence = int(record['sequence'])
+        if self.last_sequence is not None:
+            # Distance in wrapping sequence space, half the range and more is behind
+            ahead = (sequence - self.last_sequence) & 0xFFFFFFFF
+            if ahead == 0 or ahead >= 0x80000000:
+                # Reordered (or duplicated): older than what was delivered, drop it.
+                # A late packet was counted lost when the gap opened.
+                self.reordered += 1
+                if ahead and self.lost:
+                    self.lost -= 1
+                return None
+            self.lost += ahead - 1
+        self.last_sequence = sequence
+        self.received += 1
+        return record
+
+    def close(self):
+        self.socket.close()
+
+
+def describe(record):
+    """One-line summary of a packet"""
+    pitch, yaw, roll = record['head_rotation']
+    hands = []
+    for i, hand in enumerate(HANDS):
+        if record['hand_present'][i]:
+            x, y = record['hand_position'][i]
+            hands.append(f"{hand} ({x},{y}) {GESTURES[record['hand_gesture'][i]]}")
+    return (f"#{record['sequence']} head {pitch:6.1f} {yaw:6.1f} {roll:6.1f} "
+            f"eyes {record['eye_open'][0]:.2f}/{record['eye_open'][1]:.2f} "
+            f"mouth {record['mouth_open']:.2f} {EMOTIONS[record['emotion']]:<9} "
+            + (", ".join(hands) or "no hands"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive streamed VTuber avatar parameters")
+    commands = parser.add_subparsers(dest='command', required=True)
+    receive = commands.add_parser('receive', help="print received packets and stream statistics")
+    receive.add_argument('--host', default=config.STREAM_HOST)
+    receive.add_argument('--port', type=int, default=config.STREAM_PORT)
+    receive.add_argument('--interval', type=float, default=1.0, help="seconds between printouts")
+    args = parser.parse_args()
+
+    receiver = ParameterReceiver(args.host, args.port)
+    print(f"Listening on {args.host}:{args.port} (Ctrl+C to stop)")
+    window_start = time.time()
+    window_count = 0
+    latencies = []
+    last = None
+    try:
+        while True:
+            record = receiver.receive()
+            now = time.time()
+            if record is not None:
+                last = record
+                window_count += 1
+                latencies.append(now - record['timestamp'])
+            if now - window_start >= args.interval:
+                if last is not None:
+                    latency = np.mean(latencies) * 1000 if latencies else 0.0
+                    print(f"{window_count / (now - window_start):6.1f} packets/s  "
+                          f"latency {latency:5.2f}ms  lost {receiver.lost}  reordered {receiver.reordered}  "
+                          f"| {describe(last)}")
+                window_start, window_count, latencies = now, 0, []
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.close()
+    print(f"Received {receiver.received} packets, {receiver.lost} lost, {receiver.reordered} reordered")
+
+
+if __name__ == '__main__':
+    main()
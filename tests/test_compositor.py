@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from compositor import Compositor
+from main import VTuberAvatar
+
+# More stages than fit above the quality line
+STAGES = [(f'stage_{i}', 1.0 + i) for i in range(25)]
+
+
+@pytest.fixture
+def avatar(monkeypatch):
+    avatar = VTuberAvatar(use_detectors=False)
+    avatar.head_rotation = [5.0, -12.0, 3.0]
+    avatar.mouth_open_ratio = 0.4
+    # Timings change with every span, the text has to be the same on both paths
+    monkeypatch.setattr(avatar.profiler, 'breakdown', lambda: STAGES)
+    return avatar
+
+
+@pytest.mark.parametrize('show_preview', [True, False])
+def test_compose_matches_draw_canvas(avatar, show_preview):
+    avatar.show_preview = show_preview
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    expected = avatar.draw_canvas(frame, 1)
+    composed = Compositor().compose(avatar, frame, 1)
+    assert np.array_equal(composed, expected)
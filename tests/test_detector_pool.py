@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from detector_pool import SharedDetectorPool
+from frame_packet import FramePacket
+
+FACE_SETTINGS = dict(max_num_faces=1, refine_landmarks=True, min_detection_confidence=0.5,
+                     min_tracking_confidence=0.5)
+
+
+@pytest.fixture
+def pool():
+    pool = SharedDetectorPool({'face': FACE_SETTINGS}, workers=1, timeout=0.001, warm_up=())
+    yield pool
+    pool.close()
+
+
+def test_timed_out_frame_holds_the_session_segment(pool):
+    session = pool.session((64, 48))
+    packet = FramePacket.from_capture(np.zeros((48, 64, 3), dtype=np.uint8))
+
+    # Building the face graph alone takes far longer than the timeout
+    with pytest.raises(RuntimeError, match='timed out'):
+        session.process(packet, ['face'])
+    late = session.late
+    assert late is not None
+
+    # The next frame waits for the worker to finish with the segment before overwriting it
+    pool.timeout = 30.0
+    assert session.process(packet, []) == {}
+    assert late.done.is_set()
+    assert session.late is None
+    session.close()
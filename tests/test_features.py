@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+import config
+from features import EMOTIONS, extract_features, extract_features_batch
+
+SIZE = (640, 480)
+
+
+def make_face(eye_height=0.018, mouth_width=0.1, mouth_height=0.0, brow_height=-0.01,
+              eye_shift=0.0, eye_tilt=0.0, nose_y=0.5, chin_y=0.7):
+    """(478, 3) face with only the landmarks the feature engine reads placed
+
+    Eyes are 0.06 wide, centered at x 0.4 / 0.6 (+ eye_shift), y 0.4; the right
+    eye is eye_tilt lower. The mouth is centered at (0.5, 0.6) and closed by
+    default: with the stock thresholds any open mouth is either happy (smile
+    ratio over 6.5) or surprised (mouth_open over 0.6).
+    """
+    face = np.zeros((478, 3), dtype=np.float32)
+    for indices, center_x, center_y in (((33, 160, 158, 133, 153, 144), 0.4, 0.4),
+                                        ((362, 385, 387, 263, 373, 380), 0.6, 0.4 + eye_tilt)):
+        center_x += eye_shift
+        outer, top_outer, top_inner, inner, bottom_inner, bottom_outer = indices
+        face[outer, :2] = (center_x - 0.03, center_y)
+        face[inner, :2] = (center_x + 0.03, center_y)
+        face[[top_outer, top_inner], 1] = center_y - eye_height / 2
+        face[[bottom_inner, bottom_outer], 1] = center_y + eye_height / 2
+        face[[top_outer, top_inner, bottom_inner, bottom_outer], 0] = center_x
+
+    face[13, :2] = (0.5, 0.6 - mouth_height / 2)
+    face[14, :2] = (0.5, 0.6 + mouth_height / 2)
+    face[61, :2] = (0.5 - mouth_width / 2, 0.6)
+    face[291, :2] = (0.5 + mouth_width / 2, 0.6)
+
+    face[4, :2] = (0.5, nose_y)
+    face[152, :2] = (0.5, chin_y)
+    face[6, :2] = (0.5, 0.35)
+    face[[70, 300], 1] = 0.35 + brow_height
+    return face
+
+
+def test_eye_aspect_ratio_and_openness():
+    features = extract_features(make_face(eye_height=0.018), *SIZE)
+    assert features['ear'] == pytest.approx([0.3, 0.3], abs=1e-5)
+    # 0.3 * EAR_MULTIPLIER is over 1, openness is clipped
+    assert features['eye_open'] == pytest.approx([1.0, 1.0])
+
+    features = extract_features(make_face(eye_height=0.006), *SIZE)
+    assert features['ear'] == pytest.approx([0.1, 0.1], abs=1e-5)
+    assert features['eye_open'] == pytest.approx([0.1 * config.EAR_MULTIPLIER] * 2, abs=1e-4)
+
+
+def test_mouth_aspect_ratio_and_smile_ratio():
+    features = extract_features(make_face(mouth_width=0.1, mouth_height=0.01), *SIZE)
+    assert features['mar'] == pytest.approx(0.1, abs=1e-5)
+    assert features['mouth_open'] == pytest.approx(0.1 * config.MAR_MULTIPLIER, abs=1e-4)
+    assert features['smile_ratio'] == pytest.approx(10.0, rel=1e-4)
+
+
+def test_closed_mouth_has_no_smile_ratio():
+    features = extract_features(make_face(mouth_height=0.0), *SIZE)
+    assert features['mar'] == 0.0
+    assert features['smile_ratio'] == 0.0
+
+
+def test_head_pose_centered_face():
+    pitch, yaw, roll = extract_features(make_face(), *SIZE)['head_pose']
+    assert pitch == pytest.approx((0.5 - 0.7) * 90, abs=1e-3)
+    assert yaw == pytest.approx(0.0, abs=1e-3)
+    assert roll == pytest.approx(0.0, abs=1e-3)
+
+
+def test_head_pose_yaw_and_roll():
+    # Eye center 0.1 of the frame width right of center, a fifth of the half width
+    _, yaw, _ = extract_features(make_face(eye_shift=0.1), *SIZE)['head_pose']
+    assert yaw == pytest.approx(0.1 / 0.5 * 45, abs=1e-3)
+
+    # Roll is measured in pixels, so the frame aspect matters
+    _, _, roll = extract_features(make_face(eye_tilt=0.05), *SIZE)['head_pose']
+    expected = np.degrees(np.arctan2(0.05 * SIZE[1], 0.26 * SIZE[0]))
+    assert roll == pytest.approx(expected, abs=1e-3)
+
+
+@pytest.mark.parametrize('face_args, emotion', [
+    (dict(), 'neutral'),
+    # Smile ratio just over SMILE_THRESHOLD (6.5); just under it the mouth is open enough to be surprised
+    (dict(mouth_height=0.1 / 6.6), 'happy'),
+    (dict(mouth_height=0.1 / 6.4), 'surprised'),
+    # Mouth open over SURPRISED_THRESHOLD wins over angry brows
+    (dict(mouth_height=0.05), 'surprised'),
+    (dict(mouth_height=0.05, brow_height=-0.03), 'surprised'),
+    # Brows more than ANGRY_THRESHOLD (-0.02) above the nose bridge
+    (dict(brow_height=-0.03), 'angry'),
+    (dict(brow_height=-0.019), 'neutral'),
+    # Angry wins over sleepy
+    (dict(brow_height=-0.03, eye_height=0.004), 'angry'),
+    # Both eyes under SLEEPY_THRESHOLD (0.3): EAR 0.067 -> 0.23 open, EAR 0.1 -> 0.35 open
+    (dict(eye_height=0.004), 'sleepy'),
+    (dict(eye_height=0.006), 'neutral'),
+])
+def test_emotion_thresholds(face_args, emotion):
+    assert extract_features(make_face(**face_args), *SIZE)['emotion'] == emotion
+
+
+def test_emotion_priority_smile_over_angry():
+    face = make_face(mouth_width=0.1, mouth_height=0.01, brow_height=-0.05)
+    assert extract_features(face, *SIZE)['emotion'] == 'happy'
+
+
+def test_thresholds_are_read_from_config(monkeypatch):
+    face = make_face(mouth_width=0.1, mouth_height=0.1 / 6.0)
+    assert extract_features(face, *SIZE)['emotion'] != 'happy'
+    monkeypatch.setattr(config, 'SMILE_THRESHOLD', 5.5)
+    assert extract_features(face, *SIZE)['emotion'] == 'happy'
+
+
+def test_batch_matches_single_faces():
+    faces = np.stack([make_face(), make_face(eye_shift=0.05, eye_tilt=0.02),
+                      make_face(mouth_height=0.05), make_face(eye_height=0.004)])
+    batch = extract_features_batch(faces, *SIZE)
+    for i, face in enumerate(faces):
+        single = extract_features(face, *SIZE)
+        assert batch['ear'][i] == pytest.approx(single['ear'])
+        assert batch['mar'][i] == pytest.approx(single['mar'])
+        assert batch['head_pose'][i] == pytest.approx(single['head_pose'])
+        assert EMOTIONS[batch['emotion'][i]] == single['emotion']
+
+
+def test_iris_free_faces_are_accepted():
+    # refine_landmarks=False gives 468 points
+    features = extract_features(make_face()[:468], *SIZE)
+    assert features['emotion'] == 'neutral'
@@ -0,0 +1,186 @@
+import numpy as np
+import pytest
+
+import config
+from gestures import (GESTURES, GESTURE_LOOKUP, GESTURE_TABLE, STATE_BITS, GestureEngine, classify,
+                      compile_table, finger_states, hold_sequence)
+
+
+def state_code(thumb, index, middle, ring, pinky, pinch=0):
+    return sum(bit << i for i, bit in enumerate((thumb, index, middle, ring, pinky, pinch)))
+
+
+def make_hand(extended=(True, True, True, True, True), pinch=False, curl=1.0):
+    """(21, 3) hand, wrist at the bottom, fingers pointing up
+
+    Folded fingers bend toward the palm by curl (0 = straight, 1 = folded back)
+    split over their two middle joints.
+    """
+    hand = np.zeros((21, 3), dtype=np.float32)
+    hand[0] = (0.5, 0.9, 0.0)
+    bend = curl * np.pi / 2
+    # Knuckles in a row 0.1 above the wrist (palm size 0.1)
+    for finger, x in zip(range(1, 5), (0.44, 0.48, 0.52, 0.56)):
+        base = 1 + finger * 4
+        hand[base] = (x, 0.8, 0.0)
+        angle = 0.0
+        for joint in range(base + 1, base + 4):
+            hand[joint] = hand[joint - 1] + (0.0, -0.03 * np.cos(angle), 0.03 * np.sin(angle))
+            if not extended[finger]:
+                angle += bend
+    # Thumb from the side of the palm
+    hand[1] = (0.42, 0.86, 0.0)
+    if pinch:
+        hand[2:5] = [(0.44, 0.83, 0.0), (0.46, 0.77, 0.0), hand[8] + (0.005, 0.005, 0.0)]
+    elif extended[0]:
+        hand[2:5] = [(0.38, 0.84, 0.0), (0.34, 0.82, 0.0), (0.30, 0.80, 0.0)]
+    else:
+        hand[2:5] = [(0.42, 0.84, 0.0), (0.43, 0.83, 0.0), (0.44, 0.82, 0.0)]
+    return hand
+
+
+def table_gesture(code):
+    """Gesture of a state code by scanning GESTURE_TABLE row by row"""
+    bits = [(code >> i) & 1 for i in range(STATE_BITS)]
+    for name, pattern in GESTURE_TABLE:
+        if all(required == '.' or int(required) == bit for required, bit in zip(pattern, bits)):
+            return name
+    return 'none'
+
+
+def test_lookup_covers_every_state_code():
+    assert GESTURE_LOOKUP.shape == (64,)
+    assert GESTURE_LOOKUP.dtype == np.uint8
+    for code in range(64):
+        assert GESTURES[GESTURE_LOOKUP[code]] == table_gesture(code)
+
+
+@pytest.mark.parametrize('states, gesture', [
+    ((0, 1, 1, 0, 0), 'peace'),
+    ((1, 1, 1, 0, 0), 'peace'),
+    ((0, 1, 1, 1, 0), 'three'),
+    ((0, 1, 0, 0, 1), 'rock'),
+    ((1, 0, 0, 0, 1), 'call'),
+    ((1, 0, 0, 0, 0), 'thumbs_up'),
+    ((1, 1, 1, 1, 1), 'open'),
+    ((0, 1, 0, 0, 0), 'point'),
+    ((0, 1, 0, 1, 0), 'point'),
+    ((0, 0, 0, 0, 0), 'fist'),
+    ((0, 0, 1, 0, 0), 'none'),
+])
+def test_lookup_rows(states, gesture):
+    assert GESTURES[GESTURE_LOOKUP[state_code(*states)]] == gesture
+
+
+def test_first_matching_row_wins():
+    # A pinch with the other three fingers out is 'ok' even though the index is extended too
+    assert GESTURES[GESTURE_LOOKUP[state_code(1, 1, 1, 1, 1, pinch=1)]] == 'ok'
+    reordered = [row for row in GESTURE_TABLE if row[0] != 'ok'] + [('ok', '..1111')]
+    assert GESTURES[compile_table(reordered)[state_code(1, 1, 1, 1, 1, pinch=1)]] == 'open'
+
+
+@pytest.mark.parametrize('extended, pinch, gesture', [
+    ((True, True, True, True, True), False, 'open'),
+    ((False, False, False, False, False), False, 'fist'),
+    ((False, True, True, False, False), False, 'peace'),
+    ((False, True, False, False, False), False, 'point'),
+    ((True, False, False, False, False), False, 'thumbs_up'),
+    ((False, False, True, True, True), True, 'ok'),
+])
+def test_classify_hands(extended, pinch, gesture):
+    codes, states = classify(make_hand(extended, pinch)[None])
+    assert GESTURES[codes[0]] == gesture
+    assert states.shape == (1, 6)
+
+
+def test_classify_batch_matches_single_hands():
+    hands = np.stack([make_hand(), make_hand((False,) * 5), make_hand((False, True, True, False, False))])
+    codes, _ = classify(hands)
+    assert codes.tolist() == [classify(hand[None])[0][0] for hand in hands]
+
+
+def curl_features(curl):
+    """hand_features() output with every finger at curl, thumb out, no pinch"""
+    return {
+        'curl': np.full((1, 5), curl, dtype=np.float32),
+        'pinch': np.ones((1, 4), dtype=np.float32),
+        'thumb_spread': np.ones(1, dtype=np.float32)
+    }
+
+
+def test_curl_hysteresis():
+    curl_on, curl_off = config.GESTURE_CURL_THRESHOLDS
+    between = (curl_on + curl_off) / 2 + 0.01
+    extended = np.ones((1, 6), dtype=bool)
+    extended[:, 5] = False
+    folded = np.zeros((1, 6), dtype=bool)
+
+    # Between the thresholds a finger keeps the state it had
+    assert finger_states(curl_features(between), extended)[0, :5].all()
+    assert not finger_states(curl_features(between), folded)[0, :5].any()
+    # Past the far threshold it flips
+    assert not finger_states(curl_features(curl_off + 0.01), extended)[0, :5].any()
+    assert finger_states(curl_features(curl_on - 0.01), folded)[0, :5].all()
+    # Without history the midpoint decides
+    assert not finger_states(curl_features(between))[0, 1:5].any()
+    assert finger_states(curl_features(between - 0.02))[0, 1:5].all()
+
+
+def test_pinch_hysteresis():
+    pinch_on, pinch_off = config.GESTURE_PINCH_DISTANCE
+    features = curl_features(0.0)
+    features['pinch'][:, 0] = (pinch_on + pinch_off) / 2
+    pinched = np.ones((1, 6), dtype=bool)
+    apart = pinched.copy()
+    apart[:, 5] = False
+    assert finger_states(features, pinched)[0, 5]
+    assert not finger_states(features, apart)[0, 5]
+
+
+def test_engine_keeps_finger_state_between_frames():
+    curl_on, curl_off = config.GESTURE_CURL_THRESHOLDS
+    # Fingers bent just past the midpoint of the curl thresholds
+    hand = make_hand((False,) * 5, curl=(curl_on + curl_off) / 2 + 0.03)[None]
+    assert GESTURES[classify(hand)[0][0]] == 'fist'
+
+    engine = GestureEngine(hold_frames=1)
+    engine.update(['left'], make_hand()[None])
+    # Fingers were extended on the previous frame, they stay extended until curl_off
+    assert engine.update(['left'], hand) == ['open']
+    engine.reset()
+    assert engine.update(['left'], hand) == ['fist']
+
+
+def engine_sequence(codes, hold_frames):
+    engine = GestureEngine(hold_frames=hold_frames)
+    return np.array([engine.hold('left', code) for code in codes.tolist()])
+
+
+@pytest.mark.parametrize('hold_frames', [1, 2, 3, 5])
+def test_hold_sequence_matches_engine(hold_frames):
+    rng = np.random.default_rng(hold_frames)
+    for _ in range(50):
+        # Runs of random lengths so short and long runs both occur
+        values = rng.integers(0, 4, 30)
+        lengths = rng.integers(1, 2 * hold_frames + 2, 30)
+        codes = np.repeat(values, lengths)[:120]
+        assert hold_sequence(codes, hold_frames).tolist() == engine_sequence(codes, hold_frames).tolist()
+
+
+def test_hold_sequence_examples():
+    codes = np.array([0, 0, 1, 1, 0, 2, 2, 2, 2])
+    assert hold_sequence(codes, 3).tolist() == [0, 0, 0, 0, 0, 0, 0, 2, 2]
+    assert hold_sequence(codes, 1).tolist() == codes.tolist()
+    assert hold_sequence(np.array([], dtype=np.uint8), 3).tolist() == []
+
+
+def test_engine_tracks_hands_separately():
+    engine = GestureEngine(hold_frames=2)
+    assert engine.hold('left', 1) == 1
+    assert engine.hold('right', 2) == 2
+    assert engine.hold('left', 3) == 1
+    assert engine.hold('right', 2) == 2
+    assert engine.hold('left', 3) == 3
+    engine.reset('left')
+    assert engine.hold('left', 4) == 4
+    assert engine.hold('right', 4) == 2
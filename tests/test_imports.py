@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module', ['main', 'landmark_cache', 'motion_track'])
+def test_import_does_not_load_mediapipe(module):
+    # Fresh interpreter: other tests in this process may already have loaded MediaPipe
+    check = f'import sys, {module}; assert "mediapipe" not in sys.modules, "mediapipe loaded"'
+    result = subprocess.run([sys.executable, '-c', check], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
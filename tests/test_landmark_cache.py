@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+
+import config
+from frame_packet import FramePacket
+from gestures import GESTURES, GestureEngine
+from landmark_cache import LandmarkReplay, LandmarkWriter, render_replay
+from test_gestures import make_hand
+
+FRAME_SIZE = (64, 48)
+
+
+def write_capture(path, frames):
+    """Capture of (timestamp, hands) frames, hands None where hand tracking did not run"""
+    writer = LandmarkWriter(str(path), FRAME_SIZE)
+    for index, (timestamp, hands) in enumerate(frames):
+        packet = FramePacket.blank(FRAME_SIZE, timestamp=timestamp, index=index)
+        packet.hand_landmarks = hands
+        writer.append(packet)
+    writer.close()
+    return LandmarkReplay(str(path))
+
+
+def test_gestures_match_live_engine(tmp_path):
+    curl_on, curl_off = config.GESTURE_CURL_THRESHOLDS
+    rng = np.random.default_rng(0)
+    frames = []
+    for index in range(200):
+        roll = rng.random()
+        if roll < 0.05:
+            hands = []
+        elif roll < 0.1:
+            hands = None
+        else:
+            # Curls around the hysteresis band, so the previous state decides often
+            curl = rng.uniform(curl_on - 0.1, curl_off + 0.1)
+            folded = tuple(rng.random(5) < 0.5)
+            hands = [('left', make_hand(tuple(not bit for bit in folded), curl=curl))]
+            if rng.random() < 0.5:
+                hands.append(('right', make_hand(curl=rng.uniform(curl_on - 0.1, curl_off + 0.1))))
+        frames.append((index / 30, hands))
+    replay = write_capture(tmp_path / 'hands.landmarks', frames)
+
+    engine = GestureEngine(hold_frames=3)
+    expected = {'left': [], 'right': []}
+    for index in range(len(replay)):
+        hands = replay.hands(index)
+        if hands is None:
+            continue
+        if not hands:
+            engine.reset()
+            continue
+        labels = [label for label, _ in hands]
+        names = engine.update(labels, np.stack([points for _, points in hands]), FRAME_SIZE[0] / FRAME_SIZE[1])
+        for label, name in zip(labels, names):
+            expected[label].append((index, GESTURES.index(name)))
+
+    result = replay.gestures(hold_frames=3)
+    for label, (indices, codes) in result.items():
+        assert list(zip(indices.tolist(), codes.tolist())) == expected[label]
+    assert set(result) == {label for label, values in expected.items() if values}
+
+
+def test_render_replay_follows_timestamps(tmp_path):
+    # 10 records per second over one second, rendered at 30 fps
+    replay_path = tmp_path / 'slow.landmarks'
+    write_capture(replay_path, [(index / 10, None) for index in range(11)])
+    output = str(tmp_path / 'slow.mp4')
+    assert render_replay(str(replay_path), output, fps=30.0) == 31
+    assert int(cv2.VideoCapture(output).get(cv2.CAP_PROP_FRAME_COUNT)) == 31
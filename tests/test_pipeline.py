@@ -0,0 +1,25 @@
+import pytest
+
+from capture import SyntheticSource
+from instrumentation import Profiler
+from pipeline import PipelinedRunner
+
+
+class FailingAvatar:
+    """Avatar stand-in whose detection stage raises on the first frame"""
+
+    show_window = False
+
+    def __init__(self):
+        self.profiler = Profiler()
+
+    def process_packet(self, packet):
+        raise ValueError("detector exploded")
+
+
+def test_inference_error_stops_the_pipeline_and_is_reraised():
+    runner = PipelinedRunner(FailingAvatar(), SyntheticSource(size=(64, 48), realtime=False), render_fps=30)
+    with pytest.raises(ValueError, match='detector exploded'):
+        runner.run()
+    assert not runner.running.is_set()
+    assert runner.threads == []